@@ -0,0 +1,188 @@
+"""Кэш быстрого запуска: разобранный банк и индекс тегов в бинарном файле.
+
+Файл лежит рядом с банком (<файл банка>.cache) и состоит из двух pickle
+подряд: заголовок (версия формата, размер, время изменения и хэш
+содержимого банка) и данные (вопросы кортежами Question.to_row() и маски
+тегов). При запуске сначала читается только заголовок: совпали размер и
+время изменения - кэш верен; совпал только размер - сверяется хэш
+содержимого, и при совпадении в заголовок записывается новое время
+изменения, чтобы следующий запуск не хэшировал банк заново. Разбор JSON
+при этом не нужен совсем.
+
+Если кэш устарел, банк читается из JSON как обычно, а кэш пересобирается
+в фоновом потоке из уже разобранных вопросов. Пересборки после правок
+откладываются на REBUILD_DELAY секунд тишины и сливаются в одну: серия
+правок хэширует и сериализует банк один раз. Отложенную пересборку
+выполняет flush_rebuilds() - приложение вызывает ее при уходе в фон и
+выходе, а для остальных процессов она зарегистрирована в atexit.
+"""
+import os
+import sys
+import atexit
+import pickle
+import hashlib
+import logging
+import threading
+
+from file_lock import atomic_write
+from question_bank import Question, TagIndex, _file_stat, _intern
+
+Logger = logging.getLogger('ExamApp')
+
+CACHE_SUFFIX = '.cache'
+CACHE_VERSION = 1
+# Сколько секунд без правок ждать перед пересборкой кэша
+REBUILD_DELAY = 3.0
+
+_rebuild_lock = threading.Lock()
+# Отложенные пересборки: путь банка -> (таймер, аргументы rebuild_cache)
+_pending = {}
+_pending_lock = threading.Lock()
+
+
+def cache_path(bank_path):
+    return bank_path + CACHE_SUFFIX
+
+
+def content_hash(path):
+    """SHA-1 содержимого файла"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_cache(bank_path, stat):
+    """Возвращает (вопросы, индекс тегов) из кэша или None, если кэша нет или он устарел.
+
+    stat - (размер, время изменения) файла банка, как его вернул _file_stat().
+    """
+    path = cache_path(bank_path)
+    if stat is None or not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'rb') as f:
+            header = pickle.load(f)
+            if header.get('version') != CACHE_VERSION or header.get('size') != stat[0]:
+                return None
+            touched = header.get('mtime') != stat[1]
+            if touched and header.get('hash') != content_hash(bank_path):
+                return None
+            payload = f.read()
+        data = pickle.loads(payload)
+    except Exception as e:
+        Logger.warning(f"Ignoring unreadable bank cache {path}: {e}")
+        return None
+
+    if touched:
+        # Файл банка тронули, скопировали или синхронизировали без изменений
+        threading.Thread(target=_refresh_header, args=(bank_path, header, payload, stat), daemon=True).start()
+
+    # pickle сохраняет общие строки внутри файла, но не связь с таблицей sys.intern:
+    # без повторного интернирования те же варианты и теги новых вопросов дублируются
+    from_row = Question.from_row
+    intern = sys.intern
+    questions = []
+    for row in data['rows']:
+        question = from_row(row)
+        question.options = tuple(map(_intern, question.options))
+        question.tags = tuple(map(intern, question.tags))
+        questions.append(question)
+    tag_index = TagIndex([])
+    tag_index.count = len(questions)
+    tag_index.postings = data['tags']
+    return questions, tag_index
+
+
+def _refresh_header(bank_path, header, payload, stat):
+    """Переписывает заголовок кэша с новым временем изменения банка, данные не меняются"""
+    with _rebuild_lock:
+        if _file_stat(bank_path) != stat:
+            return False
+        header = dict(header, mtime=stat[1])
+
+        def write(f):
+            pickle.dump(header, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.write(payload)
+
+        path = cache_path(bank_path)
+        try:
+            atomic_write(path, write, 'wb')
+        except OSError as e:
+            Logger.error(f"Error refreshing bank cache {path}: {e}")
+            return False
+        return True
+
+
+def rebuild_cache(bank_path, questions, stat, tag_index=None):
+    """Записывает кэш для вопросов, прочитанных из файла банка с состоянием stat.
+
+    Если файл банка успел измениться, кэш не записывается.
+    """
+    with _rebuild_lock:
+        if stat is None or _file_stat(bank_path) != stat:
+            return False
+        digest = content_hash(bank_path)
+        if _file_stat(bank_path) != stat:
+            return False
+
+        if tag_index is None:
+            tag_index = TagIndex(questions)
+        header = {'version': CACHE_VERSION, 'size': stat[0], 'mtime': stat[1], 'hash': digest}
+        data = {'rows': [question.to_row() for question in questions], 'tags': tag_index.postings}
+
+        def write(f):
+            pickle.dump(header, f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        path = cache_path(bank_path)
+        try:
+            # Временный файл у каждого процесса свой: кэш могут пересобирать несколько сразу
+            atomic_write(path, write, 'wb')
+        except OSError as e:
+            Logger.error(f"Error writing bank cache {path}: {e}")
+            return False
+        Logger.info(f"Bank cache rebuilt: {path}")
+        return True
+
+
+def rebuild_cache_async(bank_path, questions, stat, tag_index=None, delay=REBUILD_DELAY):
+    """Пересобирает кэш в фоновом потоке после delay секунд без новых вызовов.
+
+    Повторный вызов для того же банка заменяет отложенную пересборку:
+    кэш строится один раз из последнего состояния (список вопросов копируется).
+    """
+    timer = threading.Timer(delay, _run_pending)
+    # Сработавший таймер, которого уже сменил новый вызов, ничего не делает
+    timer.args = (bank_path, timer)
+    timer.daemon = True
+    with _pending_lock:
+        previous = _pending.get(bank_path)
+        if previous is not None:
+            previous[0].cancel()
+        _pending[bank_path] = (timer, (bank_path, list(questions), stat, tag_index))
+        timer.start()
+    return timer
+
+
+def _run_pending(bank_path, timer=None):
+    """Выполняет отложенную пересборку кэша банка, если она еще ждет"""
+    with _pending_lock:
+        entry = _pending.get(bank_path)
+        if entry is None or (timer is not None and entry[0] is not timer):
+            return False
+        del _pending[bank_path]
+        entry[0].cancel()
+    return rebuild_cache(*entry[1])
+
+
+def flush_rebuilds():
+    """Сразу выполняет все отложенные пересборки кэша в текущем потоке"""
+    with _pending_lock:
+        paths = list(_pending)
+    for bank_path in paths:
+        _run_pending(bank_path)
+
+
+atexit.register(flush_rebuilds)
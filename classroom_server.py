@@ -0,0 +1,293 @@
+"""Сервер экзамена для класса: один банк вопросов, много учеников.
+
+Сервер без интерфейса на asyncio раздает вопросы выбранного банка
+ученикам через браузер (страница "/") или любой HTTP-клиент. Банк
+загружается в память один раз и общий для всех сессий; у каждой сессии
+своя колода (RandomDeck) и счет. Варианты перемешиваются и ответ
+проверяется теми же функциями, что и во вкладке «Экзамен», а ответы
+пишутся в журнал банка для оценки сложности (difficulty.py).
+
+    POST /session                   {"tags": [...], "match_all": false} -> {"session", "remaining"}
+    GET  /session/<id>/question     {"id", "text", "options", "remaining"} или {"done": true}
+    POST /session/<id>/answer       {"selected": [номера с 0]} -> {"correct", "correct_indices", ...}
+    GET  /stats                     число сессий, ответов и запросов
+
+    python cli.py classroom data_dir --port 8080
+    python loadtest.py --clients 100 --questions 20
+"""
+import asyncio
+import json
+import time
+import random
+import secrets
+import logging
+from urllib.parse import urlsplit
+
+from difficulty import ANSWER_LOG_SUFFIX, AnswerLog
+from question_bank import RandomDeck, is_answer_correct, shuffle_options
+
+Logger = logging.getLogger('ExamApp')
+
+CLASSROOM_PORT = 8080
+# Сессия удаляется, если ученик не обращался к серверу столько секунд
+SESSION_TTL = 3 * 60 * 60
+MAX_BODY_SIZE = 64 * 1024
+# Ответы в журнал для оценки сложности дописываются пачками
+ANSWER_LOG_BATCH = 500
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 413: 'Payload Too Large',
+            500: 'Internal Server Error'}
+
+_PAGE = '''<!DOCTYPE html>
+<html lang="ru"><head><meta charset="utf-8"><meta name="viewport" content="width=device-width">
+<title>Экзамен</title></head>
+<body style="font-family:sans-serif;max-width:40em;margin:auto;padding:1em">
+<h3 id="text">Загрузка...</h3><form id="options"></form>
+<button id="btn">Ответить</button> <span id="status"></span>
+<script>
+let session = null, answered = false;
+async function call(method, path, body) {
+  const r = await fetch(path, {method, body: body && JSON.stringify(body)});
+  return r.json();
+}
+async function next() {
+  const q = await call('GET', `/session/${session}/question`);
+  answered = false;
+  document.getElementById('btn').textContent = 'Ответить';
+  document.getElementById('status').textContent = q.done ? '' : `Осталось: ${q.remaining}`;
+  document.getElementById('text').textContent = q.done ? 'Все вопросы закончились!' : q.text;
+  const form = document.getElementById('options');
+  form.innerHTML = '';
+  (q.options || []).forEach((option, i) => {
+    const label = document.createElement('label');
+    label.style.display = 'block';
+    label.innerHTML = `<input type="checkbox" value="${i}"> `;
+    label.append(option);
+    form.append(label);
+  });
+}
+document.getElementById('btn').onclick = async () => {
+  if (answered) return next();
+  const selected = [...document.querySelectorAll('#options input:checked')].map(e => +e.value);
+  if (!selected.length) return;
+  const r = await call('POST', `/session/${session}/answer`, {selected});
+  document.querySelectorAll('#options label').forEach((label, i) => {
+    if (r.correct_indices.includes(i)) label.style.background = '#b3ffb3';
+    else if (selected.includes(i)) label.style.background = '#ffb3b3';
+  });
+  document.getElementById('status').textContent =
+    `${r.correct ? 'Правильно!' : 'Неправильно!'} Счет: ${r.score} из ${r.answered}`;
+  document.getElementById('btn').textContent = 'Далее';
+  answered = true;
+};
+call('POST', '/session', {}).then(s => { session = s.session; next(); });
+</script></body></html>
+'''
+
+
+class ExamSession:
+    """Состояние ученика: колода, текущий вопрос и счет"""
+    __slots__ = ('deck', 'person', 'question', 'order', 'correct_indices', 'answered', 'score', 'last_seen')
+
+    def __init__(self, deck):
+        self.deck = deck
+        self.person = random.getrandbits(32)
+        self.question = None
+        self.order = None
+        self.correct_indices = None
+        self.answered = 0
+        self.score = 0
+        self.last_seen = time.monotonic()
+
+
+class ClassroomServer:
+    """HTTP-сервер экзамена для класса над выбранным банком каталога"""
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.bank = catalog.current
+        self.questions = catalog.load()
+        # Индекс тегов строится сразу, а не в первом запросе с фильтром
+        catalog.tag_index()
+        self.sessions = {}
+        # Позиции вопросов по фильтру тегов: колоды только читают их, поэтому общие
+        self._filters = {}
+        self.answer_log = AnswerLog(catalog.side_path(ANSWER_LOG_SUFFIX), flush_every=ANSWER_LOG_BATCH)
+        self.requests = 0
+        self.answers = 0
+        self._server = None
+
+    # --- Обработчики запросов ---
+
+    def create_session(self, body):
+        tags = body.get('tags') or []
+        if not isinstance(tags, list) or not all(isinstance(tag, str) for tag in tags):
+            return 400, {'error': 'tags must be a list of strings'}
+        if tags:
+            key = (tuple(sorted(tags)), bool(body.get('match_all')))
+            positions = self._filters.get(key)
+            if positions is None:
+                positions = self.catalog.tag_index().positions(*key)
+                self._filters[key] = positions
+        else:
+            positions = range(len(self.questions))
+        session_id = secrets.token_urlsafe(12)
+        session = ExamSession(RandomDeck(positions))
+        self.sessions[session_id] = session
+        return 200, {'session': session_id, 'remaining': len(session.deck)}
+
+    def next_question(self, session):
+        # Пока на вопрос не ответили, повторный запрос возвращает его же
+        if session.question is None:
+            if not session.deck:
+                return 200, {'done': True, 'score': session.score, 'answered': session.answered}
+            session.question = self.questions[session.deck.pop()]
+            session.order, session.correct_indices = shuffle_options(session.question)
+        question = session.question
+        return 200, {
+            'id': question.id,
+            'text': question.text,
+            'options': [question.options[index] for index in session.order],
+            'multiple': len(session.correct_indices) > 1,
+            'remaining': len(session.deck),
+        }
+
+    def answer(self, session, body):
+        if session.question is None:
+            return 400, {'error': 'no question'}
+        selected = body.get('selected')
+        count = len(session.order)
+        # Пустой ответ не засчитывается: в приложении без выбранного варианта ответить нельзя
+        if not isinstance(selected, list) or not selected or not all(
+                type(index) is int and 0 <= index < count for index in selected):
+            return 400, {'error': f'selected must be a non-empty list of option numbers from 0 to {count - 1}'}
+
+        correct = is_answer_correct(session.correct_indices, selected)
+        session.answered += 1
+        session.score += correct
+        self.answers += 1
+        self.answer_log.record(session.question.id, session.person, correct)
+        result = {
+            'correct': correct,
+            'correct_indices': session.correct_indices,
+            'score': session.score,
+            'answered': session.answered,
+        }
+        session.question = None
+        return 200, result
+
+    def stats(self):
+        return 200, {
+            'bank': self.bank,
+            'questions': len(self.questions),
+            'sessions': len(self.sessions),
+            'answers': self.answers,
+            'requests': self.requests,
+        }
+
+    def route(self, method, path, body):
+        """Возвращает (статус, ответ): словарь для JSON или строку HTML"""
+        if method == 'GET' and path == '/':
+            return 200, _PAGE
+        if method == 'GET' and path == '/stats':
+            return self.stats()
+        if method == 'POST' and path == '/session':
+            return self.create_session(body)
+
+        parts = path.strip('/').split('/')
+        if len(parts) == 3 and parts[0] == 'session':
+            session = self.sessions.get(parts[1])
+            if session is None:
+                return 404, {'error': 'unknown session'}
+            session.last_seen = time.monotonic()
+            if method == 'GET' and parts[2] == 'question':
+                return self.next_question(session)
+            if method == 'POST' and parts[2] == 'answer':
+                return self.answer(session, body)
+        return 404, {'error': 'not found'}
+
+    # --- HTTP ---
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, version = request_line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get('content-length') or 0)
+                if length > MAX_BODY_SIZE:
+                    await self._reply(writer, 413, {'error': 'body too large'}, False)
+                    break
+                raw_body = await reader.readexactly(length) if length else b''
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+
+                self.requests += 1
+                try:
+                    body = json.loads(raw_body.decode('utf-8')) if raw_body else {}
+                    if not isinstance(body, dict):
+                        raise ValueError("body must be a JSON object")
+                    status, payload = self.route(method, urlsplit(target).path, body)
+                except ValueError as e:
+                    status, payload = 400, {'error': str(e)}
+                except Exception:
+                    # Ошибка сервера не должна обрывать соединение без ответа
+                    Logger.exception(f"Error handling {method} {target}")
+                    status, payload = 500, {'error': 'internal error'}
+                await self._reply(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            # Клиент отключился или прислал некорректный запрос
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _reply(writer, status, payload, keep_alive):
+        if isinstance(payload, str):
+            data = payload.encode('utf-8')
+            content_type = 'text/html; charset=utf-8'
+        else:
+            data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            content_type = 'application/json; charset=utf-8'
+        header = (f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+                  f"Content-Type: {content_type}\r\n"
+                  f"Content-Length: {len(data)}\r\n"
+                  f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(header.encode('latin-1') + data)
+        await writer.drain()
+
+    async def _expire_sessions(self):
+        while True:
+            await asyncio.sleep(60)
+            self.answer_log.flush()
+            deadline = time.monotonic() - SESSION_TTL
+            expired = [session_id for session_id, session in self.sessions.items() if session.last_seen < deadline]
+            for session_id in expired:
+                del self.sessions[session_id]
+            if expired:
+                Logger.info(f"Expired {len(expired)} classroom sessions")
+
+    async def serve(self, host='0.0.0.0', port=CLASSROOM_PORT, ready=None):
+        """Принимает подключения до отмены задачи; ready(port) вызывается после запуска"""
+        self._server = await asyncio.start_server(self._handle, host, port)
+        port = self._server.sockets[0].getsockname()[1]
+        Logger.info(f"Classroom server for bank '{self.bank}' ({len(self.questions)} questions) on port {port}")
+        if ready is not None:
+            ready(port)
+        expire_task = asyncio.ensure_future(self._expire_sessions())
+        try:
+            async with self._server:
+                await self._server.serve_forever()
+        finally:
+            expire_task.cancel()
+            self.answer_log.flush()
@@ -0,0 +1,327 @@
+"""Консольные утилиты для работы с банками вопросов без запуска интерфейса.
+
+    python cli.py validate questions.json
+    python cli.py validate teachers.csv --json
+    python cli.py build-qbk questions.json shared.qbk
+    python cli.py sync-serve data_dir --port 8765
+    python cli.py sync data_dir http://192.168.1.5:8765 --pin 123456
+    python cli.py verify data_dir --repair --source questions_export.json
+    python cli.py classroom data_dir --port 8080
+    python cli.py variants data_dir --count 30 --size 20 --html variants.html
+    python cli.py hammer --writers 4 --readers 4 --edits 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import random
+import shutil
+import tempfile
+import multiprocessing
+from contextlib import ExitStack
+
+from classroom_server import CLASSROOM_PORT, ClassroomServer
+from importers import IMPORT_EXTENSIONS, import_file
+from integrity import repair_bank, verify_bank
+from mapped_bank import build_mapped_bank
+from question_bank import BankCatalog, Question, assign_ids, parse_tags, questions_from_dicts
+from sync import SYNC_PORT, SyncPinError, SyncServer, local_address, sync_with
+from validation import ValidationError, ValidationReport, validate_records
+from variants import (BALANCE_MODES, BALANCE_TAGS, HtmlVariantWriter, JsonVariantWriter, bank_groups,
+                      generate_variants, stream_variants)
+
+
+def cmd_validate(args):
+    """Проверяет файл вопросов и печатает отчет; код возврата 1 при ошибках"""
+    if os.path.splitext(args.file)[1].lower() in IMPORT_EXTENSIONS:
+        questions, errors = import_file(args.file)
+        report = ValidationReport(len(questions) + len({line for line, _ in errors}))
+        report.valid = questions
+        report.errors = [ValidationError(line, 'record', message) for line, message in errors]
+    else:
+        with open(args.file, 'r', encoding='utf-8') as f:
+            records = json.load(f)
+        report = validate_records(records)
+
+    if args.json:
+        print(json.dumps(report.to_dict(), ensure_ascii=False, indent=2))
+    else:
+        print(report.summary(limit=args.limit))
+    return 0 if report.ok else 1
+
+
+def cmd_build_qbk(args):
+    """Собирает банк только для чтения (.qbk) из JSON-файла вопросов"""
+    with open(args.source, 'r', encoding='utf-8') as f:
+        records = json.load(f)
+    report = validate_records(records)
+    if not report.ok:
+        print(report.summary(limit=args.limit))
+        if not args.skip_invalid:
+            return 1
+
+    count = build_mapped_bank(assign_ids(questions_from_dicts(report.valid)), args.target)
+    print(f"Записано вопросов: {count} в {args.target}")
+    return 0
+
+
+def _open_catalog(args):
+    catalog = BankCatalog(args.data_dir)
+    if args.bank:
+        catalog.select(args.bank)
+    return catalog
+
+
+def cmd_sync_serve(args):
+    """Раздает выбранный банк папки данных для синхронизации"""
+    catalog = _open_catalog(args)
+    server = SyncServer(catalog, args.host, args.port, pin=args.pin)
+    print(f"Банк '{catalog.current}' доступен по адресу http://{local_address()}:{server.port}, PIN-код {server.pin}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+    return 0
+
+
+def cmd_sync(args):
+    """Синхронизирует выбранный банк папки данных с сервером"""
+    try:
+        result = sync_with(_open_catalog(args), args.url, args.pin)
+    except SyncPinError as e:
+        print(e)
+        return 1
+    print(result.summary())
+    return 0
+
+
+def cmd_verify(args):
+    """Проверяет банк по контрольным суммам и при --repair восстанавливает испорченные записи"""
+    catalog = _open_catalog(args)
+    if catalog.is_read_only():
+        print("Банк только для чтения не проверяется по контрольным суммам")
+        return 0
+    report = verify_bank(catalog.path())
+    print(report.summary())
+    if report.ok or not args.repair:
+        return 0 if report.ok else 1
+
+    restored, not_found = repair_bank(catalog, report, args.source)
+    print(f"Восстановлено записей: {restored}")
+    if not_found:
+        print(f"Не найдены копии: id {', '.join(map(str, not_found))}")
+    return 1 if not_found else 0
+
+
+def cmd_classroom(args):
+    """Раздает экзамен по выбранному банку ученикам в локальной сети"""
+    server = ClassroomServer(_open_catalog(args))
+    ready = lambda port: print(f"Экзамен по банку '{server.bank}' доступен по адресу http://{local_address()}:{port}")
+    try:
+        asyncio.run(server.serve(args.host, args.port, ready))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def cmd_variants(args):
+    """Генерирует варианты билетов из выбранного банка в HTML и/или JSON"""
+    if not args.html and not args.json:
+        print("Укажите файл --html или --json")
+        return 1
+    catalog = _open_catalog(args)
+    start = time.perf_counter()
+    questions, groups = bank_groups(catalog, args.balance, parse_tags(args.tags or ''), args.match_all)
+    rng = random.Random(args.seed)
+    try:
+        variants = generate_variants(questions, groups, args.count, args.size, rng)
+    except ValueError as e:
+        print(e)
+        return 1
+
+    with ExitStack() as stack:
+        writers = []
+        if args.html:
+            f = stack.enter_context(open(args.html, 'w', encoding='utf-8'))
+            media_dir = catalog.media_dir() if not catalog.is_read_only() else None
+            writers.append(HtmlVariantWriter(f, args.title or catalog.current, media_dir))
+        if args.json:
+            writers.append(JsonVariantWriter(stack.enter_context(open(args.json, 'w', encoding='utf-8'))))
+        stats = stream_variants(variants, writers)
+    print(f"{stats.summary()}, групп: {len(groups)}, {time.perf_counter() - start:.2f} с")
+    return 0
+
+
+def _hammer_writer(data_dir, writer, edits, results):
+    """Добавляет edits вопросов и правит каждый второй из них"""
+    try:
+        catalog = BankCatalog(data_dir)
+        for i in range(edits):
+            catalog.add_question(Question(f"hammer {writer}-{i}", ["да", "нет"], 1))
+            if i % 2:
+                question = next(q for q in catalog.load() if q.text == f"hammer {writer}-{i - 1}")
+                question.tags = (f"writer-{writer}",)
+                catalog.update_question(question)
+        results.put(None)
+    except Exception as e:
+        results.put(f"писатель {writer}: {e!r}")
+
+
+def _hammer_reader(data_dir, reader, stop, results):
+    """Читает банк без блокировок, пока писатели работают"""
+    try:
+        catalog = BankCatalog(data_dir)
+        last_count = 0
+        reads = 0
+        while not stop.is_set():
+            questions = catalog.load()
+            ids = [q.id for q in questions]
+            if len(questions) < last_count:
+                raise AssertionError(f"вопросов стало меньше: {last_count} -> {len(questions)}")
+            if len(set(ids)) != len(ids):
+                raise AssertionError("повторяющиеся id")
+            last_count = len(questions)
+            reads += 1
+        results.put(reads)
+    except Exception as e:
+        results.put(f"читатель {reader}: {e!r}")
+
+
+def cmd_hammer(args):
+    """Одновременно правит и читает банк из нескольких процессов и проверяет результат"""
+    data_dir = args.dir or tempfile.mkdtemp(prefix='hammer-')
+    catalog = BankCatalog(data_dir)
+    catalog.save([])
+
+    results = multiprocessing.Queue()
+    stop = multiprocessing.Event()
+    writers = [multiprocessing.Process(target=_hammer_writer, args=(data_dir, i, args.edits, results))
+               for i in range(args.writers)]
+    readers = [multiprocessing.Process(target=_hammer_reader, args=(data_dir, i, stop, results))
+               for i in range(args.readers)]
+    start = time.perf_counter()
+    for process in writers + readers:
+        process.start()
+    for process in writers:
+        process.join()
+    stop.set()
+    for process in readers:
+        process.join()
+    elapsed = time.perf_counter() - start
+
+    errors = []
+    reads = 0
+    for _ in writers + readers:
+        result = results.get()
+        if isinstance(result, str):
+            errors.append(result)
+        elif result is not None:
+            reads += result
+
+    questions = catalog.load()
+    texts = [q.text for q in questions]
+    expected = [f"hammer {writer}-{i}" for writer in range(args.writers) for i in range(args.edits)]
+    missing = [text for text in expected if texts.count(text) != 1]
+    if len(texts) != len(expected) or missing:
+        errors.append(f"в банке {len(texts)} вопросов из {len(expected)}, потеряны или повторены: {missing[:5]}")
+    untagged = [q.text for q in questions if int(q.text.split('-')[1]) % 2 == 0
+                and int(q.text.split('-')[1]) + 1 < args.edits and not q.tags]
+    if untagged:
+        errors.append(f"потеряны правки: {untagged[:5]}")
+    # Суммы обновлялись по частям из разных процессов и должны совпасть с банком
+    integrity = verify_bank(catalog.path(), snapshot=False)
+    if not integrity.ok or integrity.unverified:
+        errors.append(f"контрольные суммы не совпали с банком:\n{integrity.summary()}")
+
+    print(f"Писателей: {args.writers}, читателей: {args.readers}, правок: {args.writers * args.edits}, "
+          f"чтений: {reads}, {elapsed:.2f} с")
+    for error in errors:
+        print(error)
+    if args.dir is None:
+        shutil.rmtree(data_dir, ignore_errors=True)
+    print("Ошибок нет" if not errors else f"Ошибок: {len(errors)}")
+    return 1 if errors else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Утилиты для банков вопросов")
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    validate = commands.add_parser('validate', help="проверить файл вопросов (JSON, CSV/TSV, TXT)")
+    validate.add_argument('file')
+    validate.add_argument('--json', action='store_true', help="отчет в формате JSON")
+    validate.add_argument('--limit', type=int, default=20, help="сколько ошибок показать")
+    validate.set_defaults(func=cmd_validate)
+
+    build_qbk = commands.add_parser('build-qbk', help="собрать банк только для чтения из JSON")
+    build_qbk.add_argument('source')
+    build_qbk.add_argument('target')
+    build_qbk.add_argument('--skip-invalid', action='store_true', help="пропустить некорректные вопросы")
+    build_qbk.add_argument('--limit', type=int, default=20, help="сколько ошибок показать")
+    build_qbk.set_defaults(func=cmd_build_qbk)
+
+    sync_serve = commands.add_parser('sync-serve', help="раздать банк для синхронизации по сети")
+    sync_serve.add_argument('data_dir', help="папка с banks.json")
+    sync_serve.add_argument('--bank', help="имя банка (по умолчанию текущий)")
+    sync_serve.add_argument('--host', default='0.0.0.0')
+    sync_serve.add_argument('--port', type=int, default=SYNC_PORT)
+    sync_serve.add_argument('--pin', help="PIN-код для клиентов (по умолчанию случайный)")
+    sync_serve.set_defaults(func=cmd_sync_serve)
+
+    sync = commands.add_parser('sync', help="синхронизировать банк с другим устройством")
+    sync.add_argument('data_dir', help="папка с banks.json")
+    sync.add_argument('url', help="адрес сервера, например http://192.168.1.5:8765")
+    sync.add_argument('--pin', required=True, help="PIN-код, который показывает сервер")
+    sync.add_argument('--bank', help="имя банка (по умолчанию текущий)")
+    sync.set_defaults(func=cmd_sync)
+
+    verify = commands.add_parser('verify', help="проверить банк по контрольным суммам записей")
+    verify.add_argument('data_dir', help="папка с banks.json")
+    verify.add_argument('--bank', help="имя банка (по умолчанию текущий)")
+    verify.add_argument('--repair', action='store_true', help="восстановить испорченные записи")
+    verify.add_argument('--source', action='append', default=[],
+                        help="файл экспорта для поиска копий записей (после снимка банка)")
+    verify.set_defaults(func=cmd_verify)
+
+    classroom = commands.add_parser('classroom', help="сервер экзамена для класса")
+    classroom.add_argument('data_dir', help="папка с banks.json")
+    classroom.add_argument('--bank', help="имя банка (по умолчанию текущий)")
+    classroom.add_argument('--host', default='0.0.0.0')
+    classroom.add_argument('--port', type=int, default=CLASSROOM_PORT)
+    classroom.set_defaults(func=cmd_classroom)
+
+    variants = commands.add_parser('variants', help="сгенерировать варианты билетов для печати")
+    variants.add_argument('data_dir', help="папка с banks.json")
+    variants.add_argument('--bank', help="имя банка (по умолчанию текущий)")
+    variants.add_argument('--count', type=int, default=10, help="число вариантов")
+    variants.add_argument('--size', type=int, default=20, help="вопросов в варианте")
+    variants.add_argument('--balance', choices=BALANCE_MODES, default=BALANCE_TAGS,
+                          help="по чему распределять вопросы между вариантами")
+    variants.add_argument('--tags', help="только вопросы с тегами (через запятую)")
+    variants.add_argument('--match-all', action='store_true', help="вопросы со всеми тегами, а не с любым")
+    variants.add_argument('--seed', type=int, help="зерно генератора для повторяемых вариантов")
+    variants.add_argument('--title', help="заголовок билетов (по умолчанию имя банка)")
+    variants.add_argument('--html', help="файл HTML для печати")
+    variants.add_argument('--json', help="файл JSON")
+    variants.set_defaults(func=cmd_variants)
+
+    hammer = commands.add_parser('hammer', help="проверить одновременную работу с банком из нескольких процессов")
+    hammer.add_argument('--dir', help="пустая папка для банка (по умолчанию временная, удаляется после проверки)")
+    hammer.add_argument('--writers', type=int, default=4)
+    hammer.add_argument('--readers', type=int, default=4)
+    hammer.add_argument('--edits', type=int, default=50, help="сколько вопросов добавляет каждый писатель")
+    hammer.set_defaults(func=cmd_hammer)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
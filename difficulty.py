@@ -0,0 +1,168 @@
+"""Оценка сложности вопросов по истории ответов (модель Раша).
+
+Ответы дописываются в бинарный журнал банка (<файл банка>_answers.bin)
+записями фиксированной длины: id вопроса, номер ученика (сессии) и
+результат. Калибровка читает журнал целиком в массив NumPy и подбирает
+сложности вопросов и уровни учеников совместным методом максимального
+правдоподобия: каждая итерация - шаг Ньютона для всех параметров сразу
+через np.bincount, поэтому миллионы ответов обрабатываются за секунды.
+
+Результат сохраняется в <файл банка>_difficulty.json: для каждого вопроса
+сложность (в логитах, 0 - средний вопрос), различающая способность
+(корреляция ответа с уровнем ученика) и число ответов. NumPy нужен только
+для калибровки (pip install numpy).
+"""
+import os
+import json
+import struct
+import logging
+
+from file_lock import atomic_write
+from question_bank import _file_stat
+
+Logger = logging.getLogger('ExamApp')
+
+ANSWER_LOG_SUFFIX = '_answers.bin'
+DIFFICULTY_SUFFIX = '_difficulty.json'
+RECORD = struct.Struct('<IIB')
+# Вопрос считается трудным для порядка «сначала трудные», если на него ответили
+# хотя бы столько раз и сложность выше средней
+MIN_ANSWERS = 3
+# Штраф за большие значения параметров: вопросы, на которые всегда отвечают
+# верно (или неверно), получают конечную оценку
+RIDGE = 0.1
+
+_loaded = {}
+
+
+class AnswerLog:
+    """Журнал ответов банка; записи копятся в буфере и дописываются пачками"""
+
+    def __init__(self, path, flush_every=1):
+        self.path = path
+        self.flush_every = flush_every
+        self._buffer = bytearray()
+        self._pending = 0
+
+    def record(self, question_id, person, correct):
+        self._buffer += RECORD.pack(question_id, person, 1 if correct else 0)
+        self._pending += 1
+        if self._pending >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        try:
+            with open(self.path, 'ab') as f:
+                f.write(self._buffer)
+        except OSError as e:
+            Logger.error(f"Error writing answer log: {e}")
+            return
+        self._buffer.clear()
+        self._pending = 0
+
+
+def read_answers(path):
+    """Журнал ответов как структурный массив NumPy (question, person, correct)"""
+    import numpy as np
+
+    dtype = np.dtype([('question', '<u4'), ('person', '<u4'), ('correct', 'u1')])
+    if not os.path.exists(path):
+        return np.zeros(0, dtype=dtype)
+    # Неполная последняя запись (например, после сбоя) отбрасывается
+    count = os.path.getsize(path) // RECORD.size
+    return np.fromfile(path, dtype=dtype, count=count)
+
+
+def fit_rasch(items, persons, correct, item_count, person_count, iterations=100, tolerance=1e-3):
+    """Подбирает сложности вопросов и уровни учеников.
+
+    items и persons - номера вопросов и учеников с 0 для каждого ответа,
+    correct - 0/1. Возвращает (сложности, уровни, различающая способность).
+    """
+    import numpy as np
+
+    x = correct.astype(np.float64)
+    difficulty = np.zeros(item_count)
+    ability = np.zeros(person_count)
+
+    for _ in range(iterations):
+        previous = difficulty.copy()
+        p = 1.0 / (1.0 + np.exp(difficulty[items] - ability[persons]))
+        residual = x - p
+        info = p * (1.0 - p)
+        ability_step = ((np.bincount(persons, residual, person_count) - RIDGE * ability)
+                        / (np.bincount(persons, info, person_count) + RIDGE))
+        difficulty_step = ((-np.bincount(items, residual, item_count) - RIDGE * difficulty)
+                           / (np.bincount(items, info, item_count) + RIDGE))
+        ability += np.clip(ability_step, -1.0, 1.0)
+        difficulty += np.clip(difficulty_step, -1.0, 1.0)
+
+        # Шкала определена с точностью до сдвига: средний вопрос - 0
+        shift = difficulty.mean()
+        difficulty -= shift
+        ability -= shift
+        if np.abs(difficulty - previous).max(initial=0) < tolerance:
+            break
+
+    # Различающая способность: корреляция верного ответа с уровнем ученика
+    t = ability[persons]
+    n = np.bincount(items, minlength=item_count).astype(np.float64)
+    mean_x = np.bincount(items, x, item_count) / n
+    mean_t = np.bincount(items, t, item_count) / n
+    cov = np.bincount(items, x * t, item_count) / n - mean_x * mean_t
+    var_x = mean_x - mean_x * mean_x
+    var_t = np.bincount(items, t * t, item_count) / n - mean_t * mean_t
+    with np.errstate(divide='ignore', invalid='ignore'):
+        discrimination = np.nan_to_num(cov / np.sqrt(var_x * var_t))
+    return difficulty, ability, discrimination
+
+
+def calibrate(log_path, result_path):
+    """Калибрует сложности по журналу ответов и сохраняет их. Возвращает число ответов"""
+    import numpy as np
+
+    answers = read_answers(log_path)
+    results = {}
+    if len(answers):
+        question_ids, items = np.unique(answers['question'], return_inverse=True)
+        _, persons = np.unique(answers['person'], return_inverse=True)
+        difficulty, _, discrimination = fit_rasch(
+            items, persons, answers['correct'], len(question_ids), persons.max() + 1)
+        counts = np.bincount(items, minlength=len(question_ids))
+        for question_id, value, disc, count in zip(question_ids.tolist(), difficulty.tolist(),
+                                                   discrimination.tolist(), counts.tolist()):
+            results[str(question_id)] = [round(value, 3), round(disc, 3), count]
+
+    data = {'answers': len(answers), 'questions': results}
+    atomic_write(result_path, lambda f: json.dump(data, f))
+    Logger.info(f"Calibrated {len(results)} questions from {len(answers)} answers")
+    return len(answers)
+
+
+def load_difficulty(path):
+    """Оценки {id: (сложность, различающая способность, ответов)}; перечитываются при изменении файла"""
+    stat = _file_stat(path)
+    cached = _loaded.get(path)
+    if cached is not None and cached[0] == stat:
+        return cached[1]
+
+    estimates = {}
+    if stat is not None:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            estimates = {int(question_id): tuple(values) for question_id, values in data['questions'].items()}
+        except Exception as e:
+            Logger.error(f"Error reading difficulty estimates: {e}")
+    _loaded[path] = (stat, estimates)
+    return estimates
+
+
+def hard_first(estimates):
+    """id трудных вопросов (выше средней сложности) от самого трудного"""
+    hard = [(values[0], question_id) for question_id, values in estimates.items()
+            if values[0] > 0 and values[2] >= MIN_ANSWERS]
+    hard.sort(reverse=True)
+    return [question_id for _, question_id in hard]
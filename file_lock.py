@@ -0,0 +1,134 @@
+"""Согласованная запись файлов банков из нескольких процессов.
+
+Писатели берут исключительную рекомендательную блокировку на файле
+<файл банка>.lock (fcntl.flock на Linux, Android и macOS, msvcrt.locking
+на Windows) и после записи увеличивают счетчик версий в <файл банка>.version.
+Файлы пишутся во временный файл рядом и подменяются через os.replace,
+поэтому читатели не берут блокировок, не ждут друг друга и всегда видят
+файл целиком - старый или новый.
+"""
+import os
+import time
+import tempfile
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+LOCK_SUFFIX = '.lock'
+VERSION_SUFFIX = '.version'
+# Сколько секунд ждать, пока другой процесс закончит запись
+LOCK_TIMEOUT = 10.0
+LOCK_POLL_INTERVAL = 0.01
+
+
+def _try_lock(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    elif msvcrt is not None:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+
+
+def _unlock(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    elif msvcrt is not None:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class FileLock:
+    """Исключительная блокировка записи файла path между процессами"""
+
+    def __init__(self, path, timeout=LOCK_TIMEOUT):
+        self.path = path
+        self.timeout = timeout
+        self._file = None
+
+    def acquire(self):
+        dir_name = os.path.dirname(self.path)
+        if dir_name and not os.path.exists(dir_name):
+            os.makedirs(dir_name, exist_ok=True)
+        self._file = open(self.path + LOCK_SUFFIX, 'a+b')
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                _try_lock(self._file)
+                return
+            except OSError:
+                if time.monotonic() >= deadline:
+                    self._file.close()
+                    self._file = None
+                    raise TimeoutError(f"Файл занят другим процессом: {self.path}")
+                time.sleep(LOCK_POLL_INTERVAL)
+
+    def release(self):
+        if self._file is not None:
+            try:
+                _unlock(self._file)
+            finally:
+                self._file.close()
+                self._file = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+def _file_mode(path):
+    """Права для нового содержимого path: как у старого файла, иначе по umask"""
+    try:
+        return os.stat(path).st_mode & 0o7777
+    except OSError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+def atomic_write(path, write, mode='w'):
+    """Записывает файл через временный файл и os.replace.
+
+    write(f) записывает содержимое в открытый временный файл. Права файла
+    сохраняются: mkstemp создает временный файл с правами 0600.
+    """
+    dir_name = os.path.dirname(path) or '.'
+    if not os.path.exists(dir_name):
+        os.makedirs(dir_name, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=dir_name, prefix=os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, mode, **({} if 'b' in mode else {'encoding': 'utf-8'})) as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(temp_path, _file_mode(path))
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def read_version(path):
+    """Счетчик версий файла path (0, если файл еще не записывался под блокировкой)"""
+    try:
+        with open(path + VERSION_SUFFIX, 'r', encoding='utf-8') as f:
+            return int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        return 0
+
+
+def bump_version(path):
+    """Увеличивает счетчик версий; вызывается под FileLock после записи файла"""
+    version = read_version(path) + 1
+    atomic_write(path + VERSION_SUFFIX, lambda f: f.write(str(version)))
+    return version
@@ -0,0 +1,243 @@
+"""Импорт вопросов из CSV/TSV и простой текстовой разметки.
+
+CSV/TSV: одна строка - один вопрос. Столбцы по порядку: вопрос, номера
+правильных вариантов (например "1,3" или "1;3"), затем варианты ответов.
+Если первая строка - заголовок ("вопрос"/"question", "правильные"/"correct",
+"теги"/"tags"), столбцы определяются по нему.
+
+Текстовая разметка: вопросы разделяются пустой строкой, первая строка -
+текст вопроса, строки вариантов начинаются с "+" (правильный) или "-"
+(неправильный), строка "#" задает теги через запятую:
+
+    Столица Франции?
+    # география
+    + Париж
+    - Лион
+
+Большие файлы разбиваются на куски по границам записей; куски проверяются
+и выдаются по мере разбора (iter_import). Консольные утилиты разбирают
+куски параллельно в пуле процессов (spawn: fork многопоточного процесса
+небезопасен), приложение - по очереди в фоновом потоке, так как при spawn
+дочерний процесс заново импортировал бы main.py вместе с окном Kivy.
+"""
+import csv
+import io
+import os
+import re
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from question_bank import Question, parse_tags
+from validation import validate_records
+
+Logger = logging.getLogger('ExamApp')
+
+# Сколько строк файла разбирает один процесс
+CHUNK_LINES = 5000
+# Расширения файлов, которые понимает импорт
+IMPORT_EXTENSIONS = ('.csv', '.tsv', '.tab', '.txt')
+
+_HEADER_NAMES = {
+    'question': 'question', 'вопрос': 'question',
+    'correct': 'correct', 'правильные': 'correct', 'правильный': 'correct', 'ответ': 'correct',
+    'tags': 'tags', 'теги': 'tags',
+}
+
+
+def split_text_chunks(lines, chunk_lines=CHUNK_LINES):
+    """Делит строки текстовой разметки на куски по пустым строкам между вопросами"""
+    chunks = []
+    start = 0
+    while start < len(lines):
+        end = min(start + chunk_lines, len(lines))
+        # Дотягиваем кусок до конца вопроса
+        while end < len(lines) and lines[end].strip():
+            end += 1
+        chunks.append((start + 1, lines[start:end]))
+        start = end
+    return chunks
+
+
+def split_csv_chunks(lines, chunk_lines=CHUNK_LINES):
+    """Делит строки CSV на куски, не разрывая значения в кавычках с переводами строк"""
+    chunks = []
+    start = 0
+    inside_quotes = False
+    for number, line in enumerate(lines):
+        if line.count('"') % 2:
+            inside_quotes = not inside_quotes
+        if not inside_quotes and number + 1 - start >= chunk_lines:
+            chunks.append((start + 1, lines[start:number + 1]))
+            start = number + 1
+    if start < len(lines):
+        chunks.append((start + 1, lines[start:]))
+    return chunks
+
+
+def _correct_numbers(value):
+    """Номера правильных вариантов из строки вида "1,3", "1; 3" или "1 3" """
+    return re.findall(r'\d+', value)
+
+
+def parse_text_chunk(args):
+    """Разбирает кусок текстовой разметки. Возвращает (записи, ошибки)"""
+    first_line, lines = args
+    records = []
+    errors = []
+    block = []
+
+    def flush():
+        if not block:
+            return
+        line_number, question_text = block[0]
+        record = {'question': question_text, 'options': [], 'correct': []}
+        tags = []
+        for number, line in block[1:]:
+            if line.startswith('+') or line.startswith('-'):
+                record['options'].append(line[1:].strip())
+                if line.startswith('+'):
+                    record['correct'].append(str(len(record['options'])))
+            elif line.startswith('#'):
+                tags.extend(parse_tags(line[1:]))
+            else:
+                errors.append((number, f"Непонятная строка: {line[:40]}"))
+        if tags:
+            record['tags'] = tags
+        records.append((line_number, record))
+        block.clear()
+
+    for offset, line in enumerate(lines):
+        line = line.strip()
+        if line:
+            block.append((first_line + offset, line))
+        else:
+            flush()
+    flush()
+    return records, errors
+
+
+def parse_csv_chunk(args):
+    """Разбирает кусок CSV/TSV. Возвращает (записи, ошибки)"""
+    first_line, lines, delimiter, columns = args
+    records = []
+    errors = []
+    reader = csv.reader(io.StringIO('\n'.join(lines)), delimiter=delimiter)
+    for row in reader:
+        line_number = first_line + reader.line_num - 1
+        if not any(cell.strip() for cell in row):
+            continue
+
+        question_text = ''
+        correct = []
+        tags = []
+        options = []
+        for index, cell in enumerate(row):
+            cell = cell.strip()
+            kind = columns[index] if index < len(columns) else 'option'
+            if kind == 'question':
+                question_text = cell
+            elif kind == 'correct':
+                correct = _correct_numbers(cell)
+            elif kind == 'tags':
+                tags = parse_tags(cell)
+            elif cell:
+                options.append(cell)
+
+        if not question_text:
+            errors.append((line_number, "Пустой текст вопроса"))
+            continue
+        record = {'question': question_text, 'options': options, 'correct': correct}
+        if tags:
+            record['tags'] = tags
+        records.append((line_number, record))
+    return records, errors
+
+
+def _csv_layout(first_line, delimiter):
+    """Определяет назначение столбцов и есть ли строка заголовка"""
+    header = next(csv.reader([first_line], delimiter=delimiter), [])
+    columns = [_HEADER_NAMES.get(cell.strip().lower(), 'option') for cell in header]
+    if 'question' in columns:
+        return columns, True
+    return ['question', 'correct'], False
+
+
+def _run_chunks(parser, tasks, workers, progress):
+    """Выдает результаты разбора кусков по порядку по мере готовности.
+
+    workers=1 - разбор по очереди в текущем процессе, иначе в пуле процессов
+    spawn; если пул недоступен, куски тоже разбираются по очереди.
+    """
+    done = 0
+    if len(tasks) > 1 and workers != 1:
+        try:
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+                futures = [pool.submit(parser, task) for task in tasks]
+                for future in futures:
+                    result = future.result()
+                    done += 1
+                    if progress:
+                        progress(done, len(tasks))
+                    yield result
+            return
+        except (OSError, ImportError, NotImplementedError) as e:
+            # Например, на Android нет поддержки семафоров для multiprocessing
+            if done:
+                raise
+            Logger.warning(f"Process pool unavailable, parsing sequentially: {e}")
+
+    for task in tasks:
+        result = parser(task)
+        done += 1
+        if progress:
+            progress(done, len(tasks))
+        yield result
+
+
+def iter_import(path, progress=None, workers=None):
+    """Разбирает файл CSV/TSV/текста и выдает (вопросы, ошибки) каждого куска.
+
+    Куски проверяются и выдаются по мере разбора, поэтому сырые записи
+    всего файла не держатся в памяти. progress(готово_кусков, всего_кусков)
+    вызывается по мере разбора. Ошибки - список пар (номер строки, сообщение).
+    """
+    ext = os.path.splitext(path)[1].lower()
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        lines = f.read().splitlines()
+
+    if ext == '.txt':
+        parser = parse_text_chunk
+        tasks = split_text_chunks(lines)
+    else:
+        if ext in ('.tsv', '.tab'):
+            delimiter = '\t'
+        else:
+            # Excel с русской локалью сохраняет CSV через точку с запятой
+            first = lines[0] if lines else ''
+            delimiter = ';' if first.count(';') > first.count(',') else ','
+        columns, has_header = _csv_layout(lines[0] if lines else '', delimiter)
+        skip = 1 if has_header else 0
+        parser = parse_csv_chunk
+        tasks = [(start + skip, chunk, delimiter, columns)
+                 for start, chunk in split_csv_chunks(lines[skip:])]
+
+    Logger.info(f"Importing {path}: {len(lines)} lines in {len(tasks)} chunks")
+    for chunk_records, chunk_errors in _run_chunks(parser, tasks, workers, progress):
+        # Те же проверки, что и для импорта JSON; номера в отчете - строки файла
+        report = validate_records([record for _, record in chunk_records],
+                                  [line_number for line_number, _ in chunk_records])
+        errors = chunk_errors + [(error.record, error.message) for error in report.errors]
+        errors.sort(key=lambda error: error[0])
+        yield [Question.from_dict(record) for record in report.valid], errors
+
+
+def import_file(path, progress=None, workers=None):
+    """Разбирает файл CSV/TSV/текста и возвращает (вопросы, ошибки) всего файла"""
+    questions = []
+    errors = []
+    for chunk_questions, chunk_errors in iter_import(path, progress, workers):
+        questions.extend(chunk_questions)
+        errors.extend(chunk_errors)
+    return questions, errors
@@ -0,0 +1,386 @@
+"""Контроль целостности банков: контрольные суммы записей и точечное восстановление.
+
+Для каждого вопроса хранится контрольная сумма его записи (8 байт BLAKE2b
+от канонического JSON), для банка - общая сумма: XOR сумм всех записей.
+Суммы лежат рядом с банком в <файл банка>.sums и при правке пересчитываются
+только для затронутых вопросов, а общая сумма меняется на XOR старой и
+новой суммы записи.
+
+Проверка (verify_bank) разбирает файл банка по записям: испорченная запись
+не мешает прочитать остальные, а в отчет попадают ее номер и id (если он
+читается), записи с несовпавшей суммой и пропавшие записи. После проверки
+без ошибок файл копируется в снимок <файл банка>.snapshot.
+
+Восстановление (repair_bank) ищет для каждой такой записи копию с той же
+контрольной суммой в снимке и в файлах экспорта и возвращает только эти
+записи, одной правкой, которую можно отменить.
+"""
+import os
+import re
+import json
+import hashlib
+import logging
+
+from file_lock import FileLock, atomic_write
+from question_bank import Question
+
+Logger = logging.getLogger('ExamApp')
+
+CHECKSUM_SUFFIX = '.sums'
+SNAPSHOT_SUFFIX = '.snapshot'
+# Строки, которыми write_bank_file (indent=2) открывает и закрывает записи
+_RECORD_START = '  {'
+_RECORD_ENDS = ('  }', '  },')
+_ID_PATTERN = re.compile(r'"id"\s*:\s*(\d+)')
+
+
+def checksum_path(bank_path):
+    return bank_path + CHECKSUM_SUFFIX
+
+
+def snapshot_path(bank_path):
+    return bank_path + SNAPSHOT_SUFFIX
+
+
+def record_checksum(record):
+    """Контрольная сумма записи вопроса (словарь Question.to_dict())"""
+    data = json.dumps(record, ensure_ascii=False, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'little')
+
+
+class ChecksumStore:
+    """Контрольные суммы записей банка {id: сумма} и общая сумма банка"""
+
+    def __init__(self, bank_path):
+        self.path = checksum_path(bank_path)
+        self.records = {}
+        self.total = 0
+        # Общая сумма банка на момент последнего снимка
+        self.snapshot_total = None
+        self.exists = False
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.records = {int(key): int(value, 16) for key, value in data['records'].items()}
+            self.total = int(data['total'], 16)
+            if data.get('snapshot') is not None:
+                self.snapshot_total = int(data['snapshot'], 16)
+            self.exists = True
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            Logger.error(f"Ignoring unreadable checksum file {self.path}: {e}")
+            self.records = {}
+            self.total = 0
+
+    def set(self, question_id, checksum):
+        if not isinstance(question_id, int):
+            raise ValueError(f"Контрольная сумма без id вопроса: {question_id!r}")
+        old = self.records.get(question_id)
+        if old is not None:
+            self.total ^= old
+        self.records[question_id] = checksum
+        self.total ^= checksum
+
+    def discard(self, question_id):
+        old = self.records.pop(question_id, None)
+        if old is not None:
+            self.total ^= old
+
+    def update(self, questions, ids):
+        """Пересчитывает суммы вопросов с id из ids; тех, кого нет в банке, убирает"""
+        ids = set(ids)
+        found = set()
+        for question in questions:
+            if question.id in ids:
+                self.set(question.id, record_checksum(question.to_dict()))
+                found.add(question.id)
+        for question_id in ids - found:
+            self.discard(question_id)
+
+    def rebuild(self, questions):
+        """Пересчитывает суммы всего банка"""
+        self.records = {}
+        self.total = 0
+        for question in questions:
+            self.set(question.id, record_checksum(question.to_dict()))
+
+    def save(self):
+        data = {
+            'total': f'{self.total:016x}',
+            'snapshot': None if self.snapshot_total is None else f'{self.snapshot_total:016x}',
+            'records': {str(question_id): f'{checksum:016x}' for question_id, checksum in self.records.items()},
+        }
+        atomic_write(self.path, lambda f: json.dump(data, f))
+        self.exists = True
+
+
+def update_checksums(bank_path, questions, changed_ids=None):
+    """Обновляет суммы после записи банка; вызывается под FileLock банка.
+
+    changed_ids - id добавленных, измененных и удаленных вопросов; None -
+    банк переписан целиком. Если сумм еще нет, они считаются по всему банку.
+    """
+    store = ChecksumStore(bank_path)
+    if changed_ids is None or not store.exists:
+        store.rebuild(questions)
+    else:
+        store.update(questions, changed_ids)
+    store.save()
+
+
+class DamagedRecord:
+    """Запись файла банка, которую не удалось прочитать"""
+    __slots__ = ('position', 'id', 'reason')
+
+    def __init__(self, position, id, reason):
+        self.position = position
+        self.id = id
+        self.reason = reason
+
+
+def _split_records(text):
+    """Делит текст банка в формате write_bank_file на тексты записей.
+
+    Возвращает None, если файл записан в другом формате.
+    """
+    records = []
+    current = None
+    for line in text.split('\n'):
+        line = line.rstrip('\r')
+        if line == _RECORD_START:
+            if current is not None:
+                # Конец предыдущей записи потерян: она попадет в испорченные
+                records.append('\n'.join(current))
+            current = ['{']
+        elif current is not None and line in _RECORD_ENDS:
+            current.append('}')
+            records.append('\n'.join(current))
+            current = None
+        elif current is not None:
+            current.append(line)
+    if current is not None:
+        records.append('\n'.join(current))
+    return records or None
+
+
+def _guess_id(item):
+    if isinstance(item, dict):
+        question_id = item.get('id')
+        return question_id if isinstance(question_id, int) else None
+    match = _ID_PATTERN.search(item)
+    return int(match.group(1)) if match else None
+
+
+def parse_bank_text(text):
+    """Разбирает текст файла банка по записям.
+
+    Возвращает (вопросы, испорченные записи). Если не разбирается сам
+    список, записи выделяются по строкам формата write_bank_file. Записям
+    без id назначаются те же id, что и при загрузке банка.
+    """
+    if not text.strip():
+        return [], []
+    try:
+        items = json.loads(text)
+        if not isinstance(items, list):
+            return [], [DamagedRecord(None, None, "файл банка не содержит списка вопросов")]
+    except ValueError as e:
+        items = _split_records(text)
+        if items is None:
+            return [], [DamagedRecord(None, None, f"файл не читается: {e}")]
+
+    questions = []
+    damaged = []
+    slots = []
+    for position, item in enumerate(items):
+        try:
+            record = json.loads(item) if isinstance(item, str) else item
+            question = Question.from_dict(record)
+            if not isinstance(question.text, str) or not all(isinstance(o, str) for o in question.options):
+                raise ValueError("неверный тип поля")
+            questions.append(question)
+            slots.append(question)
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            damaged.append(DamagedRecord(position, _guess_id(item), str(e) or type(e).__name__))
+            slots.append(damaged[-1])
+    _assign_ids(slots)
+    return questions, damaged
+
+
+def _assign_ids(slots):
+    """Назначает id по порядку записей, как assign_ids.
+
+    Испорченные записи тоже получают свой номер: id остальных записей
+    старого банка без id не сдвигаются, а испорченную запись можно найти
+    в снимке по ее id.
+    """
+    next_id = max((slot.id for slot in slots if isinstance(slot.id, int)), default=0) + 1
+    for slot in slots:
+        if not isinstance(slot.id, int):
+            slot.id = next_id
+            next_id += 1
+
+
+def read_bank_tolerant(path):
+    """Читает файл банка, пропуская испорченные записи"""
+    if not os.path.exists(path):
+        return [], []
+    with open(path, 'rb') as f:
+        return parse_bank_text(f.read().decode('utf-8', errors='replace'))
+
+
+class IntegrityReport:
+    """Результат проверки банка"""
+
+    def __init__(self, bank_path):
+        self.bank_path = bank_path
+        self.checked = 0
+        self.total = 0
+        # Испорченные записи (DamagedRecord), id записей с несовпавшей суммой,
+        # пропавших записей и записей, для которых суммы еще нет
+        self.damaged = []
+        self.mismatched = []
+        self.missing = []
+        self.unverified = []
+        self.expected = {}
+        self.created = False
+        self.snapshot_saved = False
+
+    @property
+    def ok(self):
+        return not (self.damaged or self.mismatched or self.missing)
+
+    def problem_ids(self):
+        """id записей, которые можно попробовать восстановить"""
+        ids = [record.id for record in self.damaged if record.id is not None]
+        ids.extend(self.mismatched)
+        ids.extend(self.missing)
+        return list(dict.fromkeys(ids))
+
+    def summary(self):
+        lines = [f"Проверено записей: {self.checked}", f"Контрольная сумма банка: {self.total:016x}"]
+        if self.created:
+            lines.append("Контрольные суммы созданы")
+        for record in self.damaged:
+            where = f"запись №{record.position + 1}" if record.position is not None else "файл"
+            label = f" (id {record.id})" if record.id is not None else ""
+            lines.append(f"Испорчена {where}{label}: {record.reason}")
+        if self.mismatched:
+            lines.append(f"Не совпала сумма: id {', '.join(map(str, self.mismatched))}")
+        if self.missing:
+            lines.append(f"Пропали: id {', '.join(map(str, self.missing))}")
+        if self.unverified:
+            lines.append(f"Без контрольной суммы: {len(self.unverified)}")
+        if self.ok:
+            lines.append("Ошибок не найдено")
+        return '\n'.join(lines)
+
+
+def verify_bank(bank_path, snapshot=True):
+    """Проверяет банк по контрольным суммам записей.
+
+    Под блокировкой банка читаются только файл и суммы, разбор идет уже
+    без нее, поэтому проверку можно запускать в фоновом потоке. Если
+    ошибок нет, файл сохраняется в снимок для восстановления.
+    """
+    with FileLock(bank_path):
+        raw = b''
+        if os.path.exists(bank_path):
+            with open(bank_path, 'rb') as f:
+                raw = f.read()
+        store = ChecksumStore(bank_path)
+
+    questions, damaged = parse_bank_text(raw.decode('utf-8', errors='replace'))
+    report = IntegrityReport(bank_path)
+    report.checked = len(questions) + len(damaged)
+    report.damaged = damaged
+
+    if not store.exists:
+        if not damaged:
+            store.rebuild(questions)
+            with FileLock(bank_path):
+                # Пока шел разбор, суммы мог создать писатель: его суммы свежее
+                if not ChecksumStore(bank_path).exists:
+                    store.save()
+                    report.created = True
+        report.total = store.total
+        return report
+
+    seen = set()
+    total = 0
+    for question in questions:
+        checksum = record_checksum(question.to_dict())
+        total ^= checksum
+        seen.add(question.id)
+        expected = store.records.get(question.id)
+        if expected is None:
+            report.unverified.append(question.id)
+        elif expected != checksum:
+            report.mismatched.append(question.id)
+    damaged_ids = {record.id for record in damaged}
+    report.missing = [question_id for question_id in store.records
+                      if question_id not in seen and question_id not in damaged_ids]
+    report.expected = {question_id: store.records[question_id] for question_id in report.problem_ids()
+                       if question_id in store.records}
+    report.total = total
+
+    if report.ok and snapshot and total == store.total and store.snapshot_total != total:
+        report.snapshot_saved = _save_snapshot(bank_path, raw, total)
+    return report
+
+
+def _save_snapshot(bank_path, raw, total):
+    """Сохраняет проверенное содержимое банка в снимок, если банк с тех пор не менялся"""
+    with FileLock(bank_path):
+        store = ChecksumStore(bank_path)
+        if store.total != total:
+            return False
+        atomic_write(snapshot_path(bank_path), lambda f: f.write(raw), 'wb')
+        store.snapshot_total = total
+        store.save()
+    Logger.info(f"Saved verified snapshot of {bank_path}")
+    return True
+
+
+def find_records(expected, sources):
+    """Ищет в файлах sources записи {id: сумма} с совпадающей контрольной суммой.
+
+    Возвращает {id: (позиция в источнике, запись)}. Источники
+    просматриваются по порядку; запись из чужого банка с тем же id не
+    подойдет: не совпадет сумма.
+    """
+    found = {}
+    for source in sources:
+        if len(found) == len(expected):
+            break
+        if not source or not os.path.exists(source):
+            continue
+        questions, _ = read_bank_tolerant(source)
+        for position, question in enumerate(questions):
+            if question.id in expected and question.id not in found:
+                record = question.to_dict()
+                if record_checksum(record) == expected[question.id]:
+                    found[question.id] = (position, record)
+    return found
+
+
+def repair_bank(catalog, report, extra_sources=()):
+    """Восстанавливает испорченные и пропавшие записи выбранного банка.
+
+    Записи ищутся в снимке банка, затем в extra_sources (файлы экспорта).
+    Возвращает (число восстановленных, id записей, для которых копии не нашлось).
+    """
+    sources = [snapshot_path(report.bank_path)]
+    sources.extend(extra_sources)
+    found = find_records(report.expected, sources)
+
+    # Испорченная запись возвращается на свое место, пропавшая - на место в источнике
+    positions = {record.id: record.position for record in report.damaged if record.id is not None}
+    items = [[positions.get(question_id, source_position), record]
+             for question_id, (source_position, record) in found.items()]
+    if items:
+        catalog.restore_records(items)
+    not_found = [question_id for question_id in report.problem_ids() if question_id not in found]
+    Logger.info(f"Restored {len(items)} records of {report.bank_path}, not found: {len(not_found)}")
+    return len(items), not_found
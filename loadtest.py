@@ -0,0 +1,129 @@
+"""Нагрузочный тест сервера экзамена для класса (classroom_server.py).
+
+Запускает заданное число учеников, каждый в своем keep-alive соединении
+создает сессию и отвечает на вопросы случайными вариантами. Печатает
+пропускную способность и процентили задержки запросов.
+
+    python cli.py classroom data_dir --port 8080
+    python loadtest.py --clients 100 --questions 20
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+
+from classroom_server import CLASSROOM_PORT
+
+
+class HttpConnection:
+    """Минимальный HTTP/1.1-клиент с keep-alive поверх asyncio"""
+
+    def __init__(self, reader, writer, host):
+        self.reader = reader
+        self.writer = writer
+        self.host = host
+
+    @classmethod
+    async def open(cls, host, port):
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer, host)
+
+    async def call(self, method, path, body=None):
+        data = json.dumps(body).encode('utf-8') if body is not None else b''
+        self.writer.write((f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+                           f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n").encode('latin-1')
+                          + data)
+        await self.writer.drain()
+
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            if name.strip().lower() == 'content-length':
+                length = int(value)
+        payload = json.loads(await self.reader.readexactly(length)) if length else {}
+        if status != 200:
+            raise RuntimeError(f"{method} {path}: {status} {payload}")
+        return payload
+
+    def close(self):
+        self.writer.close()
+
+
+class LoadStats:
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self.sessions = 0
+
+    async def timed(self, connection, method, path, body=None):
+        start = time.perf_counter()
+        try:
+            return await connection.call(method, path, body)
+        finally:
+            self.latencies.append(time.perf_counter() - start)
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+async def student(host, port, questions, tags, stats):
+    """Один ученик: сессия и ответы на questions вопросов"""
+    try:
+        connection = await HttpConnection.open(host, port)
+    except OSError:
+        stats.errors += 1
+        return
+    try:
+        session = (await stats.timed(connection, 'POST', '/session', {'tags': tags}))['session']
+        stats.sessions += 1
+        for _ in range(questions):
+            question = await stats.timed(connection, 'GET', f'/session/{session}/question')
+            if question.get('done'):
+                break
+            selected = random.sample(range(len(question['options'])), 1)
+            await stats.timed(connection, 'POST', f'/session/{session}/answer', {'selected': selected})
+    except (OSError, RuntimeError, asyncio.IncompleteReadError, ValueError):
+        stats.errors += 1
+    finally:
+        connection.close()
+
+
+async def run(args):
+    stats = LoadStats()
+    start = time.perf_counter()
+    await asyncio.gather(*(student(args.host, args.port, args.questions, args.tags, stats)
+                           for _ in range(args.clients)))
+    return stats, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Нагрузочный тест сервера экзамена для класса")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=CLASSROOM_PORT)
+    parser.add_argument('--clients', type=int, default=100, help="сколько учеников одновременно")
+    parser.add_argument('--questions', type=int, default=20, help="сколько вопросов решает каждый")
+    parser.add_argument('--tags', nargs='*', default=[], help="фильтр по тегам")
+    args = parser.parse_args(argv)
+
+    stats, elapsed = asyncio.run(run(args))
+    latencies = sorted(stats.latencies)
+    print(f"Учеников: {args.clients}, сессий: {stats.sessions}, ошибок: {stats.errors}")
+    print(f"Запросов: {len(latencies)} за {elapsed:.2f} с, {len(latencies) / elapsed:.0f} запросов/с")
+    print("Задержка, мс: " + ", ".join(
+        f"p{int(fraction * 100)} {percentile(latencies, fraction) * 1000:.1f}" for fraction in (0.5, 0.9, 0.99))
+        + f", max {latencies[-1] * 1000 if latencies else 0:.1f}")
+    return 1 if stats.errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -8,14 +8,36 @@ from kivy.uix.scrollview import ScrollView
 from kivy.uix.tabbedpanel import TabbedPanel, TabbedPanelItem
 from kivy.core.window import Window
 from kivy.uix.popup import Popup
+from kivy.uix.spinner import Spinner
+from kivy.uix.image import Image
+from kivy.core.image import ImageData, ImageLoader
+from kivy.clock import Clock
 from kivy.metrics import dp
 from kivy.properties import NumericProperty
 from kivy.utils import platform
 from kivy.config import Config
 from kivy.graphics import Color, Rectangle
-import random
+from kivy.graphics.texture import Texture
+from collections import OrderedDict
 import os
+import math
 import json
+import random
+import gc
+import queue
+import threading
+
+from question_bank import (BankCatalog, HardFirstDeck, Question, RandomDeck, ReviewDeck, find_position,
+                           is_answer_correct, parse_tags, questions_from_dicts, questions_to_dicts, shuffle_options)
+from bank_cache import flush_rebuilds
+from difficulty import ANSWER_LOG_SUFFIX, DIFFICULTY_SUFFIX, AnswerLog, calibrate, hard_first, load_difficulty
+from mapped_bank import MAPPED_EXTENSION
+from importers import IMPORT_EXTENSIONS, import_file
+from integrity import repair_bank, verify_bank
+from sync import SYNC_PORT, SyncServer, local_address, sync_with
+from validation import MAX_OPTIONS, MIN_OPTIONS, validate_record, validate_records
+from variants import (BALANCE_DIFFICULTY, BALANCE_NONE, BALANCE_TAGS, VARIANTS_HTML_FILENAME, VARIANTS_JSON_FILENAME,
+                      HtmlVariantWriter, JsonVariantWriter, bank_groups, generate_variants, stream_variants)
 
 # Настройки логирования
 import logging
@@ -31,6 +53,41 @@ POPUP_TITLE_INFO = "Информация"
 POPUP_TITLE_ERROR = "Ошибка"
 # Константа для заголовков успешных действий
 POPUP_TITLE_SUCCESS = "Успех"
+# Устройства с таким объемом памяти и меньше работают в режиме экономии памяти
+LOW_MEMORY_DEVICE_BYTES = 2560 * 1024 * 1024
+# Сколько вопросов показывать на странице списка в режиме экономии памяти
+EDIT_PAGE_SIZE = 200
+
+
+def _detect_low_memory():
+    """Режим экономии памяти: EXAM_LOW_MEMORY=1 или 0, иначе по объему памяти устройства"""
+    setting = os.environ.get('EXAM_LOW_MEMORY')
+    if setting in ('0', '1'):
+        return setting == '1'
+    try:
+        # /proc/meminfo есть и на Android, и на Linux
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemTotal:'):
+                    return int(line.split()[1]) * 1024 <= LOW_MEMORY_DEVICE_BYTES
+    except (OSError, ValueError):
+        pass
+    return False
+
+
+# Режим экономии памяти: один общий список вопросов, список редактирования по страницам
+# и только на видимой вкладке, меньшие кэши
+LOW_MEMORY = _detect_low_memory()
+# Лимит памяти под текстуры изображений вопросов
+IMAGE_CACHE_BYTES = (8 if LOW_MEMORY else 32) * 1024 * 1024
+# Размер заглушки вместо картинки, которую не удалось декодировать
+PLACEHOLDER_SIZE = (64, 48)
+# Лимит памяти под отрисованные тексты вопросов и вариантов
+LABEL_CACHE_BYTES = (4 if LOW_MEMORY else 16) * 1024 * 1024
+# Сколько измеренных высот текста помнить
+LABEL_HEIGHT_CACHE_SIZE = 2000
+# Отладка раскладки: EXAM_LAYOUT_DEBUG=1 выводит число проходов раскладки на нажатия клавиш
+LAYOUT_DEBUG = os.environ.get('EXAM_LAYOUT_DEBUG') == '1'
 
 # Настройки окна
 Config.set('graphics', 'resizable', '1')
@@ -63,36 +120,28 @@ else:
     QUESTIONS_FILE = QUESTIONS_FILENAME
 
 
-def load_questions():
-    """Загружает вопросы из файла"""
+# Каталог банков вопросов хранится рядом с основным файлом вопросов
+DATA_DIR = os.path.dirname(QUESTIONS_FILE)
+bank_catalog = BankCatalog(DATA_DIR, os.path.basename(QUESTIONS_FILE))
+
+
+def load_questions(shared=LOW_MEMORY):
+    """Загружает вопросы выбранного банка.
+
+    shared=True возвращает общий список банка без копии: его можно только
+    читать. В режиме экономии памяти его получают все вкладки.
+    """
     try:
-        Logger.info(f"Loading questions from: {QUESTIONS_FILE}")
-        if os.path.exists(QUESTIONS_FILE) and os.path.getsize(QUESTIONS_FILE) > 0:
-            with open(QUESTIONS_FILE, 'r', encoding='utf-8') as f:
-                questions = json.load(f)
-            Logger.info(f"Loaded {len(questions)} questions")
-            return questions
-        Logger.info("No questions file found or file is empty")
-        return []
+        return bank_catalog.load(shared=shared)
     except Exception as e:
         Logger.error(f"Error loading questions: {e}")
         return []
 
 
 def save_questions(questions):
-    """Сохраняет вопросы в файл"""
+    """Сохраняет вопросы выбранного банка"""
     try:
-        Logger.info(f"Saving {len(questions)} questions to: {QUESTIONS_FILE}")
-        # Создаем директорию, если она не существует
-        dir_name = os.path.dirname(QUESTIONS_FILE)
-        if dir_name and not os.path.exists(dir_name):
-            os.makedirs(dir_name)
-
-        with open(QUESTIONS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(questions, f, ensure_ascii=False, indent=2)
-
-        # Проверяем, что файл был создан и содержит данные
-        if os.path.exists(QUESTIONS_FILE) and os.path.getsize(QUESTIONS_FILE) > 0:
+        if bank_catalog.save(questions):
             Logger.info("Questions saved successfully")
             return True
         else:
@@ -103,28 +152,189 @@ def save_questions(questions):
         return False
 
 
+def downloads_dir():
+    """Папка Загрузки: на Android - общая папка Download, иначе ~/Downloads"""
+    if platform == 'android':
+        from android.storage import primary_external_storage_path  # type: ignore
+        return os.path.join(primary_external_storage_path(), "Download")
+    return os.path.join(os.path.expanduser("~"), 'Downloads')
+
+
+def apply_edit(operation, *args):
+    """Выполняет правку банка через каталог (с записью в историю отмены)"""
+    try:
+        operation(*args)
+        return True
+    except Exception as e:
+        Logger.error(f"Error editing questions: {e}")
+        return False
+
+
+def run_on_main_thread(fn):
+    """Выполняет fn в главном потоке Kivy и ждет результата (для фоновых потоков)"""
+    done = threading.Event()
+    result = {}
+
+    def run(dt):
+        try:
+            result['value'] = fn()
+        except Exception as e:
+            result['error'] = e
+        done.set()
+
+    Clock.schedule_once(run)
+    done.wait()
+    if 'error' in result:
+        raise result['error']
+    return result['value']
+
+
+class LayoutScheduler:
+    """Откладывает пересчет высот полей ввода до следующего кадра.
+
+    При каждом изменении текста поле только помечается как измененное, а все
+    высоты выставляются одним проходом за кадр через Clock-триггер, сколько
+    бы клавиш ни было нажато между кадрами.
+    """
+
+    def __init__(self):
+        self._dirty = {}
+        self._trigger = Clock.create_trigger(self._resolve)
+        self.keystrokes = 0
+        self.passes = 0
+
+    def mark_dirty(self, widget):
+        self._dirty[widget] = True
+        self.keystrokes += 1
+        self._trigger()
+
+    def _resolve(self, dt):
+        dirty = self._dirty
+        self._dirty = {}
+        writes = 0
+        for widget in dirty:
+            writes += widget.apply_height()
+        self.passes += 1
+
+        if LAYOUT_DEBUG:
+            Logger.debug(f"Layout pass {self.passes}: {self.keystrokes} text changes, "
+                         f"{len(dirty)} widgets, {writes} height writes")
+        self.keystrokes = 0
+
+
+layout_scheduler = LayoutScheduler()
+
+
 # Кастомное текстовое поле с автоматическим изменением высоты
 class AutoHeightTextInput(TextInput):
     min_height = NumericProperty(dp(40))
 
+    # Высота по количеству строк и метрикам шрифта
+    _height_cache = {}
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.bind(text=self.on_text_change)
         self.height = self.min_height
 
     def on_text_change(self, instance, value):
-        # Вычисляем необходимую высоту на основе текста
-        lines = len(self._lines)
-        line_height = self.line_height + self.line_spacing
-        new_height = max(self.min_height, lines * line_height + self.padding[1] + self.padding[3])
+        # Высоту пересчитываем один раз за кадр
+        layout_scheduler.mark_dirty(self)
 
-        if new_height != self.height:
-            self.height = new_height
-            # Обновляем layout родительского контейнера
-            if self.parent:
-                self.parent.height = new_height
-                if hasattr(self.parent.parent, 'height'):
-                    self.parent.parent.height = new_height
+    def apply_height(self):
+        """Выставляет высоту по числу строк; возвращает количество записей высоты"""
+        lines = len(self._lines)
+        key = (lines, self.line_height, self.line_spacing, self.padding[1], self.padding[3], self.min_height)
+        new_height = self._height_cache.get(key)
+        if new_height is None:
+            # Вычисляем необходимую высоту на основе текста
+            line_height = self.line_height + self.line_spacing
+            new_height = max(self.min_height, lines * line_height + self.padding[1] + self.padding[3])
+            self._height_cache[key] = new_height
+
+        if new_height == self.height:
+            return 0
+
+        self.height = new_height
+        writes = 1
+        # Обновляем строку-контейнер фиксированной высоты; списки с minimum_height
+        # пересчитывают свою высоту сами
+        if self.parent is not None and self.parent.size_hint_y is None and self.parent.height != new_height:
+            self.parent.height = new_height
+            writes += 1
+        return writes
+
+
+class LRUCache:
+    """LRU-кэш с ограничением суммарного веса записей"""
+
+    def __init__(self, max_weight, weight=None):
+        self.max_weight = max_weight
+        self.weight = weight or (lambda value: 1)
+        self.used = 0
+        self._items = OrderedDict()
+
+    def get(self, key):
+        value = self._items.get(key)
+        if value is not None:
+            self._items.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        old_value = self._items.pop(key, None)
+        if old_value is not None:
+            self.used -= self.weight(old_value)
+        self._items[key] = value
+        self.used += self.weight(value)
+
+        # Вытесняем самые давние записи, последнюю оставляем всегда
+        while self.used > self.max_weight and len(self._items) > 1:
+            _, evicted = self._items.popitem(last=False)
+            self.used -= self.weight(evicted)
+
+    def clear(self):
+        self._items.clear()
+        self.used = 0
+
+    def __len__(self):
+        return len(self._items)
+
+
+def texture_bytes(texture):
+    """Примерный объем памяти текстуры RGBA"""
+    return texture.width * texture.height * 4
+
+
+def downscale_image_data(data, max_width, max_height):
+    """Уменьшает ImageData прореживанием пикселей, чтобы он влез в max_width x max_height.
+
+    Работает без Pillow и без OpenGL, поэтому вызывается в фоновом потоке.
+    """
+    width, height = data.width, data.height
+    step = math.ceil(max(width / max(max_width, 1), height / max(max_height, 1)))
+    if step <= 1:
+        return data
+
+    pixel = len(data.fmt)
+    # Загрузчик SDL2 задает rowlength в байтах (с выравниванием строки)
+    stride = data.rowlength or width * pixel
+    pixels = memoryview(data.data).cast('B')
+    new_width = (width + step - 1) // step
+    new_height = (height + step - 1) // step
+    row_bytes = new_width * pixel
+    result = bytearray(row_bytes * new_height)
+    for y in range(new_height):
+        row = pixels[y * step * stride:y * step * stride + width * pixel]
+        start = y * row_bytes
+        # Каждый канал копируется срезом с шагом, без цикла по пикселям
+        for channel in range(pixel):
+            result[start + channel:start + row_bytes:pixel] = row[channel::pixel * step]
+    return ImageData(new_width, new_height, data.fmt, bytes(result), flip_vertical=data.flip_vertical)
+
+
+# Отрисованные тексты меток (CoreLabel со своей текстурой) по тексту и стилю, и измеренные высоты текста
+label_texture_cache = LRUCache(LABEL_CACHE_BYTES, lambda core_label: texture_bytes(core_label.texture))
+label_height_cache = LRUCache(LABEL_HEIGHT_CACHE_SIZE)
 
 
 # Кастомный Label изменения цвета фона
@@ -139,29 +349,177 @@ class AutoHeightLabel(Label):
         self.bind(text=self.on_text_change)
         self.height = self.min_height
 
+    def _texture_key(self):
+        """Ключ кэша отрисованного текста: текст и все, что влияет на картинку"""
+        # Label перерисовывает текстуру при смене любого из _font_properties,
+        # поэтому в ключ входят все они (разметка, отступы, межстрочный интервал...)
+        key = [self.disabled]
+        for name in self._font_properties:
+            value = getattr(self, name)
+            if isinstance(value, dict):
+                value = tuple(sorted(value.items()))
+            elif isinstance(value, list):
+                value = tuple(value)
+            key.append(value)
+        return tuple(key)
+
+    def texture_update(self, *largs):
+        # Повторно показанный текст берем из кэша, не растеризуя заново
+        key = self._texture_key()
+        core_label = label_texture_cache.get(key)
+        if core_label is not None:
+            self.texture = core_label.texture
+            self.texture_size = list(core_label.texture.size)
+            return
+
+        super().texture_update(*largs)
+        if self.texture is not None and self.texture is self._label.texture:
+            # Текстуру заполняет ее CoreLabel (при первой отрисовке и после потери
+            # GL-контекста) и он же перерисовывает ее на месте при смене текста,
+            # поэтому в кэш уходит CoreLabel целиком, а метка дальше рисует новым
+            label_texture_cache.put(key, self._label)
+            self._label = None
+            self._create_label()
+
     def on_text_change(self, instance, value):
         # Вычисляем необходимую высоту на основе текста с учетом отступов
         text_width = self.width - self.padding_x * 2
         if text_width <= 0:
             return
 
-        # Создаем временный текстур для расчета высоты
-        from kivy.core.text import Label as CoreLabel
-        core_label = CoreLabel(
-            text=self.text,
-            font_size=self.font_size,
-            font_name=self.font_name,
-            text_size=(text_width, None)
-        )
-        core_label.refresh()
+        key = (self.text, self.font_size, self.font_name, self.bold, int(text_width))
+        text_height = label_height_cache.get(key)
+        if text_height is None:
+            # Считаем только раскладку текста, без создания текстуры
+            from kivy.core.text import Label as CoreLabel
+            core_label = CoreLabel(
+                text=self.text,
+                font_size=self.font_size,
+                font_name=self.font_name,
+                bold=self.bold,
+                text_size=(text_width, None)
+            )
+            text_height = core_label.render()[1]
+            label_height_cache.put(key, text_height)
 
         # Вычисляем высоту с учетом отступов
-        new_height = max(self.min_height, core_label.texture.height + self.padding_y * 2)
+        new_height = max(self.min_height, text_height + self.padding_y * 2)
 
         if new_height != self.height:
             self.height = new_height
 
 
+class ImageTextureCache:
+    """LRU-кэш текстур изображений вопросов.
+
+    Файлы декодируются и уменьшаются до размера на экране в фоновом потоке
+    (Pillow, а без него загрузчиком Kivy), а текстуры создаются в главном
+    потоке через Clock. Вместо картинки, которую не удалось декодировать,
+    показывается заглушка. Объем кэша ограничен max_bytes.
+    """
+
+    def __init__(self, max_bytes=IMAGE_CACHE_BYTES):
+        self._textures = LRUCache(max_bytes, texture_bytes)
+        self._waiting = {}
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._worker, daemon=True)
+        self._thread.start()
+
+    def request(self, path, max_size, callback=None):
+        """Запрашивает текстуру; callback вызывается в главном потоке"""
+        key = (path, int(max_size[0]), int(max_size[1]))
+        texture = self._textures.get(key)
+        if texture is not None:
+            if callback:
+                callback(texture)
+            return
+
+        callbacks = self._waiting.get(key)
+        if callbacks is None:
+            self._waiting[key] = [callback] if callback else []
+            self._queue.put(key)
+        elif callback:
+            callbacks.append(callback)
+
+    def prefetch(self, path, max_size):
+        """Заранее загружает текстуру в кэш"""
+        self.request(path, max_size)
+
+    def clear(self):
+        """Освобождает все текстуры"""
+        self._textures.clear()
+
+    def _worker(self):
+        while True:
+            key = self._queue.get()
+            try:
+                decoded = self._decode(*key)
+            except Exception as e:
+                Logger.error(f"Error decoding image {key[0]}: {e}")
+                decoded = None
+            Clock.schedule_once(lambda dt, key=key, decoded=decoded: self._finish(key, decoded))
+
+    @staticmethod
+    def _decode(path, max_width, max_height):
+        """Декодирует и уменьшает изображение (выполняется в фоновом потоке)"""
+        try:
+            from PIL import Image as PILImage
+        except ImportError:
+            # Загрузчик Kivy (SDL2 на Android) декодирует файл без OpenGL,
+            # как это делает kivy.loader; текстуру создает главный поток
+            image = ImageLoader.load(path, keep_data=True, nocache=True)
+            return 'data', downscale_image_data(image._data[0], max_width, max_height)
+
+        with PILImage.open(path) as img:
+            img = img.convert('RGBA')
+            img.thumbnail((max_width, max_height))
+            return 'rgba', (img.size, img.tobytes())
+
+    def _finish(self, key, decoded):
+        callbacks = self._waiting.pop(key, [])
+        try:
+            texture = self._create_texture(decoded) if decoded is not None else None
+        except Exception as e:
+            Logger.error(f"Error creating texture for {key[0]}: {e}")
+            texture = None
+        if texture is None:
+            texture = placeholder_texture()
+
+        self._textures.put(key, texture)
+        for callback in callbacks:
+            callback(texture)
+
+    @staticmethod
+    def _create_texture(decoded):
+        kind, data = decoded
+        if kind == 'rgba':
+            size, pixels = data
+            texture = Texture.create(size=size, colorfmt='rgba')
+            texture.blit_buffer(pixels, colorfmt='rgba', bufferfmt='ubyte')
+        else:
+            texture = Texture.create_from_data(data)
+            if not data.flip_vertical:
+                return texture
+        texture.flip_vertical()
+        return texture
+
+
+_placeholder = None
+
+
+def placeholder_texture():
+    """Серая заглушка вместо картинки, которую не удалось прочитать"""
+    global _placeholder
+    if _placeholder is None:
+        width, height = PLACEHOLDER_SIZE
+        _placeholder = Texture.create(size=(width, height), colorfmt='rgba')
+        _placeholder.blit_buffer(bytes((160, 160, 160, 255)) * (width * height), colorfmt='rgba', bufferfmt='ubyte')
+    return _placeholder
+
+
+image_cache = ImageTextureCache()
+
+
 class ExamApp(App):
     def build(self):
         # Создаем панель с вкладками
@@ -185,8 +543,42 @@ class ExamApp(App):
         edit_tab.add_widget(self.edit_content)
         self.tabs.add_widget(edit_tab)
 
+        self.tabs.bind(current_tab=self.on_tab_switch)
+        # Сигнал нехватки памяти от системы (Android onLowMemory, iOS) приходит через окно
+        Window.bind(on_memorywarning=self.on_memory_warning)
         return self.tabs
 
+    def on_tab_switch(self, instance, tab):
+        """В режиме экономии памяти список редактирования живет только на своей вкладке"""
+        if not LOW_MEMORY or not hasattr(self, 'edit_content'):
+            return
+        if tab.content is self.edit_content:
+            self.edit_content.load_questions()
+        else:
+            self.edit_content.unload_questions()
+
+    def on_memory_warning(self, *args):
+        """Освобождает кэши текстур, текстов и разобранный банк при нехватке памяти"""
+        Logger.warning("Memory pressure: dropping caches")
+        image_cache.clear()
+        label_texture_cache.clear()
+        label_height_cache.clear()
+        if LOW_MEMORY and not self.edit_content.is_shown():
+            self.edit_content.unload_questions()
+        bank_catalog.drop_caches()
+        gc.collect()
+
+    def on_pause(self):
+        # Из фона приложение может уже не вернуться: отложенный кэш банка пишем сейчас
+        flush_rebuilds()
+        # В фоне система закрывает в первую очередь приложения, занявшие много памяти
+        if LOW_MEMORY:
+            self.on_memory_warning()
+        return True
+
+    def on_stop(self):
+        flush_rebuilds()
+
     def update_questions(self):
         # Этот метод будет вызываться при изменении вопросов
         if hasattr(self, 'exam_content'):
@@ -195,13 +587,27 @@ class ExamApp(App):
             self.edit_content.load_questions()
         if hasattr(self, 'add_content'):
             # Очищаем форму добавления вопроса
-            self.add_content.question_input.text = ''
-            for checkbox, text_input in self.add_content.option_widgets:
-                checkbox.active = False
-                text_input.text = ''
-            # Оставляем только два варианта
-            while len(self.add_content.option_widgets) > 2:
-                self.add_content.remove_option(None)
+            self.add_content.form.clear()
+
+    def on_start(self):
+        # Тихая проверка целостности банка: сообщение появится, только если есть ошибки
+        Clock.schedule_once(lambda dt: self.edit_content.check_database_status(None, quiet=True), 1)
+
+    def select_bank(self, name):
+        """Переключает текущий банк вопросов"""
+        if name == bank_catalog.current:
+            return
+        bank_catalog.select(name)
+        self.refresh_bank_selectors()
+        self.update_questions()
+
+    def refresh_bank_selectors(self):
+        """Обновляет списки банков во вкладках"""
+        names = bank_catalog.names()
+        for tab in (getattr(self, 'exam_content', None), getattr(self, 'edit_content', None)):
+            if tab is not None:
+                tab.bank_spinner.values = names
+                tab.bank_spinner.text = bank_catalog.current
 
     def show_popup(self, title, message):
         popup_layout = BoxLayout(orientation='vertical', padding=dp(10))
@@ -213,14 +619,27 @@ class ExamApp(App):
         popup.open()
 
 
-class AddQuestionTab(BoxLayout):
-    def __init__(self, app, **kwargs):
+class QuestionForm(BoxLayout):
+    """Форма вопроса: текст, теги, картинки и варианты ответов.
+
+    Используется вкладкой добавления и окном редактирования. Форма
+    создается один раз и заполняется данными вопроса через load(); строки
+    вариантов не пересоздаются, а берутся из пула.
+
+    Картинка вопроса и картинки вариантов - имена файлов в папке медиа
+    банка или полные пути к только что выбранным файлам; import_images()
+    копирует выбранные файлы в банк перед сохранением.
+    """
+
+    def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self.app = app
         self.orientation = 'vertical'
-        self.padding = dp(10)
         self.spacing = dp(10)
-        self.option_widgets = []  # Храним виджеты вариантов ответов
+        self.question = None  # Редактируемый вопрос (None - новый)
+        self.image = None
+        self.option_rows = []  # Показанные строки (layout, checkbox, text_input, image_btn)
+        self.option_images = []  # Картинки показанных строк
+        self._row_pool = []  # Скрытые строки для повторного использования
 
         # Поле вопроса
         question_layout = BoxLayout(size_hint_y=None, height=dp(60))
@@ -234,6 +653,23 @@ class AddQuestionTab(BoxLayout):
         question_layout.add_widget(self.question_input)
         self.add_widget(question_layout)
 
+        # Поле тегов (темы вопроса через запятую)
+        tags_layout = BoxLayout(size_hint_y=None, height=dp(40))
+        tags_layout.add_widget(Label(text='Теги:', size_hint_x=0.3, font_size=dp(16)))
+        self.tags_input = TextInput(
+            multiline=False,
+            size_hint_x=0.7,
+            font_size=dp(14),
+            hint_text='через запятую'
+        )
+        tags_layout.add_widget(self.tags_input)
+        self.add_widget(tags_layout)
+
+        # Необязательная картинка к вопросу: нажатие выбирает файл или убирает картинку
+        self.image_btn = Button(text='Картинка: нет', size_hint_y=None, height=dp(40), font_size=dp(14))
+        self.image_btn.bind(on_press=self.choose_image)
+        self.add_widget(self.image_btn)
+
         # Область для вариантов ответов
         options_label = Label(
             text='Варианты ответов (отметьте правильные):',
@@ -243,7 +679,7 @@ class AddQuestionTab(BoxLayout):
         )
         self.add_widget(options_label)
 
-        self.options_scroll = ScrollView(size_hint=(1, 0.6))
+        self.options_scroll = ScrollView(size_hint=(1, 1))
         self.options_layout = BoxLayout(orientation='vertical', size_hint_y=None)
         self.options_layout.bind(minimum_height=self.options_layout.setter('height'))
         self.options_scroll.add_widget(self.options_layout)
@@ -260,98 +696,213 @@ class AddQuestionTab(BoxLayout):
         btn_layout.add_widget(self.remove_btn)
         self.add_widget(btn_layout)
 
-        # Кнопка сохранения вопроса
-        self.save_btn = Button(text='Добавить вопрос', size_hint_y=None, height=dp(50), font_size=dp(16))
-        self.save_btn.bind(on_press=self.save_question)
-        self.add_widget(self.save_btn)
+        self.clear()
+
+    def _show_row(self):
+        """Показывает следующую строку варианта, создавая ее только если пул пуст"""
+        if self._row_pool:
+            row = self._row_pool.pop()
+        else:
+            option_layout = BoxLayout(size_hint_y=None, height=dp(60))
+            # Чекбокс для правильного ответа
+            checkbox = CheckBox(size_hint_x=0.2)
+            # Поле для текста варианта
+            text_input = AutoHeightTextInput(
+                multiline=True,
+                size_hint_x=0.6,
+                min_height=dp(40),
+                font_size=dp(14)
+            )
+            # Картинка варианта
+            image_btn = Button(size_hint_x=0.2, font_size=dp(12))
+            image_btn.bind(on_press=self.choose_option_image)
+            option_layout.add_widget(checkbox)
+            option_layout.add_widget(text_input)
+            option_layout.add_widget(image_btn)
+            row = (option_layout, checkbox, text_input, image_btn)
 
-        # Добавляем начальные два варианта
-        self.add_option()
-        self.add_option()
+        option_layout, checkbox, text_input, image_btn = row
+        checkbox.active = False
+        text_input.text = ''
+        text_input.hint_text = f"Вариант {len(self.option_rows) + 1}"
+        self.options_layout.add_widget(option_layout)
+        self.option_rows.append(row)
+        self.option_images.append(None)
+        self._show_option_image(len(self.option_rows) - 1)
+        return row
+
+    def _hide_row(self):
+        row = self.option_rows.pop()
+        self.option_images.pop()
+        self.options_layout.remove_widget(row[0])
+        self._row_pool.append(row)
 
     def add_option(self, instance=None):
-        if len(self.option_widgets) >= 6:
-            self.show_popup(POPUP_TITLE_INFO, "Максимальное количество вариантов - 6")
+        if len(self.option_rows) >= MAX_OPTIONS:
+            App.get_running_app().show_popup(POPUP_TITLE_INFO, f"Максимальное количество вариантов - {MAX_OPTIONS}")
             return
+        self._show_row()
 
-        option_layout = BoxLayout(size_hint_y=None, height=dp(60))
+    def remove_option(self, instance=None):
+        if len(self.option_rows) > MIN_OPTIONS:
+            self._hide_row()
+        else:
+            App.get_running_app().show_popup(POPUP_TITLE_INFO, f"Минимальное количество вариантов - {MIN_OPTIONS}")
+
+    def load(self, question=None):
+        """Заполняет форму данными вопроса; None - пустая форма для нового вопроса"""
+        self.question = question
+        options = question.options if question is not None else ()
+        count = max(len(options), MIN_OPTIONS)
+        while len(self.option_rows) > count:
+            self._hide_row()
+        while len(self.option_rows) < count:
+            self._show_row()
+
+        for i, (option_layout, checkbox, text_input, image_btn) in enumerate(self.option_rows):
+            text_input.text = options[i] if i < len(options) else ''
+            checkbox.active = question is not None and question.is_correct(i)
+            self.option_images[i] = question.option_image(i) if question is not None else None
+            self._show_option_image(i)
+
+        self.question_input.text = question.text if question is not None else ''
+        self.tags_input.text = ', '.join(question.tags) if question is not None else ''
+        self.set_image(question.image if question is not None else None)
+
+    def clear(self):
+        self.load(None)
+
+    def collect(self):
+        """Собирает вопрос из полей формы, сохраняя id редактируемого вопроса.
+
+        Новые картинки в собранном вопросе - полные пути к файлам, см. import_images().
+        """
+        options = []
+        option_images = []
+        correct_mask = 0
 
-        # Чекбокс для правильного ответа
-        checkbox = CheckBox(size_hint_x=0.2)
+        # Пустые варианты игнорируются, картинки вариантов остаются у своих строк
+        for i, (option_layout, checkbox, text_input, image_btn) in enumerate(self.option_rows):
+            option_text = text_input.text.strip()
+            if option_text:
+                if checkbox.active:
+                    correct_mask |= 1 << len(options)
+                options.append(option_text)
+                option_images.append(self.option_images[i])
 
-        # Поле для текста варианта
-        text_input = AutoHeightTextInput(
-            multiline=True,
-            size_hint_x=0.8,
-            min_height=dp(40),
-            font_size=dp(14),
-            hint_text=f"Вариант {len(self.option_widgets) + 1}"
-        )
+        question_id = self.question.id if self.question is not None else None
+        return Question(self.question_input.text.strip(), options, correct_mask,
+                        parse_tags(self.tags_input.text), question_id, self.image, option_images)
 
-        option_layout.add_widget(checkbox)
-        option_layout.add_widget(text_input)
-        self.options_layout.add_widget(option_layout)
-        self.option_widgets.append((checkbox, text_input))
+    @staticmethod
+    def import_images(question):
+        """Копирует выбранные файлы картинок в папку медиа банка.
 
-    def remove_option(self, instance):
-        if len(self.option_widgets) > 2:
-            last_option = self.option_widgets.pop()
-            self.options_layout.remove_widget(last_option[0].parent)
+        В вопросе остаются только имена файлов в папке медиа.
+        """
+        def imported(image):
+            return bank_catalog.import_media(image) if image and os.path.isabs(image) else image
+
+        question.image = imported(question.image)
+        if question.option_images:
+            question.option_images = tuple(imported(image) for image in question.option_images)
+
+    def set_image(self, image):
+        """Запоминает картинку вопроса"""
+        self.image = image
+        self.image_btn.text = f"Картинка: {os.path.basename(image)}" if image else 'Картинка: нет'
+
+    def _show_option_image(self, index):
+        image_btn = self.option_rows[index][3]
+        image_btn.text = 'Убрать\nкартинку' if self.option_images[index] else 'Картинка'
+
+    def choose_image(self, instance):
+        """Выбор картинки к вопросу; если картинка уже есть, она убирается"""
+        if self.image:
+            self.set_image(None)
+            return
+        file_path = self.pick_image_file()
+        if file_path:
+            self.set_image(file_path)
+
+    def choose_option_image(self, instance):
+        """Выбор картинки к варианту; если картинка уже есть, она убирается"""
+        index = next(i for i, row in enumerate(self.option_rows) if row[3] is instance)
+        if self.option_images[index]:
+            self.option_images[index] = None
         else:
-            self.show_popup(POPUP_TITLE_INFO, "Минимальное количество вариантов - 2")
+            self.option_images[index] = self.pick_image_file()
+        self._show_option_image(index)
 
-    def save_question(self, instance):
-        question_text = self.question_input.text.strip()
-        options = []
-        correct_options = []
+    @staticmethod
+    def pick_image_file():
+        """Диалог выбора файла картинки (на Desktop); возвращает путь или None"""
+        app = App.get_running_app()
+        if platform == 'android':
+            app.show_popup(POPUP_TITLE_INFO, "Добавление картинок доступно в версии для компьютера")
+            return None
 
-        # Собираем данные из полей
-        for i, (checkbox, text_input) in enumerate(self.option_widgets):
-            option_text = text_input.text.strip()
-            if option_text:  # Игнорируем пустые варианты
-                options.append(option_text)
-                if checkbox.active:
-                    correct_options.append(str(i + 1))
+        try:
+            from tkinter import Tk, filedialog
 
-        # Проверяем валидность данных
-        if not question_text:
-            self.show_popup(POPUP_TITLE_ERROR, "Введите вопрос!")
-            return
+            root = Tk()
+            root.withdraw()
+            root.attributes('-topmost', True)
+            file_path = filedialog.askopenfilename(
+                title="Выберите картинку",
+                filetypes=[("Images", "*.png *.jpg *.jpeg *.gif *.bmp"), ("All files", "*.*")]
+            )
+            root.destroy()
+        except Exception as e:
+            app.show_popup(POPUP_TITLE_ERROR, f"Не удалось открыть диалог выбора файла: {str(e)}")
+            return None
 
-        if len(options) < 2:
-            self.show_popup(POPUP_TITLE_ERROR, "Должно быть хотя бы два варианта ответа!")
+        return os.path.abspath(file_path) if file_path else None
+
+
+class AddQuestionTab(BoxLayout):
+    def __init__(self, app, **kwargs):
+        super().__init__(**kwargs)
+        self.app = app
+        self.orientation = 'vertical'
+        self.padding = dp(10)
+        self.spacing = dp(10)
+
+        # Форма вопроса
+        self.form = QuestionForm()
+        self.add_widget(self.form)
+
+        # Кнопка сохранения вопроса
+        self.save_btn = Button(text='Добавить вопрос', size_hint_y=None, height=dp(50), font_size=dp(16))
+        self.save_btn.bind(on_press=self.save_question)
+        self.add_widget(self.save_btn)
+
+    def save_question(self, instance):
+        if bank_catalog.is_read_only():
+            self.show_popup(POPUP_TITLE_ERROR, "Текущий банк только для чтения! Выберите другой банк.")
             return
 
-        if not correct_options:
-            self.show_popup(POPUP_TITLE_ERROR, "Выберите хотя бы один правильный ответ!")
+        # Проверяем валидность данных
+        question = self.form.collect()
+        errors = validate_record(question.to_dict())
+        if errors:
+            self.show_popup(POPUP_TITLE_ERROR, errors[0][1])
             return
 
-        # Загружаем существующие вопросы
-        questions = load_questions()
+        # Копируем картинки в папку медиа банка, в JSON попадают только имена файлов
+        try:
+            self.form.import_images(question)
+        except Exception as e:
+            self.show_popup(POPUP_TITLE_ERROR, f"Не удалось скопировать картинку: {str(e)}")
+            return
 
         # Добавляем новый вопрос
-        question_data = {
-            'question': question_text,
-            'options': options,
-            'correct': correct_options
-        }
-
-        questions.append(question_data)
-
-        # Сохраняем вопросы
-        if not save_questions(questions):
+        if not apply_edit(bank_catalog.add_question, question):
             self.show_popup(POPUP_TITLE_ERROR, "Не удалось сохранить вопрос! Проверьте разрешения приложения.")
             return
 
         # Очищаем форму
-        self.question_input.text = ''
-        for checkbox, text_input in self.option_widgets:
-            checkbox.active = False
-            text_input.text = ''
-
-        # Оставляем только два варианта
-        while len(self.option_widgets) > 2:
-            self.remove_option(None)
+        self.form.clear()
 
         # Уведомляем приложение об обновлении вопросов
         self.app.update_questions()
@@ -379,10 +930,63 @@ class ExamTab(BoxLayout):
         self.correct_indices = []
         self.checkboxes = []
         self.option_labels = []
-        self.used_questions = set()
+        self.deck = None  # Колода позиций вопросов текущей сессии (RandomDeck)
+        self.deck_count = 0
+        self.filter_tags = []
+        self.filter_match_all = False
+        self.review_mode = False  # Работа над ошибками вместо обычной сессии
+        self.hard_first = False  # Порядок «сначала трудные» по оценкам сложности
+        self.person = random.getrandbits(32)  # Номер сессии в журнале ответов
         self.answered = False
         self.answer_correct = False
 
+        # Выбор банка вопросов и порядка вопросов
+        bank_layout = BoxLayout(size_hint_y=None, height=dp(40), spacing=dp(5))
+        self.bank_spinner = Spinner(
+            text=bank_catalog.current,
+            values=bank_catalog.names(),
+            size_hint_x=0.5,
+            font_size=dp(14)
+        )
+        self.bank_spinner.bind(text=self.on_bank_selected)
+        bank_layout.add_widget(self.bank_spinner)
+
+        self.order_btn = Button(text='Случайно', size_hint_x=0.25, font_size=dp(12))
+        self.order_btn.bind(on_press=self.toggle_order)
+        bank_layout.add_widget(self.order_btn)
+
+        # Варианты билетов для печати по текущему фильтру тегов
+        self.variants_btn = Button(text='Билеты', size_hint_x=0.25, font_size=dp(12))
+        self.variants_btn.bind(on_press=self.show_variants_popup)
+        bank_layout.add_widget(self.variants_btn)
+        self.add_widget(bank_layout)
+
+        # Фильтр по тегам: любой из тегов (объединение) или все сразу (пересечение)
+        filter_layout = BoxLayout(size_hint_y=None, height=dp(40), spacing=dp(5))
+        self.tags_input = TextInput(
+            hint_text='Теги через запятую',
+            multiline=False,
+            size_hint_x=0.4,
+            font_size=dp(14)
+        )
+        self.tags_input.bind(on_text_validate=self.apply_filter)
+        filter_layout.add_widget(self.tags_input)
+
+        self.match_btn = Button(text='Любой', size_hint_x=0.2, font_size=dp(12))
+        self.match_btn.bind(on_press=self.toggle_match_mode)
+        filter_layout.add_widget(self.match_btn)
+
+        filter_btn = Button(text='Фильтр', size_hint_x=0.2, font_size=dp(12))
+        filter_btn.bind(on_press=self.apply_filter)
+        filter_layout.add_widget(filter_btn)
+
+        # Работа над ошибками: только вопросы, на которые ответили неправильно
+        self.review_btn = Button(size_hint_x=0.2, font_size=dp(12))
+        self.review_btn.bind(on_press=self.toggle_review_mode)
+        filter_layout.add_widget(self.review_btn)
+        self.update_review_button()
+        self.add_widget(filter_layout)
+
         # Поле вопроса с ScrollView для длинных вопросов
         question_scroll = ScrollView(size_hint_y=None, height=dp(150))
         self.question_label = AutoHeightLabel(
@@ -402,6 +1006,10 @@ class ExamTab(BoxLayout):
         question_scroll.add_widget(self.question_label)
         self.add_widget(question_scroll)
 
+        # Картинка к вопросу (скрыта, пока нет текстуры)
+        self.question_image = Image(size_hint_y=None, height=0)
+        self.add_widget(self.question_image)
+
         # Область для вариантов ответов
         options_label = Label(
             text='Выберите все правильные ответы:',
@@ -441,11 +1049,152 @@ class ExamTab(BoxLayout):
 
         self.load_question()
 
+    def on_bank_selected(self, instance, value):
+        self.app.select_bank(value)
+
+    def toggle_match_mode(self, instance):
+        """Переключает режим фильтра: любой из тегов или все теги"""
+        self.filter_match_all = not self.filter_match_all
+        self.match_btn.text = 'Все' if self.filter_match_all else 'Любой'
+
+    def apply_filter(self, instance):
+        """Применяет фильтр по тегам и начинает новую сессию"""
+        self.filter_tags = parse_tags(self.tags_input.text)
+        self.reset_session()
+
+    def toggle_order(self, instance):
+        """Переключает порядок вопросов: случайный или сначала трудные"""
+        self.hard_first = not self.hard_first
+        self.order_btn.text = 'Трудные' if self.hard_first else 'Случайно'
+        self.reset_session()
+
+    def show_variants_popup(self, instance):
+        """Спрашивает число вариантов и вопросов в варианте и запускает генерацию"""
+        layout = BoxLayout(orientation='vertical', padding=dp(10), spacing=dp(10))
+        count_input = TextInput(hint_text='Число вариантов', text='10', multiline=False,
+                                input_filter='int', size_hint_y=None, height=dp(40), font_size=dp(14))
+        size_input = TextInput(hint_text='Вопросов в варианте', text='20', multiline=False,
+                               input_filter='int', size_hint_y=None, height=dp(40), font_size=dp(14))
+        balance_names = OrderedDict([('По тегам', BALANCE_TAGS), ('По сложности', BALANCE_DIFFICULTY),
+                                     ('Без групп', BALANCE_NONE)])
+        balance_spinner = Spinner(text='По тегам', values=list(balance_names), size_hint_y=None,
+                                  height=dp(40), font_size=dp(14))
+        layout.add_widget(count_input)
+        layout.add_widget(size_input)
+        layout.add_widget(balance_spinner)
+        if self.filter_tags:
+            layout.add_widget(Label(text=f"Теги: {', '.join(self.filter_tags)}", font_size=dp(14)))
+
+        buttons = BoxLayout(size_hint_y=None, height=dp(40), spacing=dp(10))
+        generate_btn = Button(text='Создать', font_size=dp(16))
+        cancel_btn = Button(text='Отмена', font_size=dp(16))
+        buttons.add_widget(generate_btn)
+        buttons.add_widget(cancel_btn)
+        layout.add_widget(buttons)
+        popup = Popup(title='Билеты', content=layout, size_hint=(0.9, 0.6))
+
+        def generate(instance):
+            popup.dismiss()
+            self.generate_variants(int(count_input.text or 0), int(size_input.text or 0),
+                                   balance_names[balance_spinner.text])
+
+        generate_btn.bind(on_press=generate)
+        cancel_btn.bind(on_press=popup.dismiss)
+        popup.open()
+
+    def generate_variants(self, count, size, balance):
+        """Пишет варианты в HTML и JSON в папку Загрузки в фоновом потоке"""
+        source = None
+        try:
+            questions, groups = bank_groups(bank_catalog, balance, self.filter_tags, self.filter_match_all)
+            if bank_catalog.is_read_only():
+                # Кэш декодированных вопросов общего банка не рассчитан на второй поток
+                from mapped_bank import MappedBank
+                questions = source = MappedBank(bank_catalog.path())
+            variants = generate_variants(questions, groups, count, size)
+        except ValueError as e:
+            if source is not None:
+                source.close()
+            self.app.show_popup(POPUP_TITLE_ERROR, str(e))
+            return
+        title = bank_catalog.current
+        media_dir = None if bank_catalog.is_read_only() else bank_catalog.media_dir()
+
+        progress_popup = Popup(title='Билеты', content=Label(text='Создание...', font_size=dp(16)),
+                               size_hint=(0.8, 0.3), auto_dismiss=False)
+        progress_popup.open()
+
+        def finish(message, failure):
+            progress_popup.dismiss()
+            if failure is not None:
+                self.app.show_popup(POPUP_TITLE_ERROR, f"Не удалось создать билеты: {failure}")
+            else:
+                self.app.show_popup(POPUP_TITLE_SUCCESS, message)
+
+        def worker():
+            try:
+                target_dir = downloads_dir()
+                os.makedirs(target_dir, exist_ok=True)
+                html_path = os.path.join(target_dir, VARIANTS_HTML_FILENAME)
+                json_path = os.path.join(target_dir, VARIANTS_JSON_FILENAME)
+                with open(html_path, 'w', encoding='utf-8') as html_file, \
+                        open(json_path, 'w', encoding='utf-8') as json_file:
+                    stats = stream_variants(variants, [HtmlVariantWriter(html_file, title, media_dir),
+                                                       JsonVariantWriter(json_file)])
+                message, failure = f"{stats.summary()}\n{html_path}", None
+            except Exception as e:
+                message, failure = None, str(e)
+            finally:
+                if source is not None:
+                    source.close()
+            Clock.schedule_once(lambda dt: finish(message, failure))
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def toggle_review_mode(self, instance):
+        """Переключает работу над ошибками и обычную сессию"""
+        self.review_mode = not self.review_mode
+        self.update_review_button()
+        self.reset_session()
+
+    def update_review_button(self):
+        if self.review_mode:
+            self.review_btn.text = 'Все'
+        else:
+            self.review_btn.text = f"Ошибки: {bank_catalog.review.count(bank_catalog.current)}"
+
     def reset_session(self):
         """Сбросить сессию и начать заново"""
-        self.used_questions.clear()
+        self.deck = None
+        self.person = random.getrandbits(32)
+        self.update_review_button()
         self.load_question()
 
+    def build_deck(self, questions):
+        """Собирает колоду сессии из индекса тегов без прохода по банку"""
+        if self.review_mode:
+            # Колода читает очередь ошибок напрямую, поэтому видит новые ошибки сразу
+            self.deck = ReviewDeck(bank_catalog.review, bank_catalog.current, questions)
+            self.deck_count = len(questions)
+            return
+        if self.filter_tags:
+            positions = bank_catalog.tag_index().positions(self.filter_tags, self.filter_match_all)
+        else:
+            positions = range(len(questions))
+        self.deck_count = len(questions)
+
+        if self.hard_first:
+            # Трудные вопросы ищутся по id, а не проходом по банку
+            allowed = set(positions) if self.filter_tags else None
+            first = []
+            for question_id in hard_first(load_difficulty(bank_catalog.side_path(DIFFICULTY_SUFFIX))):
+                position = find_position(questions, question_id)
+                if position is not None and (allowed is None or position in allowed):
+                    first.append(position)
+            self.deck = HardFirstDeck(first, positions)
+        else:
+            self.deck = RandomDeck(positions)
+
     def clear_options(self):
         """Очищает все виджеты и списки вариантов ответов"""
         if hasattr(self, 'options_layout'):
@@ -453,53 +1202,93 @@ class ExamTab(BoxLayout):
         self.checkboxes = []
         self.option_labels = []
 
+    def question_image_size(self):
+        return Window.width - dp(20), dp(200)
+
+    def option_image_size(self):
+        return Window.width * 0.3, dp(100)
+
+    def show_question_image(self, question):
+        """Запрашивает картинку вопроса у кэша текстур"""
+        self.question_image.texture = None
+        self.question_image.height = 0
+        if question.image:
+            image_cache.request(
+                bank_catalog.media_path(question.image),
+                self.question_image_size(),
+                lambda texture, question_id=question.id: self.set_question_image(question_id, texture)
+            )
+
+    def set_question_image(self, question_id, texture):
+        # Картинка могла прийти уже после перехода к следующему вопросу
+        if self.current_question is None or self.current_question.id != question_id:
+            return
+        self.question_image.texture = texture
+        self.question_image.height = texture.height
+
+    def prefetch_images(self, question):
+        """Заранее декодирует картинки следующего вопроса"""
+        if question.image:
+            image_cache.prefetch(bank_catalog.media_path(question.image), self.question_image_size())
+        if question.option_images:
+            for image in question.option_images:
+                if image:
+                    image_cache.prefetch(bank_catalog.media_path(image), self.option_image_size())
+
     def load_question(self):
         self.clear_options()
         self.answered = False
         self.answer_btn.text = 'Ответить'
         self.status_label.text = ''
 
-        # Загружаем вопросы
-        questions = load_questions()
+        # Экзамен только читает вопросы: общий список банка без копии, он
+        # перечитывается, только если файл банка изменился
+        questions = load_questions(shared=True)
 
         if not questions:
             self.question_label.text = "В базе нет вопросов! Добавьте вопросы на вкладке 'Добавить вопрос'."
             self.answer_btn.disabled = True
+            self.question_image.height = 0
             return
 
-        # Проверяем, остались ли неиспользованные вопросы
-        available_questions = [q for q in questions if q['question'] not in self.used_questions]
+        # Колода строится заново, если сессия сброшена или банк изменился
+        new_deck = self.deck is None or self.deck_count != len(questions)
+        if new_deck:
+            self.build_deck(questions)
 
-        if not available_questions:
-            self.question_label.text = "Все вопросы закончились! Обновите сессию на вкладке редактирования."
+        # Проверяем, остались ли неиспользованные вопросы
+        if not self.deck:
+            if self.review_mode:
+                self.question_label.text = "Ошибок для повторения нет!"
+            elif new_deck and self.filter_tags:
+                self.question_label.text = "Нет вопросов с выбранными тегами!"
+            else:
+                self.question_label.text = "Все вопросы закончились! Обновите сессию на вкладке редактирования."
             self.answer_btn.disabled = True
+            self.question_image.height = 0
             return
 
         self.answer_btn.disabled = False
 
-        # Выбираем случайный вопрос из доступных и перемешиваем варианты ответов
-        self.current_question = random.choice(available_questions)
-        self.used_questions.add(self.current_question['question'])
+        # Берем следующий вопрос из перемешанной колоды и перемешиваем варианты ответов
+        self.current_question = questions[self.deck.pop()]
 
-        # Создаем перемешанный список вариантов ответов
-        options_with_indices = list(enumerate(self.current_question['options']))
-        random.shuffle(options_with_indices)
-
-        # Сохраняем правильные ответы в соответствии с новым порядком
-        original_correct = [int(idx) - 1 for idx in self.current_question['correct']]
-        self.correct_indices = []
-
-        for new_index, (original_index, option_text) in enumerate(options_with_indices):
-            if original_index in original_correct:
-                self.correct_indices.append(new_index)
+        # Перемешиваем варианты ответов, правильные ответы - в новом порядке
+        order, self.correct_indices = shuffle_options(self.current_question)
+        options_with_indices = [(original_index, self.current_question.options[original_index])
+                                for original_index in order]
 
         # Устанавливаем текст вопроса
         if self.current_question:
-            self.question_label.text = self.current_question['question']
+            self.question_label.text = self.current_question.text
         else:
             self.question_label.text = "Ошибка загрузки вопроса"
             return
 
+        self.show_question_image(self.current_question)
+        if self.deck:
+            self.prefetch_images(questions[self.deck.peek()])
+
         # Создаем чекбоксы для вариантов ответов (в перемешанном порядке)
         for new_index, (original_index, option_text) in enumerate(options_with_indices):
             option_layout = BoxLayout(size_hint_y=None, height=dp(100), spacing=dp(10))  # Добавил spacing, посмотрим)
@@ -529,6 +1318,18 @@ class ExamTab(BoxLayout):
             label.bind(size=label.setter('text_size'))
 
             option_layout.add_widget(checkbox)
+
+            # Картинка варианта ответа, если есть
+            option_image = self.current_question.option_image(original_index)
+            if option_image:
+                image_widget = Image(size_hint_x=0.3)
+                option_layout.add_widget(image_widget)
+                image_cache.request(
+                    bank_catalog.media_path(option_image),
+                    self.option_image_size(),
+                    lambda texture, widget=image_widget: setattr(widget, 'texture', texture)
+                )
+
             option_layout.add_widget(label)
             self.options_layout.add_widget(option_layout)
             self.checkboxes.append(checkbox)
@@ -564,7 +1365,7 @@ class ExamTab(BoxLayout):
         self.answer_btn.text = 'Далее'
 
         # Проверяем правильность ответа
-        if set(selected_indices) == set(self.correct_indices):
+        if is_answer_correct(self.correct_indices, selected_indices):
             self.handle_correct_answer()
         else:
             self.handle_incorrect_answer(selected_indices)
@@ -574,6 +1375,7 @@ class ExamTab(BoxLayout):
         self.status_label.text = "Правильно!"
         self.status_label.color = (0, 1, 0, 1)  # Зеленый цвет
         self.answer_correct = True
+        self.record_answer(True)
         self.highlight_correct_answers((0.7, 1, 0.7, 1))  # Светло-зеленый
 
     def handle_incorrect_answer(self, selected_indices):
@@ -581,6 +1383,7 @@ class ExamTab(BoxLayout):
         self.status_label.text = "Неправильно!"
         self.status_label.color = (1, 0, 0, 1)  # Красный цвет
         self.answer_correct = False
+        self.record_answer(False)
 
         # Подсвечиваем выбранные неправильные ответы красным
         for i in selected_indices:
@@ -590,6 +1393,12 @@ class ExamTab(BoxLayout):
         # Подсвечиваем правильные ответы зеленым
         self.highlight_correct_answers((0.7, 1, 0.7, 1))  # Светло-зеленый
 
+    def record_answer(self, correct):
+        """Записывает ответ в журнал для оценки сложности и обновляет очередь ошибок"""
+        AnswerLog(bank_catalog.side_path(ANSWER_LOG_SUFFIX)).record(self.current_question.id, self.person, correct)
+        bank_catalog.review.record_answer(bank_catalog.current, self.current_question.id, correct)
+        self.update_review_button()
+
     def highlight_correct_answers(self, color):
         """Подсвечивает все правильные ответы указанным цветом"""
         for i in self.correct_indices:
@@ -611,6 +1420,12 @@ class EditQuestionsTab(BoxLayout):
         self.padding = dp(10)
         self.spacing = dp(10)
         self.current_edit_index = None
+        self.edit_popup = None  # Окно редактирования создается при первом открытии
+        self.selected_ids = set()  # id отмеченных для массовых операций вопросов
+        self.selection_bank = bank_catalog.current  # Банк, к которому относятся отметки
+        self.selection_checkboxes = {}
+        self.sync_server = None  # Сервер синхронизации, пока открыт доступ для других устройств
+        self.page = 0  # Страница списка в режиме экономии памяти
 
         # Заголовок
         title_label = Label(
@@ -622,6 +1437,22 @@ class EditQuestionsTab(BoxLayout):
         )
         self.add_widget(title_label)
 
+        # Выбор и создание банка вопросов
+        bank_layout = BoxLayout(size_hint_y=None, height=dp(40), spacing=dp(5))
+        self.bank_spinner = Spinner(
+            text=bank_catalog.current,
+            values=bank_catalog.names(),
+            size_hint_x=0.7,
+            font_size=dp(14)
+        )
+        self.bank_spinner.bind(text=self.on_bank_selected)
+        bank_layout.add_widget(self.bank_spinner)
+
+        self.new_bank_btn = Button(text='Новый банк', size_hint_x=0.3, font_size=dp(12))
+        self.new_bank_btn.bind(on_press=self.create_bank)
+        bank_layout.add_widget(self.new_bank_btn)
+        self.add_widget(bank_layout)
+
         # Прокручиваемый список вопросов
         self.questions_scroll = ScrollView(size_hint=(1, 0.6))  # Уменьшил высоту списка
         self.questions_layout = BoxLayout(orientation='vertical', size_hint_y=None)
@@ -629,15 +1460,62 @@ class EditQuestionsTab(BoxLayout):
         self.questions_scroll.add_widget(self.questions_layout)
         self.add_widget(self.questions_scroll)
 
+        # В режиме экономии памяти список показывается по страницам
+        if LOW_MEMORY:
+            page_layout = BoxLayout(size_hint_y=None, height=dp(40), spacing=dp(5))
+            prev_btn = Button(text='<', size_hint_x=0.2, font_size=dp(14))
+            prev_btn.bind(on_press=lambda instance: self.change_page(-1))
+            page_layout.add_widget(prev_btn)
+            self.page_label = Label(size_hint_x=0.6, font_size=dp(14))
+            page_layout.add_widget(self.page_label)
+            next_btn = Button(text='>', size_hint_x=0.2, font_size=dp(14))
+            next_btn.bind(on_press=lambda instance: self.change_page(1))
+            page_layout.add_widget(next_btn)
+            self.add_widget(page_layout)
+
+        # Массовые операции над отмеченными вопросами
+        bulk_layout = BoxLayout(size_hint_y=None, height=dp(40), spacing=dp(5))
+        self.select_all_btn = Button(text='Все', size_hint_x=0.2, font_size=dp(12))
+        self.select_all_btn.bind(on_press=self.toggle_select_all)
+        bulk_layout.add_widget(self.select_all_btn)
+
+        self.bulk_delete_btn = Button(text='Удалить', size_hint_x=0.25, font_size=dp(12))
+        self.bulk_delete_btn.bind(on_press=self.bulk_delete)
+        bulk_layout.add_widget(self.bulk_delete_btn)
+
+        self.bulk_tags_btn = Button(text='Теги', size_hint_x=0.25, font_size=dp(12))
+        self.bulk_tags_btn.bind(on_press=self.bulk_retag)
+        bulk_layout.add_widget(self.bulk_tags_btn)
+
+        self.bulk_move_btn = Button(text='В банк', size_hint_x=0.3, font_size=dp(12))
+        self.bulk_move_btn.bind(on_press=self.bulk_move)
+        bulk_layout.add_widget(self.bulk_move_btn)
+        self.add_widget(bulk_layout)
+
         # Кнопка обновления списка
+        refresh_layout = BoxLayout(size_hint_y=None, height=dp(40), spacing=dp(5))
         self.refresh_btn = Button(
             text='Обновить список',
-            size_hint_y=None,
-            height=dp(40),  # Уменьшил высоту кнопки
+            size_hint_x=0.35,
             font_size=dp(14)
         )
         self.refresh_btn.bind(on_press=self.load_questions)
-        self.add_widget(self.refresh_btn)
+        refresh_layout.add_widget(self.refresh_btn)
+
+        # Оценка сложности вопросов по журналу ответов
+        self.difficulty_btn = Button(text='Сложность', size_hint_x=0.25, font_size=dp(12))
+        self.difficulty_btn.bind(on_press=self.calibrate_difficulty)
+        refresh_layout.add_widget(self.difficulty_btn)
+
+        # Отмена и повтор правок
+        self.undo_btn = Button(text='Отменить', size_hint_x=0.2, font_size=dp(12))
+        self.undo_btn.bind(on_press=self.undo_edit)
+        refresh_layout.add_widget(self.undo_btn)
+
+        self.redo_btn = Button(text='Повторить', size_hint_x=0.2, font_size=dp(12))
+        self.redo_btn.bind(on_press=self.redo_edit)
+        refresh_layout.add_widget(self.redo_btn)
+        self.add_widget(refresh_layout)
 
         # Кнопки экспорта и импорта
         export_import_layout = BoxLayout(size_hint_y=None, height=dp(40), spacing=dp(5))  # Уменьшил высоту и отступы
@@ -658,6 +1536,10 @@ class EditQuestionsTab(BoxLayout):
         self.import_btn.bind(on_press=self.import_database)
         export_import_layout.add_widget(self.import_btn)
 
+        self.sync_btn = Button(text='Синхр.', size_hint_x=0.4, font_size=dp(12))
+        self.sync_btn.bind(on_press=self.show_sync_popup)
+        export_import_layout.add_widget(self.sync_btn)
+
         self.add_widget(export_import_layout)
 
         # Кнопка сброса сессии экзамена
@@ -682,22 +1564,140 @@ class EditQuestionsTab(BoxLayout):
         self.check_db_btn.bind(on_press=self.check_database_status)
         self.add_widget(self.check_db_btn)
 
+    def on_bank_selected(self, instance, value):
+        self.app.select_bank(value)
+
+    def create_bank(self, instance):
+        """Показывает окно создания нового банка"""
+        popup_layout = BoxLayout(orientation='vertical', padding=dp(10), spacing=dp(10))
+        name_input = TextInput(
+            hint_text='Название банка',
+            multiline=False,
+            size_hint_y=None,
+            height=dp(40),
+            font_size=dp(14)
+        )
+        popup_layout.add_widget(name_input)
+
+        btn_layout = BoxLayout(size_hint_y=None, height=dp(40), spacing=dp(5))
+        create_btn = Button(text='Создать', font_size=dp(14))
+        cancel_btn = Button(text='Отмена', font_size=dp(14))
+        btn_layout.add_widget(create_btn)
+        btn_layout.add_widget(cancel_btn)
+        popup_layout.add_widget(btn_layout)
+
+        popup = Popup(title='Новый банк вопросов', content=popup_layout, size_hint=(0.8, 0.4))
+
+        def confirm_create(instance):
+            try:
+                entry = bank_catalog.create_bank(name_input.text)
+            except ValueError as e:
+                self.show_popup(POPUP_TITLE_ERROR, str(e))
+                return
+
+            popup.dismiss()
+            self.app.select_bank(entry['name'])
+            self.show_popup(POPUP_TITLE_SUCCESS, f"Банк '{entry['name']}' создан!")
+
+        create_btn.bind(on_press=confirm_create)
+        cancel_btn.bind(on_press=popup.dismiss)
+        popup.open()
+
     # В класс EditQuestionsTab добавил метод для проверки состояния базы
-    def check_database_status(self, instance):
-        """Проверяет состояние базы данных и показывает информацию"""
+    def check_database_status(self, instance, quiet=False):
+        """Показывает состояние базы и проверяет банк по контрольным суммам в фоновом потоке.
+
+        quiet - проверка при запуске: результат показывается, только если найдены ошибки.
+        """
         questions = load_questions()
-        db_path = QUESTIONS_FILE
+        db_path = bank_catalog.path()
         db_exists = os.path.exists(db_path)
         db_size = os.path.getsize(db_path) if db_exists else 0
 
         message = f"""
+        Банк: {bank_catalog.current}
         Путь к базе: {db_path}
         Файл существует: {'Да' if db_exists else 'Нет'}
         Размер файла: {db_size} байт
         Количество вопросов: {len(questions)}
         """
 
-        self.show_popup("Состояние базы данных", message)
+        if not db_exists or bank_catalog.is_read_only():
+            if not quiet:
+                self.show_popup("Состояние базы данных", message)
+            return
+
+        progress_popup = None
+        if not quiet:
+            progress_popup = Popup(title="Состояние базы данных", content=Label(text='Проверка...', font_size=dp(16)),
+                                   size_hint=(0.8, 0.3), auto_dismiss=False)
+            progress_popup.open()
+        bank = bank_catalog.current
+
+        def finish(report, failure):
+            if progress_popup is not None:
+                progress_popup.dismiss()
+            if failure is not None:
+                self.show_popup(POPUP_TITLE_ERROR, f"Не удалось проверить банк: {failure}")
+                return
+            if quiet and report.ok:
+                return
+            if report.ok or not report.expected or bank != bank_catalog.current:
+                self.show_popup("Состояние базы данных", message + report.summary())
+                return
+            self._offer_repair(message + report.summary(), report)
+
+        def worker():
+            try:
+                report, failure = verify_bank(db_path), None
+            except Exception as e:
+                report, failure = None, str(e)
+            Clock.schedule_once(lambda dt: finish(report, failure))
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _offer_repair(self, message, report):
+        """Показывает ошибки проверки и предлагает восстановить записи из снимка или экспорта"""
+        layout = BoxLayout(orientation='vertical', padding=dp(10), spacing=dp(10))
+        label = Label(text=message, font_size=dp(14), halign='left', valign='top')
+        label.bind(size=label.setter('text_size'))
+        layout.add_widget(label)
+        buttons = BoxLayout(size_hint_y=None, height=dp(40), spacing=dp(10))
+        repair_btn = Button(text='Восстановить', font_size=dp(16))
+        close_btn = Button(text='Закрыть', font_size=dp(16))
+        buttons.add_widget(repair_btn)
+        buttons.add_widget(close_btn)
+        layout.add_widget(buttons)
+        popup = Popup(title=POPUP_TITLE_ERROR, content=layout, size_hint=(0.9, 0.7))
+
+        def repair(instance):
+            popup.dismiss()
+            try:
+                restored, not_found = repair_bank(bank_catalog, report, self._export_paths())
+            except Exception as e:
+                self.show_popup(POPUP_TITLE_ERROR, f"Не удалось восстановить записи: {e}")
+                return
+            self.app.update_questions()
+            text = f"Восстановлено записей: {restored}"
+            if not_found:
+                text += f"\nНе найдены копии: id {', '.join(map(str, not_found))}"
+            self.show_popup(POPUP_TITLE_SUCCESS if restored else POPUP_TITLE_ERROR, text)
+
+        repair_btn.bind(on_press=repair)
+        close_btn.bind(on_press=popup.dismiss)
+        popup.open()
+
+    @staticmethod
+    def _export_paths():
+        """Файлы экспорта, в которых можно искать копии записей"""
+        paths = [os.path.join(os.path.expanduser("~"), 'Downloads', 'questions_export.json')]
+        if platform == 'android':
+            try:
+                from android.storage import primary_external_storage_path  # type: ignore
+                paths.insert(0, os.path.join(primary_external_storage_path(), "Download", "questions_export.json"))
+            except ImportError:
+                pass
+        return paths
 
     def reset_exam_session(self, instance):
         """Сбросить сессию экзамена"""
@@ -705,12 +1705,50 @@ class EditQuestionsTab(BoxLayout):
             self.app.exam_content.reset_session()
             self.show_popup(POPUP_TITLE_SUCCESS, "Сессия экзамена сброшена!")
 
+    def is_shown(self):
+        """Открыта ли вкладка редактирования"""
+        tabs = getattr(self.app, 'tabs', None)
+        return tabs is not None and tabs.current_tab is not None and tabs.current_tab.content is self
+
+    def unload_questions(self):
+        """Разбирает список вопросов: виджеты строк держат весь банк"""
+        self.questions_layout.clear_widgets()
+        self.selection_checkboxes = {}
+
+    def change_page(self, step):
+        self.page = max(0, self.page + step)
+        self.load_questions()
+        self.questions_scroll.scroll_y = 1
+
     def load_questions(self, instance=None):
         self.questions_layout.clear_widgets()
+        self.selection_checkboxes = {}
+        # id в разных банках совпадают, поэтому отметки другого банка сбрасываются
+        if self.selection_bank != bank_catalog.current:
+            self.selected_ids.clear()
+            self.selection_bank = bank_catalog.current
+
+        # Скрытая вкладка в режиме экономии памяти построит список, когда ее откроют
+        if LOW_MEMORY and not self.is_shown():
+            return
+
+        # Банк только для чтения не разворачиваем целиком в список
+        if bank_catalog.is_read_only():
+            self.selected_ids.clear()
+            self.questions_layout.add_widget(Label(
+                text=f'Банк только для чтения: {len(load_questions())} вопросов.',
+                size_hint_y=None,
+                height=dp(40),
+                font_size=dp(16)
+            ))
+            return
 
         # Загружаем вопросы
         questions = load_questions()
 
+        # Отметки остаются только у вопросов, которые еще есть в банке
+        self.selected_ids &= {question.id for question in questions}
+
         if not questions:
             no_questions_label = Label(
                 text='В базе нет вопросов.',
@@ -721,18 +1759,40 @@ class EditQuestionsTab(BoxLayout):
             self.questions_layout.add_widget(no_questions_label)
             return
 
-        for idx, question in enumerate(questions):
+        estimates = load_difficulty(bank_catalog.side_path(DIFFICULTY_SUFFIX))
+
+        start, end = 0, len(questions)
+        if LOW_MEMORY:
+            pages = (len(questions) + EDIT_PAGE_SIZE - 1) // EDIT_PAGE_SIZE
+            self.page = min(self.page, pages - 1)
+            start = self.page * EDIT_PAGE_SIZE
+            end = min(start + EDIT_PAGE_SIZE, len(questions))
+            self.page_label.text = f"{start + 1}-{end} из {len(questions)}"
+
+        for idx in range(start, end):
+            question = questions[idx]
             question_item = BoxLayout(size_hint_y=None, height=dp(60), spacing=dp(5))  # Уменьшил высоту и отступы
 
+            # Отметка для массовых операций
+            select_checkbox = CheckBox(size_hint_x=0.1, active=question.id in self.selected_ids)
+            select_checkbox.bind(active=lambda instance, value, question_id=question.id:
+                                 self.on_question_selected(question_id, value))
+            self.selection_checkboxes[question.id] = select_checkbox
+
             # Текст вопроса (обрезаем если слишком длинный)
-            question_text = question['question']
+            question_text = question.text
             if len(question_text) > 40:  # Уменьшил длину обрезаемого текста
                 question_text = question_text[:37] + '...'
 
+            # Оценка сложности, если вопрос уже калибровался
+            estimate = estimates.get(question.id)
+            if estimate is not None:
+                question_text = f"[{estimate[0]:+.1f}] {question_text}"
+
             question_label = Label(
                 text=question_text,
-                size_hint_x=0.7,  # Увеличил ширину для текста
-                text_size=(Window.width * 0.7 - dp(20), None),
+                size_hint_x=0.6,  # Увеличил ширину для текста
+                text_size=(Window.width * 0.6 - dp(20), None),
                 halign='left',
                 valign='middle'
             )
@@ -750,175 +1810,266 @@ class EditQuestionsTab(BoxLayout):
             btn_layout.add_widget(edit_btn)
             btn_layout.add_widget(delete_btn)
 
+            question_item.add_widget(select_checkbox)
             question_item.add_widget(question_label)
             question_item.add_widget(btn_layout)
 
             self.questions_layout.add_widget(question_item)
 
-    def edit_question(self, index, questions):
-        self.current_edit_index = index
-        question_data = questions[index]
+    def calibrate_difficulty(self, instance):
+        """Оценивает сложность вопросов по журналу ответов в фоновом потоке"""
+        log_path = bank_catalog.side_path(ANSWER_LOG_SUFFIX)
+        result_path = bank_catalog.side_path(DIFFICULTY_SUFFIX)
+        if not os.path.exists(log_path):
+            self.show_popup(POPUP_TITLE_INFO, "Ответов по этому банку еще нет. Пройдите экзамен.")
+            return
 
-        # Создаем попап для редактирования
-        popup_layout = BoxLayout(orientation='vertical', padding=dp(10), spacing=dp(10))
-        popup = Popup(title='Редактирование вопроса', content=popup_layout,
-                      size_hint=(0.95, 0.9))  # Увеличил ширину попапа
+        progress_popup = Popup(title='Сложность вопросов', content=Label(text='Расчет...', font_size=dp(16)),
+                               size_hint=(0.8, 0.3), auto_dismiss=False)
+        progress_popup.open()
 
-        # Поле вопроса
-        question_input = AutoHeightTextInput(
-            text=question_data['question'],
-            multiline=True,
-            size_hint_y=None,
-            min_height=dp(40),
-            font_size=dp(14)
-        )
-        popup_layout.add_widget(Label(text='Вопрос:', size_hint_y=None, height=dp(30)))
-        popup_layout.add_widget(question_input)
+        def finish(count, failure):
+            progress_popup.dismiss()
+            if failure is not None:
+                self.show_popup(POPUP_TITLE_ERROR, f"Не удалось оценить сложность: {failure}")
+                return
+            self.load_questions()
+            self.show_popup(POPUP_TITLE_SUCCESS, f"Сложность оценена по ответам: {count}")
 
-        # Область для вариантов ответов
-        options_label = Label(
-            text='Варианты ответов (отметьте правильные):',
-            size_hint_y=None,
-            height=dp(30),
-            font_size=dp(16)
-        )
-        popup_layout.add_widget(options_label)
+        def worker():
+            try:
+                count, failure = calibrate(log_path, result_path), None
+            except ImportError:
+                count, failure = 0, "нужен пакет numpy (pip install numpy)"
+            except Exception as e:
+                count, failure = 0, str(e)
+            Clock.schedule_once(lambda dt: finish(count, failure))
 
-        options_scroll = ScrollView(size_hint=(1, 0.5))
-        options_layout = BoxLayout(orientation='vertical', size_hint_y=None)
-        options_layout.bind(minimum_height=options_layout.setter('height'))
-        options_scroll.add_widget(options_layout)
-        popup_layout.add_widget(options_scroll)
+        threading.Thread(target=worker, daemon=True).start()
 
-        option_widgets = []
+    def undo_edit(self, instance):
+        """Отменяет последнюю правку банка"""
+        self._replay_edit(bank_catalog.undo, "Нечего отменять", "Правка отменена")
 
-        # Добавляем существующие варианты ответов
-        for i, option in enumerate(question_data['options']):
-            option_layout = BoxLayout(size_hint_y=None, height=dp(60))
+    def redo_edit(self, instance):
+        """Повторяет отмененную правку банка"""
+        self._replay_edit(bank_catalog.redo, "Нечего повторять", "Правка повторена")
 
-            checkbox = CheckBox(size_hint_x=0.2)
-            # Отмечаем правильные ответы
-            if str(i + 1) in question_data['correct']:
-                checkbox.active = True
+    def _replay_edit(self, operation, empty_message, done_message):
+        try:
+            done = operation()
+        except Exception as e:
+            self.show_popup(POPUP_TITLE_ERROR, f"Не удалось применить историю правок: {str(e)}")
+            return
+        if not done:
+            self.show_popup(POPUP_TITLE_INFO, empty_message)
+            return
+        self.app.update_questions()
+        self.show_popup(POPUP_TITLE_SUCCESS, done_message)
 
-            text_input = AutoHeightTextInput(
-                text=option,
-                multiline=True,
-                size_hint_x=0.8,
-                min_height=dp(40),
-                font_size=dp(14)
-            )
+    def on_question_selected(self, question_id, value):
+        if value:
+            self.selected_ids.add(question_id)
+        else:
+            self.selected_ids.discard(question_id)
 
-            option_layout.add_widget(checkbox)
-            option_layout.add_widget(text_input)
-            options_layout.add_widget(option_layout)
-            option_widgets.append((checkbox, text_input))
+    def toggle_select_all(self, instance):
+        """Отмечает все вопросы или снимает все отметки"""
+        select = len(self.selected_ids) < len(self.selection_checkboxes)
+        for checkbox in self.selection_checkboxes.values():
+            checkbox.active = select
 
-        # Кнопки управления вариантами
-        btn_layout = BoxLayout(size_hint_y=None, height=dp(40), spacing=dp(5))  # Уменьшил высоту и отступы
-        add_btn = Button(text='Добавить', font_size=dp(12))  # Меньший шрифт
-        remove_btn = Button(text='Удалить', font_size=dp(12))  # Меньший шрифт
+    def _check_selection(self):
+        if not self.selected_ids:
+            self.show_popup(POPUP_TITLE_INFO, "Отметьте вопросы в списке")
+            return False
+        return True
+
+    def _finish_bulk_operation(self, message):
+        """Одно обновление списка и вкладок после массовой операции"""
+        self.selected_ids.clear()
+        self.app.update_questions()
+        self.show_popup(POPUP_TITLE_SUCCESS, message)
+
+    def bulk_delete(self, instance):
+        """Удаляет все отмеченные вопросы одной записью базы"""
+        if not self._check_selection():
+            return
+
+        confirm_layout = BoxLayout(orientation='vertical', padding=dp(10))
+        confirm_layout.add_widget(Label(text=f'Удалить отмеченные вопросы ({len(self.selected_ids)})?'))
+
+        btn_layout = BoxLayout(size_hint_y=None, height=dp(50), spacing=dp(10))
+        yes_btn = Button(text='Да', font_size=dp(16))
+        no_btn = Button(text='Нет', font_size=dp(16))
+        btn_layout.add_widget(yes_btn)
+        btn_layout.add_widget(no_btn)
+        confirm_layout.add_widget(btn_layout)
+
+        confirm_popup = Popup(title='Подтверждение удаления', content=confirm_layout, size_hint=(0.8, 0.4))
+
+        def confirm_delete(instance):
+            confirm_popup.dismiss()
+            try:
+                removed = bank_catalog.delete_questions(self.selected_ids)
+            except Exception as e:
+                self.show_popup(POPUP_TITLE_ERROR, f"Не удалось удалить вопросы: {str(e)}")
+                return
+            self._finish_bulk_operation(f"Удалено вопросов: {removed}")
+
+        yes_btn.bind(on_press=confirm_delete)
+        no_btn.bind(on_press=confirm_popup.dismiss)
+        confirm_popup.open()
+
+    def bulk_retag(self, instance):
+        """Добавляет или убирает теги у всех отмеченных вопросов"""
+        if not self._check_selection():
+            return
+
+        popup_layout = BoxLayout(orientation='vertical', padding=dp(10), spacing=dp(10))
+        tags_input = TextInput(
+            hint_text='Теги через запятую',
+            multiline=False,
+            size_hint_y=None,
+            height=dp(40),
+            font_size=dp(14)
+        )
+        popup_layout.add_widget(tags_input)
+
+        btn_layout = BoxLayout(size_hint_y=None, height=dp(40), spacing=dp(5))
+        add_btn = Button(text='Добавить', font_size=dp(14))
+        remove_btn = Button(text='Убрать', font_size=dp(14))
+        cancel_btn = Button(text='Отмена', font_size=dp(14))
         btn_layout.add_widget(add_btn)
         btn_layout.add_widget(remove_btn)
+        btn_layout.add_widget(cancel_btn)
         popup_layout.add_widget(btn_layout)
 
-        # Кнопки сохранения и отмены
-        btn_layout2 = BoxLayout(size_hint_y=None, height=dp(40), spacing=dp(5))  # Уменьшил высоту и отступы
-        save_btn = Button(text='Сохранить', font_size=dp(14))
-        cancel_btn = Button(text='Отмена', font_size=dp(14))
-        btn_layout2.add_widget(save_btn)
-        btn_layout2.add_widget(cancel_btn)
-        popup_layout.add_widget(btn_layout2)
-
-        # Функции для кнопок
-        def add_option(instance):
-            if len(option_widgets) >= 6:
-                self.show_popup(POPUP_TITLE_INFO, "Максимальное количество вариантов - 6")
+        popup = Popup(title=f'Теги вопросов ({len(self.selected_ids)})', content=popup_layout,
+                      size_hint=(0.8, 0.4))
+
+        def apply_tags(instance, remove=False):
+            tags = parse_tags(tags_input.text)
+            if not tags:
+                self.show_popup(POPUP_TITLE_ERROR, "Введите теги!")
+                return
+            popup.dismiss()
+            try:
+                if remove:
+                    changed = bank_catalog.retag_questions(self.selected_ids, remove=tags)
+                else:
+                    changed = bank_catalog.retag_questions(self.selected_ids, add=tags)
+            except Exception as e:
+                self.show_popup(POPUP_TITLE_ERROR, f"Не удалось изменить теги: {str(e)}")
                 return
+            self._finish_bulk_operation(f"Изменено вопросов: {changed}")
 
-            option_layout = BoxLayout(size_hint_y=None, height=dp(60))
-            checkbox = CheckBox(size_hint_x=0.2)
-            text_input = AutoHeightTextInput(
-                multiline=True,
-                size_hint_x=0.8,
-                min_height=dp(40),
-                font_size=dp(14),
-                hint_text="Новый вариант"
-            )
+        add_btn.bind(on_press=apply_tags)
+        remove_btn.bind(on_press=lambda instance: apply_tags(instance, remove=True))
+        cancel_btn.bind(on_press=popup.dismiss)
+        popup.open()
 
-            option_layout.add_widget(checkbox)
-            option_layout.add_widget(text_input)
-            options_layout.add_widget(option_layout)
-            option_widgets.append((checkbox, text_input))
+    def bulk_move(self, instance):
+        """Переносит отмеченные вопросы в другой банк"""
+        if not self._check_selection():
+            return
 
-        def remove_option(instance):
-            if len(option_widgets) > 2:
-                last_option = option_widgets.pop()
-                options_layout.remove_widget(last_option[0].parent)
-            else:
-                self.show_popup(POPUP_TITLE_INFO, "Минимальное количество вариантов - 2")
-
-        def save_question(instance):
-            nonlocal option_widgets
-            new_question_text = question_input.text.strip()
-            options = []
-            correct_options = []
-
-            # Собираем данные из полей
-            for i, (checkbox, text_input) in enumerate(option_widgets):
-                option_text = text_input.text.strip()
-                if option_text:  # Игнорируем пустые варианты
-                    options.append(option_text)
-                    if checkbox.active:
-                        correct_options.append(str(i + 1))
-
-            # Проверяем валидность данных
-            if not new_question_text:
-                self.show_popup(POPUP_TITLE_ERROR, "Введите вопрос!")
-                return
+        other_banks = [name for name in bank_catalog.names() if name != bank_catalog.current]
+        if not other_banks:
+            self.show_popup(POPUP_TITLE_INFO, "Сначала создайте другой банк")
+            return
 
-            if len(options) < 2:
-                self.show_popup(POPUP_TITLE_ERROR, "Должно быть хотя бы два варианта ответа!")
-                return
+        popup_layout = BoxLayout(orientation='vertical', padding=dp(10), spacing=dp(10))
+        target_spinner = Spinner(
+            text=other_banks[0],
+            values=other_banks,
+            size_hint_y=None,
+            height=dp(40),
+            font_size=dp(14)
+        )
+        popup_layout.add_widget(target_spinner)
 
-            if not correct_options:
-                self.show_popup(POPUP_TITLE_ERROR, "Выберите хотя бы один правильный ответ!")
-                return
+        btn_layout = BoxLayout(size_hint_y=None, height=dp(40), spacing=dp(5))
+        move_btn = Button(text='Перенести', font_size=dp(14))
+        cancel_btn = Button(text='Отмена', font_size=dp(14))
+        btn_layout.add_widget(move_btn)
+        btn_layout.add_widget(cancel_btn)
+        popup_layout.add_widget(btn_layout)
 
-            # Обновляем вопрос
-            questions[self.current_edit_index] = {
-                'question': new_question_text,
-                'options': options,
-                'correct': correct_options
-            }
+        popup = Popup(title=f'Перенос вопросов ({len(self.selected_ids)})', content=popup_layout,
+                      size_hint=(0.8, 0.4))
 
-            # Сохраняем вопросы
-            if not save_questions(questions):
-                self.show_popup(POPUP_TITLE_ERROR, "Не удалось сохранить вопросы!")
+        def confirm_move(instance):
+            popup.dismiss()
+            try:
+                moved = bank_catalog.move_questions(self.selected_ids, target_spinner.text)
+            except Exception as e:
+                self.show_popup(POPUP_TITLE_ERROR, f"Не удалось перенести вопросы: {str(e)}")
                 return
+            self._finish_bulk_operation(f"Перенесено вопросов в банк '{target_spinner.text}': {moved}")
 
-            popup.dismiss()
-            self.load_questions()
-            # Уведомляем приложение об обновлении вопросов
-            self.app.update_questions()
-            self.show_popup(POPUP_TITLE_SUCCESS, "Вопрос обновлен!")
+        move_btn.bind(on_press=confirm_move)
+        cancel_btn.bind(on_press=popup.dismiss)
+        popup.open()
 
-        def cancel_edit(instance):
-            popup.dismiss()
+    def build_edit_popup(self):
+        """Создает окно редактирования один раз; дальше форма только перезаполняется"""
+        popup_layout = BoxLayout(orientation='vertical', padding=dp(10), spacing=dp(10))
+        self.edit_popup = Popup(title='Редактирование вопроса', content=popup_layout,
+                                size_hint=(0.95, 0.9))
 
-        add_btn.bind(on_press=add_option)
-        remove_btn.bind(on_press=remove_option)
-        save_btn.bind(on_press=save_question)
-        cancel_btn.bind(on_press=cancel_edit)
+        self.edit_form = QuestionForm()
+        popup_layout.add_widget(self.edit_form)
 
-        popup.open()
+        # Кнопки сохранения и отмены
+        btn_layout = BoxLayout(size_hint_y=None, height=dp(40), spacing=dp(5))
+        save_btn = Button(text='Сохранить', font_size=dp(14))
+        save_btn.bind(on_press=self.save_edit)
+        cancel_btn = Button(text='Отмена', font_size=dp(14))
+        cancel_btn.bind(on_press=self.edit_popup.dismiss)
+        btn_layout.add_widget(save_btn)
+        btn_layout.add_widget(cancel_btn)
+        popup_layout.add_widget(btn_layout)
+
+    def edit_question(self, index, questions):
+        self.current_edit_index = index
+        if self.edit_popup is None:
+            self.build_edit_popup()
+        self.edit_form.load(questions[index])
+        self.edit_popup.open()
+
+    def save_edit(self, instance):
+        # Вопрос собирается с прежним id
+        question = self.edit_form.collect()
+
+        # Проверяем валидность данных
+        errors = validate_record(question.to_dict())
+        if errors:
+            self.show_popup(POPUP_TITLE_ERROR, errors[0][1])
+            return
+
+        try:
+            self.edit_form.import_images(question)
+        except Exception as e:
+            self.show_popup(POPUP_TITLE_ERROR, f"Не удалось скопировать картинку: {str(e)}")
+            return
+
+        # Сохраняем вопросы
+        if not apply_edit(bank_catalog.update_question, question):
+            self.show_popup(POPUP_TITLE_ERROR, "Не удалось сохранить вопросы!")
+            return
+
+        self.edit_popup.dismiss()
+        # Уведомляем приложение об обновлении вопросов
+        self.app.update_questions()
+        self.show_popup(POPUP_TITLE_SUCCESS, "Вопрос обновлен!")
 
     def delete_question(self, index, questions):
         if 0 <= index < len(questions):
             # Подтверждение удаления
             confirm_layout = BoxLayout(orientation='vertical', padding=dp(10))
             confirm_label = Label(
-                text=f'Вы уверены, что хотите удалить вопрос?\n\n{questions[index]["question"][:50]}...',
+                text=f'Вы уверены, что хотите удалить вопрос?\n\n{questions[index].text[:50]}...',
                 text_size=(Window.width * 0.8 - dp(20), None)
             )
             confirm_layout.add_widget(confirm_label)
@@ -934,15 +2085,12 @@ class EditQuestionsTab(BoxLayout):
                                   size_hint=(0.8, 0.4))
 
             def confirm_delete(instance):
-                questions.pop(index)
-
                 # Сохраняем вопросы
-                if not save_questions(questions):
+                if not apply_edit(bank_catalog.delete_questions, [questions[index].id]):
                     self.show_popup(POPUP_TITLE_ERROR, "Не удалось сохранить вопросы!")
                     return
 
                 confirm_popup.dismiss()
-                self.load_questions()
                 # Уведомляем приложение об обновлении вопросов
                 self.app.update_questions()
                 self.show_popup(POPUP_TITLE_SUCCESS, "Вопрос удален!")
@@ -990,7 +2138,7 @@ class EditQuestionsTab(BoxLayout):
 
             # Сохраняем вопросы в файл экспорта
             with open(export_path, 'w', encoding='utf-8') as f:
-                json.dump(questions, f, ensure_ascii=False, indent=2)
+                json.dump(questions_to_dicts(questions), f, ensure_ascii=False, indent=2)
 
             self.show_popup(POPUP_TITLE_SUCCESS, f"База данных экспортирована в папку Загрузки:\n{export_path}")
 
@@ -1012,7 +2160,7 @@ class EditQuestionsTab(BoxLayout):
 
             # Сохраняем вопросы в файл экспорта
             with open(export_path, 'w', encoding='utf-8') as f:
-                json.dump(questions, f, ensure_ascii=False, indent=2)
+                json.dump(questions_to_dicts(questions), f, ensure_ascii=False, indent=2)
 
             self.show_popup(POPUP_TITLE_SUCCESS, f"База данных экспортирована в папку Загрузки:\n{export_path}")
         except Exception as e:
@@ -1037,6 +2185,18 @@ class EditQuestionsTab(BoxLayout):
             import_path = os.path.join(downloads_path, "questions_export.json")
 
             if not os.path.exists(import_path):
+                # Общий банк только для чтения: questions_shared.qbk
+                shared_path = os.path.join(downloads_path, "questions_shared" + MAPPED_EXTENSION)
+                if os.path.exists(shared_path):
+                    self._import_read_only_bank(shared_path)
+                    return
+
+                # Таблицы и текстовая разметка: questions_import.csv / .tsv / .txt
+                for ext in IMPORT_EXTENSIONS:
+                    table_path = os.path.join(downloads_path, "questions_import" + ext)
+                    if os.path.exists(table_path):
+                        self._import_table(table_path)
+                        return
                 self.show_popup(POPUP_TITLE_ERROR, "Файл questions_export.json не найден в папке Загрузки")
                 return
 
@@ -1047,13 +2207,16 @@ class EditQuestionsTab(BoxLayout):
                 imported_questions = json.load(f)
 
             # Проверяем валидность импортированных данных
-            if not self._validate_imported_questions(imported_questions):
+            report = self._validate_imported_questions(imported_questions)
+            if report is None:
                 return
 
-            # Сохраняем импортированные вопросы
-            if save_questions(imported_questions):
-                self.show_popup(POPUP_TITLE_SUCCESS,
-                                f"База данных успешно импортирована! Загружено {len(imported_questions)} вопросов.")
+            # Сохраняем только корректные вопросы
+            if bank_catalog.replace_all(questions_from_dicts(report.valid)):
+                message = f"База данных успешно импортирована! Загружено {len(report.valid)} вопросов."
+                if not report.ok:
+                    message += "\n\nПропущены записи с ошибками:\n" + report.summary()
+                self.show_popup(POPUP_TITLE_SUCCESS, message)
                 # Обновляем вопросы в приложении
                 self.app.update_questions()
                 self.load_questions()
@@ -1081,7 +2244,8 @@ class EditQuestionsTab(BoxLayout):
             file_path = filedialog.askopenfilename(
                 initialdir=downloads_path,
                 title="Выберите файл с вопросами",
-                filetypes=[("JSON files", "*.json"), ("All files", "*.*")]
+                filetypes=[("JSON files", "*.json"), ("CSV/TSV files", "*.csv *.tsv *.tab"),
+                           ("Text files", "*.txt"), ("Read-only banks", "*.qbk"), ("All files", "*.*")]
             )
 
             root.destroy()
@@ -1090,6 +2254,14 @@ class EditQuestionsTab(BoxLayout):
                 self.show_popup(POPUP_TITLE_INFO, "Выбор файла отменен")
                 return
 
+            if os.path.splitext(file_path)[1].lower() in IMPORT_EXTENSIONS:
+                self._import_table(file_path)
+                return
+
+            if file_path.lower().endswith(MAPPED_EXTENSION):
+                self._import_read_only_bank(file_path)
+                return
+
             self.show_popup(POPUP_TITLE_INFO, "Файл выбран, обрабатываем...")
 
             # Загружаем вопросы из файла импорта
@@ -1097,13 +2269,16 @@ class EditQuestionsTab(BoxLayout):
                 imported_questions = json.load(f)
 
             # Проверяем валидность импортированных данных
-            if not self._validate_imported_questions(imported_questions):
+            report = self._validate_imported_questions(imported_questions)
+            if report is None:
                 return
 
-            # Сохраняем импортированные вопросы
-            if save_questions(imported_questions):
-                self.show_popup(POPUP_TITLE_SUCCESS,
-                                f"База данных успешно импортирована! Загружено {len(imported_questions)} вопросов.")
+            # Сохраняем только корректные вопросы
+            if bank_catalog.replace_all(questions_from_dicts(report.valid)):
+                message = f"База данных успешно импортирована! Загружено {len(report.valid)} вопросов."
+                if not report.ok:
+                    message += "\n\nПропущены записи с ошибками:\n" + report.summary()
+                self.show_popup(POPUP_TITLE_SUCCESS, message)
                 # Обновляем вопросы в приложении
                 self.app.update_questions()
                 self.load_questions()
@@ -1115,26 +2290,190 @@ class EditQuestionsTab(BoxLayout):
         except Exception as e:
             self.show_popup(POPUP_TITLE_ERROR, f"Не удалось импортировать базу: {str(e)}")
 
+    def _import_read_only_bank(self, file_path):
+        """Подключает общий банк только для чтения (.qbk) и делает его текущим"""
+        try:
+            entry = bank_catalog.add_read_only_bank(file_path)
+        except Exception as e:
+            self.show_popup(POPUP_TITLE_ERROR, f"Не удалось подключить банк: {str(e)}")
+            return
+        self.app.select_bank(entry['name'])
+        self.show_popup(POPUP_TITLE_SUCCESS,
+                        f"Подключен банк только для чтения '{entry['name']}': {entry['count']} вопросов.")
+
+    def _import_table(self, file_path):
+        """Импорт вопросов из CSV/TSV или текстовой разметки с добавлением в текущий банк.
+
+        Файл разбирается по кускам в фоновом потоке, прогресс показывается
+        во всплывающем окне. Пул процессов здесь не используется: fork
+        процесса с окном и OpenGL небезопасен, а spawn заново импортировал бы
+        main.py. Вопросы добавляются одной правкой: запись банка переписывает
+        файл целиком, а импорт отменяется одним шагом.
+        """
+        progress_label = Label(text='Разбор файла...', font_size=dp(16))
+        progress_popup = Popup(title='Импорт вопросов', content=progress_label,
+                               size_hint=(0.8, 0.3), auto_dismiss=False)
+        progress_popup.open()
+
+        def update_progress(done, total):
+            Clock.schedule_once(lambda dt: setattr(
+                progress_label, 'text', f'Разобрано частей файла: {done} из {total}'))
+
+        def finish(questions, errors, failure):
+            progress_popup.dismiss()
+            if failure is not None:
+                self.show_popup(POPUP_TITLE_ERROR, f"Не удалось импортировать файл: {failure}")
+                return
+            if not questions:
+                self.show_popup(POPUP_TITLE_ERROR, "В файле нет валидных вопросов")
+                return
+            if not apply_edit(bank_catalog.add_questions, questions):
+                self.show_popup(POPUP_TITLE_ERROR, "Не удалось сохранить импортированные вопросы")
+                return
+
+            self.app.update_questions()
+            message = f"Добавлено вопросов: {len(questions)}"
+            if errors:
+                message += f"\nПропущено записей с ошибками: {len(errors)}\n"
+                message += '\n'.join(f"Строка {line}: {text}" for line, text in errors[:10])
+            self.show_popup(POPUP_TITLE_SUCCESS, message)
+
+        def worker():
+            try:
+                questions, errors = import_file(file_path, progress=update_progress, workers=1)
+                failure = None
+            except Exception as e:
+                questions, errors, failure = [], [], str(e)
+            Clock.schedule_once(lambda dt: finish(questions, errors, failure))
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def show_sync_popup(self, instance):
+        """Окно синхронизации с другим устройством в локальной сети"""
+        popup_layout = BoxLayout(orientation='vertical', padding=dp(10), spacing=dp(10))
+        popup = Popup(title='Синхронизация', content=popup_layout, size_hint=(0.9, 0.7))
+
+        server_label = Label(font_size=dp(14))
+        popup_layout.add_widget(server_label)
+        server_btn = Button(size_hint_y=None, height=dp(40), font_size=dp(14))
+        popup_layout.add_widget(server_btn)
+
+        def update_server_state():
+            if self.sync_server is not None:
+                server_label.text = (f"Другие устройства могут подключиться:\nhttp://{local_address()}:{self.sync_server.port}\n"
+                                     f"PIN-код: {self.sync_server.pin}")
+                server_btn.text = 'Закрыть доступ'
+            else:
+                server_label.text = f"Банк '{bank_catalog.current}'"
+                server_btn.text = 'Открыть доступ для других устройств'
+
+        def toggle_server(instance):
+            self.toggle_sync_server()
+            update_server_state()
+
+        server_btn.bind(on_press=toggle_server)
+        update_server_state()
+
+        url_input = TextInput(
+            hint_text=f'Адрес устройства, например http://192.168.1.5:{SYNC_PORT}',
+            multiline=False,
+            size_hint_y=None,
+            height=dp(40),
+            font_size=dp(14)
+        )
+        popup_layout.add_widget(url_input)
+
+        pin_input = TextInput(
+            hint_text='PIN-код, который показывает другое устройство',
+            multiline=False,
+            input_filter='int',
+            size_hint_y=None,
+            height=dp(40),
+            font_size=dp(14)
+        )
+        popup_layout.add_widget(pin_input)
+
+        btn_layout = BoxLayout(size_hint_y=None, height=dp(50), spacing=dp(10))
+        sync_btn = Button(text='Синхронизировать', font_size=dp(14))
+        close_btn = Button(text='Закрыть', font_size=dp(14))
+        btn_layout.add_widget(sync_btn)
+        btn_layout.add_widget(close_btn)
+        popup_layout.add_widget(btn_layout)
+
+        def start_sync(instance):
+            url = url_input.text.strip()
+            if not url:
+                self.show_popup(POPUP_TITLE_ERROR, "Введите адрес устройства!")
+                return
+            pin = pin_input.text.strip()
+            if not pin:
+                self.show_popup(POPUP_TITLE_ERROR, "Введите PIN-код другого устройства!")
+                return
+            if not url.startswith('http'):
+                url = 'http://' + url
+            popup.dismiss()
+            self.sync_with_device(url, pin)
+
+        sync_btn.bind(on_press=start_sync)
+        close_btn.bind(on_press=popup.dismiss)
+        popup.open()
+
+    def toggle_sync_server(self):
+        """Открывает или закрывает доступ к текущему банку для синхронизации"""
+        if self.sync_server is not None:
+            self.sync_server.stop()
+            self.sync_server = None
+            return
+        try:
+            self.sync_server = SyncServer(bank_catalog, dispatch=run_on_main_thread,
+                                          on_apply=self.app.update_questions)
+            self.sync_server.start()
+        except OSError as e:
+            self.sync_server = None
+            self.show_popup(POPUP_TITLE_ERROR, f"Не удалось запустить сервер синхронизации: {str(e)}")
+
+    def sync_with_device(self, url, pin):
+        """Синхронизирует текущий банк с другим устройством в фоновом потоке"""
+        if bank_catalog.is_read_only():
+            self.show_popup(POPUP_TITLE_ERROR, "Текущий банк только для чтения! Выберите другой банк.")
+            return
+
+        progress_popup = Popup(title='Синхронизация', content=Label(text='Обмен изменениями...', font_size=dp(16)),
+                               size_hint=(0.8, 0.3), auto_dismiss=False)
+        progress_popup.open()
+
+        def finish(result, failure):
+            progress_popup.dismiss()
+            if failure is not None:
+                self.show_popup(POPUP_TITLE_ERROR, f"Не удалось синхронизировать: {failure}")
+                return
+            self.app.update_questions()
+            self.show_popup(POPUP_TITLE_SUCCESS, result.summary())
+
+        def worker():
+            try:
+                result = sync_with(bank_catalog, url, pin, dispatch=run_on_main_thread)
+                failure = None
+            except Exception as e:
+                result, failure = None, str(e)
+            Clock.schedule_once(lambda dt: finish(result, failure))
+
+        threading.Thread(target=worker, daemon=True).start()
+
     def _validate_imported_questions(self, imported_questions):
-        """Проверяет валидность импортированных вопросов"""
+        """Проверяет импортированные вопросы и возвращает отчет или None, если сохранять нечего"""
         if not isinstance(imported_questions, list):
             self.show_popup(POPUP_TITLE_ERROR, "Некорректный формат файла импорта")
-            return False
+            return None
 
         # Проверяем каждый вопрос на валидность
-        valid_questions = []
-        for question in imported_questions:
-            if (isinstance(question, dict) and
-                    'question' in question and
-                    'options' in question and
-                    'correct' in question):
-                valid_questions.append(question)
-
-        if not valid_questions:
-            self.show_popup(POPUP_TITLE_ERROR, "В файле нет валидных вопросов")
-            return False
+        report = validate_records(imported_questions)
 
-        return True
+        if not report.valid:
+            self.show_popup(POPUP_TITLE_ERROR, "В файле нет валидных вопросов\n\n" + report.summary())
+            return None
+
+        return report
 
     def show_popup(self, title, message):
         # Создаем ScrollView для длинных сообщений
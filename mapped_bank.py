@@ -0,0 +1,130 @@
+"""Банк вопросов только для чтения с доступом через mmap.
+
+Формат файла (.qbk, все числа little-endian):
+
+    заголовок   4s magic, H версия, H резерв, Q количество вопросов,
+                Q смещение блока тегов от начала файла (0 - тегов нет)
+    индекс      (количество + 1) смещений Q от начала области записей
+    записи      вопросы в компактном JSON (UTF-8) подряд
+    теги        JSON {тег: [позиции вопросов]}
+
+Открытие файла читает только заголовок, вопрос декодируется при обращении
+к нему, поэтому память растет с числом просмотренных вопросов, а не с
+размером банка.
+"""
+import json
+import mmap
+import os
+import struct
+from collections import OrderedDict
+
+from question_bank import Question, TagIndex, positions_mask
+
+MAPPED_EXTENSION = '.qbk'
+MAGIC = b'QBNK'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sHHQQ')
+OFFSET = struct.Struct('<Q')
+# Сколько декодированных вопросов держать в памяти
+DECODE_CACHE_SIZE = 256
+
+
+def build_mapped_bank(questions, path):
+    """Записывает вопросы в файл формата .qbk"""
+    records = []
+    postings = {}
+    for position, question in enumerate(questions):
+        records.append(json.dumps(question.to_dict(), ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+        for tag in question.tags:
+            postings.setdefault(tag, []).append(position)
+
+    index_size = (len(records) + 1) * OFFSET.size
+    records_start = HEADER.size + index_size
+    records_size = sum(len(record) for record in records)
+    tags_offset = records_start + records_size if postings else 0
+
+    # Пишем во временный файл и подменяем, чтобы читатели не увидели половину файла
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(records), tags_offset))
+        offset = 0
+        for record in records:
+            f.write(OFFSET.pack(offset))
+            offset += len(record)
+        f.write(OFFSET.pack(offset))
+        for record in records:
+            f.write(record)
+        if postings:
+            f.write(json.dumps(postings, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+    os.replace(temp_path, path)
+    return len(records)
+
+
+class MappedBank:
+    """Последовательность вопросов из файла .qbk, декодируемых по требованию"""
+
+    def __init__(self, path):
+        self.path = path
+        self._map = None
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Пустой файл нельзя отобразить в память
+            self._file.close()
+            raise ValueError(f"Пустой файл банка: {path}")
+
+        magic, version, _, self.count, self._tags_offset = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self.close()
+            raise ValueError(f"Неизвестный формат банка: {path}")
+
+        self._records_start = HEADER.size + (self.count + 1) * OFFSET.size
+        self._cache = OrderedDict()
+        self._tag_index = None
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, position):
+        if not 0 <= position < self.count:
+            raise IndexError(position)
+
+        question = self._cache.get(position)
+        if question is not None:
+            self._cache.move_to_end(position)
+            return question
+
+        start, end = struct.unpack_from('<QQ', self._map, HEADER.size + position * OFFSET.size)
+        record = self._map[self._records_start + start:self._records_start + end]
+        question = Question.from_dict(json.loads(record.decode('utf-8')))
+
+        self._cache[position] = question
+        if len(self._cache) > DECODE_CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return question
+
+    def __iter__(self):
+        for position in range(self.count):
+            yield self[position]
+
+    def tag_index(self):
+        """Индекс тегов из блока тегов файла (читается при первом фильтре)"""
+        if self._tag_index is None:
+            index = TagIndex([])
+            index.count = self.count
+            if self._tags_offset:
+                postings = json.loads(self._map[self._tags_offset:].decode('utf-8'))
+                index.postings = {tag: positions_mask(items, self.count) for tag, items in postings.items()}
+            self._tag_index = index
+        return self._tag_index
+
+    def drop_cache(self):
+        """Освобождает декодированные вопросы"""
+        self._cache.clear()
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
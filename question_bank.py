@@ -0,0 +1,1219 @@
+"""Хранилище вопросов: каталог банков и загрузка выбранного банка.
+
+Модуль не зависит от Kivy, поэтому его можно использовать из консольных
+утилит и фоновых процессов.
+"""
+import json
+import os
+import sys
+import random
+import shutil
+import hashlib
+import logging
+from contextlib import ExitStack, contextmanager
+from collections import OrderedDict
+
+from file_lock import FileLock, atomic_write, bump_version, read_version
+
+Logger = logging.getLogger('ExamApp')
+
+# Файл каталога банков (имена, файлы, количество вопросов и размеры)
+CATALOG_FILENAME = 'banks.json'
+# Банк по умолчанию использует старый файл questions.json
+DEFAULT_BANK_NAME = 'Основной'
+DEFAULT_BANK_FILENAME = 'questions.json'
+# Банки только для чтения в формате mapped_bank.py
+READ_ONLY_EXTENSION = '.qbk'
+# Журнал отмены и повтора правок
+HISTORY_FILENAME = 'history.json'
+HISTORY_LIMIT = 30
+# Очередь работы над ошибками: журнал изменений и сколько правильных ответов
+# подряд убирают вопрос из очереди
+REVIEW_FILENAME = 'review.jsonl'
+REVIEW_STREAK = 2
+# Короткие варианты ответов ("Да", "Нет", "Все перечисленное") часто повторяются,
+# их храним в одном экземпляре
+INTERN_MAX_LENGTH = 40
+
+
+def _intern(text):
+    """Интернирует короткие строки, чтобы одинаковые тексты не дублировались в памяти"""
+    if len(text) <= INTERN_MAX_LENGTH:
+        return sys.intern(text)
+    return text
+
+
+class Question:
+    """Вопрос банка в компактном виде.
+
+    Правильные ответы хранятся битовой маской: бит i установлен, если
+    вариант options[i] правильный. Варианты и теги - кортежи, теги и
+    короткие варианты интернированы. Изображения - имена файлов в папке
+    медиа банка: image для вопроса и option_images для вариантов.
+    """
+    __slots__ = ('id', 'text', 'options', 'correct_mask', 'tags', 'image', 'option_images')
+
+    def __init__(self, text, options, correct_mask, tags=(), id=None, image=None, option_images=None):
+        self.id = id
+        self.text = text
+        self.options = tuple(_intern(option) for option in options)
+        self.correct_mask = correct_mask
+        self.tags = tuple(sys.intern(tag) for tag in tags)
+        self.image = image
+        # Храним картинки вариантов только если есть хотя бы одна
+        self.option_images = tuple(option_images) if option_images and any(option_images) else None
+
+    @classmethod
+    def from_dict(cls, data):
+        """Создает вопрос из словаря формата JSON ('correct' - номера с 1)"""
+        correct_mask = 0
+        for idx in data['correct']:
+            correct_mask |= 1 << (int(idx) - 1)
+        return cls(data['question'], data['options'], correct_mask,
+                   data.get('tags') or (), data.get('id'),
+                   data.get('image'), data.get('option_images'))
+
+    def to_dict(self):
+        """Возвращает вопрос в формате JSON"""
+        data = {}
+        if self.id is not None:
+            data['id'] = self.id
+        data['question'] = self.text
+        data['options'] = list(self.options)
+        data['correct'] = [str(i + 1) for i in self.correct_indices()]
+        if self.tags:
+            data['tags'] = list(self.tags)
+        if self.image:
+            data['image'] = self.image
+        if self.option_images:
+            data['option_images'] = list(self.option_images)
+        return data
+
+    def to_row(self):
+        """Поля вопроса кортежем в порядке __slots__ (для бинарного кэша)"""
+        return (self.id, self.text, self.options, self.correct_mask, self.tags, self.image, self.option_images)
+
+    @classmethod
+    def from_row(cls, row):
+        """Создает вопрос из кортежа to_row() без повторной обработки полей"""
+        question = cls.__new__(cls)
+        (question.id, question.text, question.options, question.correct_mask,
+         question.tags, question.image, question.option_images) = row
+        return question
+
+    def option_image(self, index):
+        """Имя файла картинки варианта или None"""
+        if self.option_images and index < len(self.option_images):
+            return self.option_images[index]
+        return None
+
+    def images(self):
+        """Все картинки вопроса и его вариантов"""
+        result = [self.image] if self.image else []
+        if self.option_images:
+            result.extend(image for image in self.option_images if image)
+        return result
+
+    def is_correct(self, index):
+        """Проверяет, является ли вариант с номером index (с 0) правильным"""
+        return bool(self.correct_mask >> index & 1)
+
+    def correct_indices(self):
+        """Номера правильных вариантов (с 0)"""
+        return [i for i in range(len(self.options)) if self.correct_mask >> i & 1]
+
+
+def _question_hook(data):
+    """Превращает объекты JSON с вопросами в Question прямо при разборе"""
+    if 'question' in data and 'options' in data and 'correct' in data:
+        return Question.from_dict(data)
+    return data
+
+
+def read_bank_file(path):
+    """Читает список вопросов из файла банка"""
+    if os.path.exists(path) and os.path.getsize(path) > 0:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f, object_hook=_question_hook)
+    return []
+
+
+def _read_bank_checked(path):
+    """Читает банк; если файл испорчен, пропускает только испорченные записи.
+
+    Испорченные записи можно вернуть проверкой банка (integrity.py).
+    """
+    try:
+        questions = read_bank_file(path)
+        if isinstance(questions, list) and all(isinstance(q, Question) for q in questions):
+            return questions
+        error = "records without question fields"
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        error = e
+
+    from integrity import read_bank_tolerant
+
+    questions, damaged = read_bank_tolerant(path)
+    Logger.error(f"Bank file {path} is damaged ({error}): skipped {len(damaged)} records, "
+                 f"read {len(questions)}")
+    return questions
+
+
+def write_bank_file(path, questions):
+    """Записывает список вопросов в файл банка.
+
+    Файл подменяется целиком, поэтому читатель никогда не видит его наполовину записанным.
+    """
+    records = [q.to_dict() for q in questions]
+    atomic_write(path, lambda f: json.dump(records, f, ensure_ascii=False, indent=2))
+
+
+def questions_from_dicts(items):
+    """Преобразует список словарей формата JSON в вопросы"""
+    return [Question.from_dict(item) for item in items]
+
+
+def questions_to_dicts(questions):
+    """Преобразует вопросы в список словарей для экспорта в JSON"""
+    return [q.to_dict() for q in questions]
+
+
+def assign_ids(questions):
+    """Назначает постоянные id вопросам, у которых их еще нет.
+
+    Новые id идут по порядку после максимального, поэтому для одного и того же
+    файла они получаются одинаковыми при каждой загрузке.
+    """
+    next_id = max((q.id for q in questions if q.id is not None), default=0) + 1
+    for question in questions:
+        if question.id is None:
+            question.id = next_id
+            next_id += 1
+    return questions
+
+
+def parse_tags(text):
+    """Разбирает строку тегов через запятую, убирая пустые и повторы"""
+    tags = []
+    for tag in text.split(','):
+        tag = tag.strip()
+        if tag and tag not in tags:
+            tags.append(tag)
+    return tags
+
+
+def mask_positions(mask):
+    """Возвращает отсортированные номера установленных битов маски"""
+    bits = bin(mask)[:1:-1]
+    positions = []
+    pos = bits.find('1')
+    while pos != -1:
+        positions.append(pos)
+        pos = bits.find('1', pos + 1)
+    return positions
+
+
+def positions_mask(positions, count):
+    """Упаковывает позиции в битовую маску"""
+    bits = bytearray((count + 7) // 8)
+    for pos in positions:
+        bits[pos >> 3] |= 1 << (pos & 7)
+    return int.from_bytes(bits, 'little')
+
+
+class TagIndex:
+    """Индекс тегов: для каждого тега битовая маска позиций вопросов в банке.
+
+    Объединение и пересечение тем сводятся к операциям | и & над целыми
+    числами, поэтому фильтрованная колода собирается без прохода по банку.
+    """
+
+    def __init__(self, questions):
+        self.count = len(questions)
+        # Сначала собираем отсортированные списки позиций, затем упаковываем их в маски
+        positions = {}
+        for position, question in enumerate(questions):
+            for tag in question.tags:
+                positions.setdefault(tag, []).append(position)
+        self.postings = {tag: positions_mask(items, self.count) for tag, items in positions.items()}
+
+    def tags(self):
+        """Возвращает все теги банка по алфавиту"""
+        return sorted(self.postings)
+
+    def all_mask(self):
+        """Маска всех вопросов банка"""
+        return (1 << self.count) - 1
+
+    def mask(self, tags, match_all=False):
+        """Маска вопросов с любым (или со всеми) из указанных тегов"""
+        if not tags:
+            return self.all_mask()
+        if match_all:
+            result = self.all_mask()
+            for tag in tags:
+                result &= self.postings.get(tag, 0)
+            return result
+        result = 0
+        for tag in tags:
+            result |= self.postings.get(tag, 0)
+        return result
+
+    def positions(self, tags, match_all=False):
+        """Позиции вопросов фильтрованной колоды"""
+        return mask_positions(self.mask(tags, match_all))
+
+
+def _apply_operation(questions, op):
+    """Применяет к списку вопросов одну операцию журнала и возвращает обратную.
+
+    Операции хранят только затронутые записи:
+    insert - вставка записей [позиция, вопрос] (позиция None - в конец),
+    delete - удаление по id, replace - замена записей с теми же id.
+    """
+    kind = op['op']
+    if kind == 'insert':
+        existing = {q.id for q in questions}
+        inserted = []
+        for position, record in sorted(op['items'], key=lambda item: (item[0] is None, item[0] or 0)):
+            question = Question.from_dict(record)
+            if question.id in existing:
+                # id успел занять вопрос, добавленный другим процессом: назначаем новый
+                question.id = None
+            if position is None or position > len(questions):
+                questions.append(question)
+            else:
+                questions.insert(position, question)
+            inserted.append(question)
+        assign_ids(questions)
+        return {'bank': op['bank'], 'op': 'delete', 'ids': [q.id for q in inserted]}
+
+    if kind == 'delete':
+        ids = set(op['ids'])
+        removed = [[pos, q.to_dict()] for pos, q in enumerate(questions) if q.id in ids]
+        questions[:] = [q for q in questions if q.id not in ids]
+        return {'bank': op['bank'], 'op': 'insert', 'items': removed}
+
+    if kind == 'replace':
+        positions = {q.id: pos for pos, q in enumerate(questions)}
+        old_records = []
+        for record in op['records']:
+            pos = positions.get(record.get('id'))
+            if pos is None:
+                continue
+            old_records.append(questions[pos].to_dict())
+            questions[pos] = Question.from_dict(record)
+        return {'bank': op['bank'], 'op': 'replace', 'records': old_records}
+
+    raise ValueError(f"Unknown operation: {kind}")
+
+
+def _touched_ids(op, inverse):
+    """id вопросов, которые добавила, изменила или удалила операция"""
+    if op['op'] == 'insert':
+        return inverse['ids']
+    if op['op'] == 'delete':
+        return op['ids']
+    return [record['id'] for record in inverse['records']]
+
+
+class EditHistory:
+    """Журнал отмены и повтора правок.
+
+    Каждая запись - список обратных операций одной правки, поэтому память
+    зависит от размера правок, а не от размера банка. Число записей
+    ограничено, журнал сохраняется в файл и переживает перезапуск.
+
+    Журнал общий для всех процессов: каждое изменение делается под
+    FileLock журнала по свежей версии файла.
+    """
+
+    def __init__(self, path, limit=HISTORY_LIMIT):
+        self.path = path
+        self.limit = limit
+        self.undo_stack = []
+        self.redo_stack = []
+        self._read()
+
+    def _read(self):
+        """Читает стеки из файла, не подменяя сами списки"""
+        undo, redo = [], []
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                undo = data.get('undo', [])
+                redo = data.get('redo', [])
+        except Exception as e:
+            Logger.error(f"Error reading edit history: {e}")
+        self.undo_stack[:] = undo
+        self.redo_stack[:] = redo
+
+    @contextmanager
+    def locked(self):
+        """Блокирует журнал и перечитывает его: другой процесс мог записать правки"""
+        with FileLock(self.path):
+            self._read()
+            yield
+
+    def record(self, inverse):
+        """Запоминает обратные операции новой правки"""
+        try:
+            with self.locked():
+                self.undo_stack.append(inverse)
+                del self.undo_stack[:-self.limit]
+                self.redo_stack.clear()
+                self.save()
+        except OSError as e:
+            Logger.error(f"Error recording edit history: {e}")
+
+    def clear(self):
+        try:
+            with self.locked():
+                self.undo_stack.clear()
+                self.redo_stack.clear()
+                self.save()
+        except OSError as e:
+            Logger.error(f"Error clearing edit history: {e}")
+
+    def save(self):
+        """Записывает журнал; вызывается внутри locked()"""
+        data = {'undo': self.undo_stack, 'redo': self.redo_stack}
+        try:
+            atomic_write(self.path, lambda f: json.dump(data, f, ensure_ascii=False))
+        except Exception as e:
+            Logger.error(f"Error writing edit history: {e}")
+
+
+class RandomDeck:
+    """Колода позиций вопросов в случайном порядке.
+
+    Ленивая перестановка Фишера-Йетса: колода не перемешивается заранее,
+    а хранит только уже сделанные обмены, поэтому создание колоды на
+    сотни тысяч вопросов мгновенно, а память растет с числом вытянутых.
+    """
+
+    def __init__(self, positions):
+        self.positions = positions
+        self._remaining = len(positions)
+        self._swaps = {}
+        self._next = None
+
+    def __len__(self):
+        return self._remaining + (self._next is not None)
+
+    def peek(self):
+        """Следующая позиция (без извлечения) или None, если колода пуста"""
+        if self._next is None and self._remaining:
+            i = random.randrange(self._remaining)
+            last = self._remaining - 1
+            value = self._swaps.get(i, i)
+            self._swaps[i] = self._swaps.pop(last, last)
+            self._remaining = last
+            self._next = self.positions[value]
+        return self._next
+
+    def pop(self):
+        """Извлекает следующую позицию"""
+        position = self.peek()
+        self._next = None
+        return position
+
+
+class HardFirstDeck:
+    """Колода, которая сначала выдает позиции first по порядку, а затем
+    остальные позиции positions в случайном порядке (без повторов first).
+
+    first должны входить в positions.
+    """
+
+    def __init__(self, first, positions):
+        self._first = list(reversed(first))
+        self._served = set(self._first)
+        self._rest = RandomDeck(positions)
+        # Сколько выданных из first позиций еще встретится в случайной части
+        self._skip = len(self._first)
+
+    def __len__(self):
+        return len(self._first) + len(self._rest) - self._skip
+
+    def peek(self):
+        if self._first:
+            return self._first[-1]
+        while True:
+            position = self._rest.peek()
+            if position is None or position not in self._served:
+                return position
+            self._rest.pop()
+            self._skip -= 1
+
+    def pop(self):
+        position = self.peek()
+        if self._first:
+            self._first.pop()
+        else:
+            self._rest.pop()
+        return position
+
+
+def shuffle_options(question, rng=random):
+    """Перемешивает варианты ответа.
+
+    Возвращает (исходные номера вариантов в новом порядке, номера правильных
+    вариантов в новом порядке).
+    """
+    order = list(range(len(question.options)))
+    rng.shuffle(order)
+    correct_mask = question.correct_mask
+    correct_indices = [new_index for new_index, original_index in enumerate(order)
+                       if correct_mask >> original_index & 1]
+    return order, correct_indices
+
+
+def is_answer_correct(correct_indices, selected_indices):
+    """Ответ верен, если выбраны все правильные варианты и только они"""
+    return set(selected_indices) == set(correct_indices)
+
+
+def find_position(questions, question_id):
+    """Позиция вопроса по id или None.
+
+    id обычно идут по возрастанию, поэтому сначала проверяется позиция
+    id - 1, затем двоичный поиск, и только если он не нашел - проход по банку.
+    """
+    count = len(questions)
+    guess = question_id - 1
+    if 0 <= guess < count and questions[guess].id == question_id:
+        return guess
+
+    low, high = 0, count
+    while low < high:
+        middle = (low + high) // 2
+        middle_id = questions[middle].id
+        if middle_id == question_id:
+            return middle
+        if middle_id < question_id:
+            low = middle + 1
+        else:
+            high = middle
+
+    for position, question in enumerate(questions):
+        if question.id == question_id:
+            return position
+    return None
+
+
+class ReviewQueue:
+    """Очередь вопросов для работы над ошибками.
+
+    Для каждого банка хранится OrderedDict: id вопроса -> число правильных
+    ответов подряд. Неправильный ответ ставит вопрос в конец очереди (без
+    повторов), после clear_after правильных ответов подряд вопрос уходит из
+    очереди. Каждое изменение дописывается в журнал одной строкой, файл
+    переписывается целиком только при сжатии журнала.
+
+    Дописывание и сжатие идут под FileLock журнала, а сжатие перечитывает
+    файл: строки, дописанные другими процессами, не теряются.
+    """
+
+    def __init__(self, path, clear_after=REVIEW_STREAK):
+        self.path = path
+        self.clear_after = clear_after
+        self.queues = {}
+        self._journal_lines = 0
+        self._read()
+
+    def _read(self):
+        """Восстанавливает очереди по журналу"""
+        self.queues = {}
+        self._journal_lines = 0
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        if line.strip():
+                            self._set(*json.loads(line))
+                            self._journal_lines += 1
+        except Exception as e:
+            Logger.error(f"Error reading review queue: {e}")
+
+    def count(self, bank):
+        queue = self.queues.get(bank)
+        return len(queue) if queue else 0
+
+    def record_answer(self, bank, question_id, correct):
+        """Учитывает ответ на вопрос"""
+        queue = self.queues.get(bank)
+        if correct:
+            if not queue or question_id not in queue:
+                return
+            streak = queue[question_id] + 1
+            if streak >= self.clear_after:
+                streak = None
+        else:
+            streak = 0
+        self._set(bank, question_id, streak)
+        self._append([bank, question_id, streak])
+
+    def first(self, bank):
+        """id первого вопроса очереди или None"""
+        queue = self.queues.get(bank)
+        return next(iter(queue)) if queue else None
+
+    def rotate(self, bank):
+        """Перекладывает первый вопрос очереди в конец и возвращает его id"""
+        question_id = self.first(bank)
+        if question_id is not None:
+            self.queues[bank].move_to_end(question_id)
+        return question_id
+
+    def discard(self, bank, question_id):
+        """Убирает вопрос из очереди (например, удаленный из банка)"""
+        queue = self.queues.get(bank)
+        if queue and question_id in queue:
+            self._set(bank, question_id, None)
+            self._append([bank, question_id, None])
+
+    def _set(self, bank, question_id, streak):
+        queue = self.queues.setdefault(bank, OrderedDict())
+        if streak is None:
+            queue.pop(question_id, None)
+            return
+        queue[question_id] = streak
+        if streak == 0:
+            queue.move_to_end(question_id)
+
+    def _append(self, entry):
+        self._journal_lines += 1
+        try:
+            with FileLock(self.path):
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        except Exception as e:
+            Logger.error(f"Error writing review queue: {e}")
+            return
+        # Журнал сжимается, когда в нем заметно больше строк, чем вопросов в очередях
+        if self._journal_lines > 2 * sum(len(queue) for queue in self.queues.values()) + 100:
+            self.compact()
+
+    def compact(self):
+        """Переписывает журнал состоянием очередей, перечитанным из файла"""
+        def write(f):
+            for bank, queue in self.queues.items():
+                for question_id, streak in queue.items():
+                    f.write(json.dumps([bank, question_id, streak], ensure_ascii=False) + '\n')
+
+        try:
+            with FileLock(self.path):
+                # Файл содержит и наши строки, и строки других процессов
+                self._read()
+                atomic_write(self.path, write)
+                self._journal_lines = sum(len(queue) for queue in self.queues.values())
+        except Exception as e:
+            Logger.error(f"Error compacting review queue: {e}")
+
+
+class ReviewDeck:
+    """Колода работы над ошибками: позиции вопросов из очереди ReviewQueue.
+
+    Вопросы идут по кругу, пока не уйдут из очереди после правильных ответов.
+    """
+
+    def __init__(self, review, bank, questions):
+        self.review = review
+        self.bank = bank
+        self.questions = questions
+
+    def __len__(self):
+        return self.review.count(self.bank)
+
+    def peek(self):
+        """Позиция следующего вопроса или None, если ошибок не осталось"""
+        while True:
+            question_id = self.review.first(self.bank)
+            if question_id is None:
+                return None
+            position = find_position(self.questions, question_id)
+            if position is not None:
+                return position
+            # Вопрос удален из банка
+            self.review.discard(self.bank, question_id)
+
+    def pop(self):
+        position = self.peek()
+        if position is not None:
+            self.review.rotate(self.bank)
+        return position
+
+
+def _file_stat(path):
+    """Возвращает (размер, время изменения) файла или None"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+class BankConflictError(Exception):
+    """Файл банка записал другой процесс после того, как банк был загружен"""
+
+
+class BankCatalog:
+    """Каталог банков вопросов.
+
+    Хранит в небольшом индексном файле имена банков, их файлы, количество
+    вопросов и размеры. В памяти держится только выбранный банк: при
+    переключении предыдущий освобождается, остальные банки не читаются.
+    """
+
+    def __init__(self, data_dir, default_filename=DEFAULT_BANK_FILENAME):
+        self.data_dir = data_dir
+        self.catalog_path = os.path.join(data_dir, CATALOG_FILENAME)
+        self.default_filename = default_filename
+        self.banks = []
+        self.current = DEFAULT_BANK_NAME
+
+        # Кэш выбранного банка и состояние файла, из которого он прочитан
+        self._loaded_name = None
+        self._loaded_questions = None
+        self._loaded_stat = None
+        self._loaded_version = None
+        self._tag_index = None
+
+        self._read_catalog()
+        self.history = EditHistory(os.path.join(data_dir, HISTORY_FILENAME))
+        self.review = ReviewQueue(os.path.join(data_dir, REVIEW_FILENAME))
+
+    def _read_catalog(self):
+        """Читает индексный файл каталога, создавая банк по умолчанию"""
+        try:
+            if os.path.exists(self.catalog_path):
+                with open(self.catalog_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                self.banks = [b for b in data.get('banks', []) if 'name' in b and 'file' in b]
+                self.current = data.get('current', DEFAULT_BANK_NAME)
+        except Exception as e:
+            Logger.error(f"Error reading bank catalog: {e}")
+            self.banks = []
+
+        if not self.banks:
+            # Первый запуск: подключаем существующий questions.json как основной банк
+            path = os.path.join(self.data_dir, self.default_filename)
+            stat = _file_stat(path)
+            self.banks = [{
+                'name': DEFAULT_BANK_NAME,
+                'file': self.default_filename,
+                'count': None,
+                'size': stat[0] if stat else 0
+            }]
+
+        if self.entry(self.current) is None:
+            self.current = self.banks[0]['name']
+
+    def _write_catalog(self, change=None):
+        """Сохраняет индексный файл каталога под его FileLock.
+
+        Под блокировкой каталог перечитывается, и change() применяет правку
+        уже к свежему списку банков: банки, добавленные другим процессом,
+        не теряются. Возвращает результат change().
+        """
+        with FileLock(self.catalog_path):
+            self._merge_catalog()
+            result = change() if change is not None else None
+            data = {'current': self.current, 'banks': self.banks}
+            try:
+                atomic_write(self.catalog_path, lambda f: json.dump(data, f, ensure_ascii=False, indent=2))
+            except Exception as e:
+                Logger.error(f"Error writing bank catalog: {e}")
+        return result
+
+    def _merge_catalog(self):
+        """Берет банки из файла каталога и добавляет к ним свои, которых там нет"""
+        try:
+            with open(self.catalog_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            Logger.error(f"Error reading bank catalog: {e}")
+            return
+        banks = [b for b in data.get('banks', []) if isinstance(b, dict) and 'name' in b and 'file' in b]
+        names = {b['name'] for b in banks}
+        banks.extend(b for b in self.banks if b['name'] not in names)
+        self.banks = banks
+
+    def names(self):
+        """Возвращает имена всех банков"""
+        return [b['name'] for b in self.banks]
+
+    def entry(self, name):
+        """Возвращает запись каталога для банка или None"""
+        for bank in self.banks:
+            if bank['name'] == name:
+                return bank
+        return None
+
+    def path(self, name=None):
+        """Возвращает путь к файлу банка (по умолчанию - выбранного)"""
+        entry = self.entry(name or self.current)
+        return os.path.join(self.data_dir, entry['file'])
+
+    def is_read_only(self, name=None):
+        """Банк только для чтения (формат .qbk)"""
+        entry = self.entry(name or self.current)
+        return entry['file'].endswith(READ_ONLY_EXTENSION)
+
+    def add_read_only_bank(self, source_path, name=None):
+        """Подключает файл .qbk как банк только для чтения и возвращает его запись"""
+        from mapped_bank import MappedBank
+
+        name = (name or os.path.splitext(os.path.basename(source_path))[0]).strip()
+
+        def add():
+            if self.entry(name) is not None:
+                raise ValueError(f"Банк '{name}' уже существует")
+
+            used_files = {b['file'] for b in self.banks}
+            number = len(self.banks)
+            while f'bank_{number}{READ_ONLY_EXTENSION}' in used_files:
+                number += 1
+            file_name = f'bank_{number}{READ_ONLY_EXTENSION}'
+            target = os.path.join(self.data_dir, file_name)
+            shutil.copyfile(source_path, target)
+
+            # Проверяем, что файл читается, до добавления в каталог
+            try:
+                bank = MappedBank(target)
+            except Exception:
+                os.remove(target)
+                raise
+            count = len(bank)
+            bank.close()
+
+            entry = {'name': name, 'file': file_name, 'count': count, 'size': os.path.getsize(target)}
+            self.banks.append(entry)
+            return entry
+
+        if self.data_dir and not os.path.exists(self.data_dir):
+            os.makedirs(self.data_dir)
+        entry = self._write_catalog(add)
+        Logger.info(f"Added read-only bank '{name}' with {entry['count']} questions")
+        return entry
+
+    def media_dir(self, name=None):
+        """Папка с файлами изображений банка"""
+        entry = self.entry(name or self.current)
+        return os.path.join(self.data_dir, os.path.splitext(entry['file'])[0] + '_media')
+
+    def side_path(self, suffix, name=None):
+        """Путь к служебному файлу банка рядом с ним: <имя файла банка><suffix>"""
+        entry = self.entry(name or self.current)
+        return os.path.join(self.data_dir, os.path.splitext(entry['file'])[0] + suffix)
+
+    def media_path(self, image):
+        """Полный путь к файлу изображения выбранного банка"""
+        return os.path.join(self.media_dir(), image)
+
+    def import_media(self, source_path):
+        """Копирует изображение в папку медиа банка и возвращает его имя.
+
+        Имя строится по содержимому файла, поэтому одинаковые картинки
+        хранятся один раз.
+        """
+        with open(source_path, 'rb') as f:
+            digest = hashlib.sha1(f.read()).hexdigest()[:16]
+        image = digest + os.path.splitext(source_path)[1].lower()
+
+        media_dir = self.media_dir()
+        if not os.path.exists(media_dir):
+            os.makedirs(media_dir)
+        target = os.path.join(media_dir, image)
+        if not os.path.exists(target):
+            shutil.copyfile(source_path, target)
+        return image
+
+    def create_bank(self, name):
+        """Создает новый пустой банк и возвращает его запись"""
+        name = name.strip()
+        if not name:
+            raise ValueError("Имя банка не может быть пустым")
+
+        def create():
+            if self.entry(name) is not None:
+                raise ValueError(f"Банк '{name}' уже существует")
+
+            # Имя файла не зависит от имени банка, чтобы не возиться с кириллицей
+            used_files = {b['file'] for b in self.banks}
+            number = len(self.banks)
+            while f'bank_{number}.json' in used_files:
+                number += 1
+
+            entry = {'name': name, 'file': f'bank_{number}.json', 'count': 0, 'size': 0}
+            self.banks.append(entry)
+            return entry
+
+        entry = self._write_catalog(create)
+        Logger.info(f"Created bank '{name}' in {entry['file']}")
+        return entry
+
+    def select(self, name):
+        """Делает банк текущим и освобождает ранее загруженный"""
+        if self.entry(name) is None:
+            raise KeyError(name)
+        if name == self.current:
+            return
+        self.current = name
+        self._release()
+        self._write_catalog()
+        Logger.info(f"Selected bank '{name}'")
+
+    def _release(self):
+        """Освобождает загруженный банк"""
+        if hasattr(self._loaded_questions, 'close'):
+            self._loaded_questions.close()
+        self._loaded_name = None
+        self._loaded_questions = None
+        self._loaded_stat = None
+        self._loaded_version = None
+        self._tag_index = None
+
+    def load(self, shared=False):
+        """Возвращает вопросы выбранного банка, читая файл только при изменении.
+
+        Для банка только для чтения возвращается MappedBank: вопросы
+        декодируются по одному при обращении по позиции. shared=True
+        возвращает сам загруженный список без копии: изменять его нельзя.
+
+        Версия читается до файла: если другой процесс успеет записать банк,
+        при следующем вызове банк прочитается заново.
+        """
+        path = self.path()
+        version = read_version(path)
+        stat = _file_stat(path)
+        if (self._loaded_name == self.current and self._loaded_questions is not None
+                and stat == self._loaded_stat and version == self._loaded_version):
+            if self.is_read_only() or shared:
+                return self._loaded_questions
+            return list(self._loaded_questions)
+
+        if self.is_read_only():
+            from mapped_bank import MappedBank
+
+            self._release()
+            bank = MappedBank(path)
+            self._loaded_name = self.current
+            self._loaded_questions = bank
+            self._loaded_stat = stat
+            self._loaded_version = version
+            self._update_entry(self.current, len(bank), stat)
+            return bank
+
+        from bank_cache import load_cache, rebuild_cache_async
+
+        Logger.info(f"Loading questions from: {path}")
+        cached = load_cache(path, stat)
+        if cached is not None:
+            # Кэш быстрого запуска: без разбора JSON и вместе с индексом тегов
+            questions, tag_index = cached
+            Logger.info(f"Loaded {len(questions)} questions from cache")
+        else:
+            questions = assign_ids(_read_bank_checked(path))
+            tag_index = None
+            Logger.info(f"Loaded {len(questions)} questions")
+            rebuild_cache_async(path, questions, stat)
+
+        self._loaded_name = self.current
+        self._loaded_questions = questions
+        self._loaded_stat = stat
+        self._loaded_version = version
+        self._tag_index = tag_index
+        self._update_entry(self.current, len(questions), stat)
+        return questions if shared else list(questions)
+
+    def drop_caches(self):
+        """Освобождает память загруженного банка при ее нехватке.
+
+        У банка только для чтения сбрасываются декодированные вопросы,
+        обычный банк выгружается целиком: следующий load() прочитает его
+        из кэша быстрого запуска.
+        """
+        if hasattr(self._loaded_questions, 'drop_cache'):
+            self._loaded_questions.drop_cache()
+        else:
+            self._release()
+
+    def save(self, questions):
+        """Сохраняет вопросы выбранного банка целиком и обновляет каталог.
+
+        Если после загрузки банк записал другой процесс, вызывает
+        BankConflictError: перезапись потеряла бы его изменения.
+        """
+        self._check_writable()
+        path = self.path()
+        with FileLock(path):
+            if self._loaded_name == self.current and read_version(path) != self._loaded_version:
+                raise BankConflictError("Банк изменен другим процессом, загрузите его заново")
+            return self._write_locked(self.current, questions)
+
+    def _write_locked(self, bank, questions, changed_ids=None):
+        """Записывает банк под его FileLock и увеличивает версию файла.
+
+        changed_ids - id вопросов, затронутых правкой: контрольные суммы
+        пересчитываются только для них (None - для всего банка).
+        """
+        from integrity import update_checksums
+
+        path = self.path(bank)
+        Logger.info(f"Saving {len(questions)} questions to: {path}")
+        write_bank_file(path, assign_ids(questions))
+        update_checksums(path, questions, changed_ids)
+        version = bump_version(path)
+
+        stat = _file_stat(path)
+        if bank == self.current:
+            from bank_cache import rebuild_cache_async
+
+            rebuild_cache_async(path, questions, stat)
+            self._loaded_name = self.current
+            self._loaded_questions = list(questions)
+            self._loaded_stat = stat
+            self._loaded_version = version
+            self._tag_index = None
+        self._update_entry(bank, len(questions), stat)
+        return stat is not None and stat[0] > 0
+
+    def tag_index(self):
+        """Возвращает индекс тегов выбранного банка, строя его один раз"""
+        questions = self.load(shared=True)
+        if self._tag_index is None:
+            if self.is_read_only():
+                self._tag_index = questions.tag_index()
+            else:
+                self._tag_index = TagIndex(questions)
+        return self._tag_index
+
+    def add_question(self, question):
+        """Добавляет вопрос в конец выбранного банка"""
+        self._commit([{'bank': self.current, 'op': 'insert', 'items': [[None, question.to_dict()]]}])
+
+    def add_questions(self, questions):
+        """Добавляет вопросы в конец выбранного банка одной записью файла"""
+        items = []
+        for question in questions:
+            record = question.to_dict()
+            record.pop('id', None)
+            items.append([None, record])
+        if items:
+            self._commit([{'bank': self.current, 'op': 'insert', 'items': items}])
+        return len(items)
+
+    def update_question(self, question):
+        """Заменяет вопрос с тем же id"""
+        self._commit([{'bank': self.current, 'op': 'replace', 'records': [question.to_dict()]}])
+
+    def apply_sync(self, upserts, deletes):
+        """Применяет изменения синхронизации одной правкой, которую можно отменить.
+
+        upserts - записи с id: существующие заменяются, новые добавляются в конец.
+        """
+        existing = {question.id for question in self.load()}
+        ops = []
+        deletes = [question_id for question_id in deletes if question_id in existing]
+        if deletes:
+            ops.append({'bank': self.current, 'op': 'delete', 'ids': deletes})
+        replaced = [record for record in upserts if record.get('id') in existing]
+        if replaced:
+            ops.append({'bank': self.current, 'op': 'replace', 'records': replaced})
+        inserted = [[None, record] for record in upserts if record.get('id') not in existing]
+        if inserted:
+            ops.append({'bank': self.current, 'op': 'insert', 'items': inserted})
+        if ops:
+            self._commit(ops)
+
+    def restore_records(self, items):
+        """Возвращает записи [позиция, запись] с их id одной правкой.
+
+        Записи с id, которые есть в банке, заменяются, пропавшие
+        вставляются на свою позицию (None - в конец).
+        """
+        self._check_writable()
+        existing = {question.id for question in self.load()}
+        ops = []
+        replaced = [record for position, record in items if record['id'] in existing]
+        if replaced:
+            ops.append({'bank': self.current, 'op': 'replace', 'records': replaced})
+        inserted = [[position, record] for position, record in items if record['id'] not in existing]
+        if inserted:
+            ops.append({'bank': self.current, 'op': 'insert', 'items': inserted})
+        if ops:
+            self._commit(ops)
+
+    def _check_writable(self):
+        if self.is_read_only():
+            raise ValueError("Банк только для чтения")
+
+    def delete_questions(self, ids):
+        """Удаляет вопросы с указанными id одной записью файла"""
+        self._check_writable()
+        ids = set(ids)
+        existing = [q.id for q in self.load() if q.id in ids]
+        if existing:
+            self._commit([{'bank': self.current, 'op': 'delete', 'ids': existing}])
+        return len(existing)
+
+    def retag_questions(self, ids, add=(), remove=()):
+        """Добавляет и убирает теги у вопросов с указанными id одной записью файла"""
+        self._check_writable()
+        ids = set(ids)
+        records = []
+        for question in self.load():
+            if question.id not in ids:
+                continue
+            tags = [tag for tag in question.tags if tag not in remove]
+            tags.extend(tag for tag in add if tag not in tags)
+            if tuple(tags) != question.tags:
+                record = question.to_dict()
+                record['tags'] = tags
+                records.append(record)
+        if records:
+            self._commit([{'bank': self.current, 'op': 'replace', 'records': records}])
+        return len(records)
+
+    def move_questions(self, ids, target_name):
+        """Переносит вопросы в другой банк: одна запись в целевой банк и одна в текущий"""
+        if target_name == self.current or self.entry(target_name) is None:
+            return 0
+        self._check_writable()
+        ids = set(ids)
+        moving = [q for q in self.load() if q.id in ids]
+        if not moving:
+            return 0
+
+        # Картинки переезжают вместе с вопросами
+        source_media = self.media_dir()
+        target_media = self.media_dir(target_name)
+        items = []
+        for question in moving:
+            for image in question.images():
+                source = os.path.join(source_media, image)
+                target = os.path.join(target_media, image)
+                if os.path.exists(source) and not os.path.exists(target):
+                    if not os.path.exists(target_media):
+                        os.makedirs(target_media)
+                    shutil.copyfile(source, target)
+            # id в целевом банке назначаются заново, чтобы не пересечься с существующими
+            record = question.to_dict()
+            record.pop('id', None)
+            items.append([None, record])
+
+        # Сначала пишем целевой банк: при сбое вопросы задублируются, но не потеряются
+        self._commit([
+            {'bank': target_name, 'op': 'insert', 'items': items},
+            {'bank': self.current, 'op': 'delete', 'ids': [q.id for q in moving]}
+        ])
+        return len(moving)
+
+    def replace_all(self, questions):
+        """Заменяет весь банк (импорт); история правок при этом сбрасывается.
+
+        Импорт - намеренная перезапись, поэтому версия банка не сверяется.
+        """
+        self._check_writable()
+        with FileLock(self.path()):
+            saved = self._write_locked(self.current, questions)
+        if not saved:
+            return False
+        self.history.clear()
+        return True
+
+    def undo(self):
+        """Отменяет последнюю правку. Возвращает False, если отменять нечего"""
+        return self._replay(self.history.undo_stack, self.history.redo_stack)
+
+    def redo(self):
+        """Повторяет отмененную правку. Возвращает False, если повторять нечего"""
+        return self._replay(self.history.redo_stack, self.history.undo_stack)
+
+    def _replay(self, source, target):
+        # Другой процесс мог записать или отменить правку: журнал берется из файла
+        with self.history.locked():
+            if not source:
+                return False
+            ops = source.pop()
+            try:
+                inverse = self._apply(ops)
+            except Exception:
+                source.append(ops)
+                raise
+            target.append(inverse)
+            self.history.save()
+        return True
+
+    def _commit(self, ops):
+        """Применяет операции и записывает обратные в историю"""
+        self.history.record(self._apply(ops))
+
+    def _apply(self, ops):
+        """Применяет операции, записывая каждый банк один раз, и возвращает обратные.
+
+        Все затронутые банки блокируются на время правки. Операции ссылаются
+        на вопросы по id, поэтому применяются к свежей версии файла, даже если
+        ее успел записать другой процесс.
+        """
+        banks = []
+        for op in ops:
+            if op['bank'] not in banks:
+                banks.append(op['bank'])
+
+        for bank in banks:
+            if self.entry(bank) is not None and self.is_read_only(bank):
+                raise ValueError(f"Банк '{bank}' только для чтения")
+
+        banks = [bank for bank in banks if self.entry(bank) is not None]
+        inverse = []
+        with ExitStack() as stack:
+            # Блокировки берутся в одном порядке во всех процессах, иначе два
+            # переноса между одними банками могли бы ждать друг друга вечно
+            for path in sorted({self.path(bank) for bank in banks}):
+                stack.enter_context(FileLock(path))
+
+            for bank in banks:
+                if bank == self.current:
+                    # Под блокировкой load() перечитывает банк, если его записал другой процесс
+                    questions = self.load()
+                else:
+                    questions = assign_ids(_read_bank_checked(self.path(bank)))
+
+                changed_ids = set()
+                for op in ops:
+                    if op['bank'] == bank:
+                        undo = _apply_operation(questions, op)
+                        changed_ids.update(_touched_ids(op, undo))
+                        inverse.append(undo)
+
+                if not self._write_locked(bank, questions, changed_ids):
+                    raise IOError("Не удалось сохранить вопросы")
+
+        inverse.reverse()
+        return inverse
+
+    def _update_entry(self, name, count, stat):
+        """Обновляет количество и размер банка в каталоге"""
+        entry = self.entry(name)
+        size = stat[0] if stat else 0
+        if entry['count'] != count or entry['size'] != size:
+            entry['count'] = count
+            entry['size'] = size
+
+            def update():
+                entry = self.entry(name)
+                if entry is not None:
+                    entry['count'] = count
+                    entry['size'] = size
+
+            try:
+                self._write_catalog(update)
+            except OSError as e:
+                # Счетчики в каталоге только для показа: их обновит следующая запись
+                Logger.error(f"Error updating bank catalog: {e}")
@@ -0,0 +1,460 @@
+"""Длительный прогон экзамена без экрана: задержка циклов и рост памяти.
+
+Запускает ExamApp в окне-заглушке (WindowBase Kivy с GL-бэкендом mock, без
+SDL и видеокарты) на синтетическом банке во временной папке и прогоняет
+тысячи циклов «Ответить» - «Далее» с отрисовкой кадра после каждого
+нажатия, время от времени правя вопросы через окно редактирования.
+
+Для каждого цикла записывается время обработки нажатий вместе с кадрами,
+а каждые --sample-every циклов - число объектов Python, виджетов в окне,
+инструкций холста и RSS процесса. Прогон завершается с кодом 1, если p95
+задержки или рост памяти после прогрева превышают бюджеты. Рост считается
+по минимумам замеров в первой и второй половине прогона после прогрева:
+число объектов зависит от текущего вопроса, а утечка поднимает минимум.
+
+Режим экономии памяти (--low-memory) проверяется тем же прогоном, а
+--compare-low-memory запускает прогон дважды, в отдельных процессах с
+режимом и без, на большом банке и сравнивает пиковый RSS: прогон падает,
+если режим не уменьшил его хотя бы на --min-peak-saving-pct процентов.
+
+Перед прогоном уменьшение картинок без Pillow сверяется попиксельно с
+известным узором: ошибка в шаге строк тоже завершает прогон с кодом 1.
+
+    python soak.py --cycles 5000 --edit-every 100
+    python soak.py --cycles 20000 --max-p95-ms 30 --max-rss-growth-mb 10 --json soak.json
+    python soak.py --compare-low-memory --questions 5000 --cycles 1000
+"""
+import os
+
+# Окружение Kivy задается до первого импорта kivy
+os.environ['KIVY_GL_BACKEND'] = 'mock'
+os.environ['KIVY_WINDOW'] = ''
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+# Kivy пишет в logging и не перехватывает stderr: ошибки прогона видны в консоли
+os.environ['KIVY_LOG_MODE'] = 'PYTHON'
+
+import gc
+import math
+import sys
+import json
+import time
+import random
+import shutil
+import struct
+import zlib
+import logging
+import argparse
+import tempfile
+import subprocess
+
+logging.getLogger('kivy').setLevel(logging.WARNING)
+
+from kivy.config import Config
+
+# Кадры не ждут 1/60 секунды: меряем только работу приложения
+Config.set('graphics', 'maxfps', '0')
+
+from kivy.base import EventLoop
+from kivy.clock import Clock
+from kivy.lang import Builder
+from kivy.uix.modalview import ModalView
+
+# Поставщика окна нет намеренно: окно-заглушка создается ниже
+logging.getLogger('kivy').setLevel(logging.CRITICAL + 1)
+import kivy.core.window as window_module
+from kivy.core.window import WindowBase
+logging.getLogger('kivy').setLevel(logging.WARNING)
+
+from loadtest import percentile
+from question_bank import BankCatalog, Question
+
+SOAK_TAGS = ('история', 'география', 'физика', 'химия', 'биология', 'литература')
+_WORDS = ('вопрос', 'ответ', 'экзамен', 'задача', 'пример', 'формула', 'событие', 'страна',
+          'закон', 'элемент', 'реакция', 'клетка', 'автор', 'роман', 'год', 'столица')
+
+
+class HeadlessWindow(WindowBase):
+    """Окно без экрана: холст и раскладка настоящие, рисование - в GL-заглушку"""
+
+
+def install_window():
+    """Создает окно-заглушку и подставляет его вместо kivy.core.window.Window"""
+    window = HeadlessWindow()
+    window_module.Window = window
+    EventLoop.window = window
+    return window
+
+
+def frame(window):
+    """Один кадр цикла событий без чтения ввода (как EventLoop.idle)"""
+    Clock.tick()
+    Builder.sync()
+    Clock.tick_draw()
+    Builder.sync()
+    if window.canvas.needs_redraw:
+        window.dispatch('on_draw')
+        window.dispatch('on_flip')
+
+
+def current_rss():
+    """Текущий RSS процесса в байтах или None, если узнать его нельзя"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    # Без /proc доступен только пиковый RSS
+    return peak_rss()
+
+
+def peak_rss():
+    """Пиковый RSS процесса в байтах или None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def synthetic_questions(count, rng):
+    """Вопросы разной длины с 2-6 вариантами, несколькими правильными и тегами"""
+    questions = []
+    for i in range(count):
+        text = f"{i + 1}. " + ' '.join(rng.choice(_WORDS) for _ in range(rng.randint(3, 40))) + '?'
+        options = [' '.join(rng.choice(_WORDS) for _ in range(rng.randint(1, 15)))
+                   for _ in range(rng.randint(2, 6))]
+        correct_mask = 0
+        while not correct_mask:
+            correct_mask = rng.getrandbits(len(options))
+        tags = rng.sample(SOAK_TAGS, rng.randint(0, 2))
+        questions.append(Question(text, options, correct_mask, tags))
+    return questions
+
+
+def write_known_png(path, width, height):
+    """Пишет RGB-картинку PNG, где пиксель (x, y) равен (x % 256, y % 256, 100).
+    Ширина берется некратной четырем, чтобы строки у загрузчика шли с выравниванием.
+    """
+    def chunk(kind, payload):
+        return struct.pack('>I', len(payload)) + kind + payload + struct.pack('>I', zlib.crc32(kind + payload))
+
+    raw = b''.join(b'\x00' + bytes(channel for x in range(width) for channel in (x % 256, y % 256, 100))
+                   for y in range(height))
+    with open(path, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+                + chunk(b'IDAT', zlib.compress(raw)) + chunk(b'IEND', b''))
+
+
+def check_image_downscale(main, work_dir):
+    """Сверяет пиксели уменьшенной картинки с известным узором и возвращает список расхождений."""
+    from kivy.core.image import ImageLoader
+
+    path = os.path.join(work_dir, 'known.png')
+    write_known_png(path, 301, 203)
+    source = ImageLoader.load(path, keep_data=True, nocache=True)._data[0]
+    result = main.downscale_image_data(source, 100, 100)
+    step = math.ceil(max(source.width / 100, source.height / 100))
+    if (result.width, result.height) != ((source.width + step - 1) // step, (source.height + step - 1) // step):
+        return [f"уменьшенная картинка {result.width}x{result.height} вместо шага {step}"]
+    pixel = len(result.fmt)
+    if len(result.data) != result.width * result.height * pixel:
+        return [f"уменьшенная картинка занимает {len(result.data)} байт вместо {result.width * result.height * pixel}"]
+    errors = []
+    for y in range(result.height):
+        for x in range(result.width):
+            got = tuple(result.data[(y * result.width + x) * pixel:(y * result.width + x + 1) * pixel])
+            expected = (x * step % 256, y * step % 256, 100, 255)[:pixel]
+            if result.fmt in ('bgr', 'bgra'):
+                expected = expected[2::-1] + expected[3:]
+            if got != expected:
+                errors.append(f"пиксель ({x}, {y}) уменьшенной картинки {got} вместо {expected}")
+                if len(errors) >= 5:
+                    return errors
+    return errors
+
+
+def count_instructions(window):
+    """Виджеты в дереве окна и инструкции их холстов"""
+    widgets = 0
+    instructions = 0
+    for root in window.children:
+        for widget in root.walk():
+            widgets += 1
+            canvas = widget.canvas
+            instructions += len(canvas.children)
+            if canvas.has_before:
+                instructions += len(canvas.before.children)
+            if canvas.has_after:
+                instructions += len(canvas.after.children)
+    return widgets, instructions
+
+
+def take_sample(cycle, window):
+    gc.collect()
+    widgets, instructions = count_instructions(window)
+    return {
+        'cycle': cycle,
+        'objects': len(gc.get_objects()),
+        'widgets': widgets,
+        'instructions': instructions,
+        'rss': current_rss(),
+    }
+
+
+def close_popups(window):
+    for child in list(window.children):
+        if isinstance(child, ModalView):
+            child.dismiss(animation=False)
+
+
+class SoakDriver:
+    """Нажимает кнопки вкладок приложения так же, как пользователь"""
+
+    def __init__(self, app, window, load_questions, rng, correct_rate):
+        self.app = app
+        self.window = window
+        self.load_questions = load_questions
+        self.rng = rng
+        self.correct_rate = correct_rate
+        self.exam = app.exam_content
+        self.edit = app.edit_content
+        self.edits = 0
+
+    def answer_cycle(self):
+        """Ответ на текущий вопрос и переход к следующему; возвращает время в секундах"""
+        exam = self.exam
+        if exam.answer_btn.disabled:
+            # Колода закончилась: новая сессия, как кнопка на вкладке редактирования
+            exam.reset_session()
+            frame(self.window)
+
+        if self.rng.random() < self.correct_rate:
+            selected = exam.correct_indices
+        else:
+            selected = [self.rng.randrange(len(exam.checkboxes))]
+
+        start = time.perf_counter()
+        for index in selected:
+            exam.checkboxes[index].active = True
+        exam.on_answer_btn_press(exam.answer_btn)
+        frame(self.window)
+        exam.on_answer_btn_press(exam.answer_btn)
+        frame(self.window)
+        return time.perf_counter() - start
+
+    def switch_tab(self, content):
+        self.app.tabs.switch_to(next(tab for tab in self.app.tabs.tab_list if tab.content is content))
+        frame(self.window)
+
+    def visit_edit_tab(self):
+        """Открывает вкладку редактирования и возвращается к экзамену"""
+        self.switch_tab(self.edit)
+        self.switch_tab(self.exam)
+
+    def edit_cycle(self):
+        """Правка случайного вопроса через окно редактирования"""
+        questions = self.load_questions()
+        index = self.rng.randrange(len(questions))
+        self.edits += 1
+        self.edit.edit_question(index, questions)
+        form = self.edit.edit_form
+        form.question_input.text = f"{questions[index].text.split(' #')[0]} #{self.edits}"
+        frame(self.window)
+        self.edit.save_edit(None)
+        close_popups(self.window)
+        frame(self.window)
+
+
+def run(args):
+    rng = random.Random(args.seed)
+    work_dir = tempfile.mkdtemp(prefix='soak-')
+    previous_dir = os.getcwd()
+    # main.py держит банк в текущей папке, поэтому синтетический банк создается там же
+    os.chdir(work_dir)
+    try:
+        BankCatalog(work_dir).replace_all(synthetic_questions(args.questions, rng))
+        # Режим экономии памяти main.py выбирает при импорте
+        os.environ['EXAM_LOW_MEMORY'] = '1' if args.low_memory else '0'
+        window = install_window()
+        import main
+
+        # main.py включает подробный лог, а прогону нужны только предупреждения
+        logging.getLogger().setLevel(logging.WARNING)
+        image_errors = check_image_downscale(main, work_dir)
+        app = main.ExamApp()
+        app.root = app.build()
+        window.add_widget(app.root)
+        # Панель выбирает первую вкладку в первом кадре, поэтому экзамен открываем после него
+        frame(window)
+        driver = SoakDriver(app, window, main.load_questions, rng, args.correct_rate)
+        driver.switch_tab(app.exam_content)
+        latencies = []
+        samples = [take_sample(0, window)]
+        started = time.perf_counter()
+        for cycle in range(1, args.cycles + 1):
+            latencies.append(driver.answer_cycle())
+            if args.edit_every and cycle % args.edit_every == 0:
+                driver.edit_cycle()
+            if args.visit_edit_every and cycle % args.visit_edit_every == 0:
+                driver.visit_edit_tab()
+            if args.memory_warning_every and cycle % args.memory_warning_every == 0:
+                window.dispatch('on_memorywarning')
+            if cycle % args.sample_every == 0 or cycle == args.cycles:
+                samples.append(take_sample(cycle, window))
+                if args.progress:
+                    print(format_sample(samples[-1]), file=sys.stderr)
+        elapsed = time.perf_counter() - started
+        return latencies, samples, driver.edits, elapsed, image_errors
+    finally:
+        os.chdir(previous_dir)
+        if not args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def format_sample(sample):
+    rss = f"{sample['rss'] / 2 ** 20:.1f} МБ" if sample['rss'] is not None else '?'
+    return (f"цикл {sample['cycle']}: объектов {sample['objects']}, виджетов {sample['widgets']}, "
+            f"инструкций {sample['instructions']}, RSS {rss}")
+
+
+def summarize(args, latencies, samples):
+    """Сводка прогона и список превышенных бюджетов"""
+    measured = sorted(latencies[args.warmup:] or latencies)
+    after_warmup = [sample for sample in samples if sample['cycle'] >= args.warmup] or samples[-1:]
+    half = max(1, len(after_warmup) // 2)
+    early, late = after_warmup[:half], after_warmup[half:] or after_warmup[:half]
+
+    def growth(name):
+        values = [sample[name] for sample in after_warmup]
+        if None in values:
+            return None
+        return min(sample[name] for sample in late) - min(sample[name] for sample in early)
+
+    rss_growth = growth('rss')
+    baseline_objects = min(sample['objects'] for sample in early)
+    summary = {
+        'p50_ms': percentile(measured, 0.5) * 1000,
+        'p95_ms': percentile(measured, 0.95) * 1000,
+        'p99_ms': percentile(measured, 0.99) * 1000,
+        'max_ms': measured[-1] * 1000 if measured else 0.0,
+        'object_growth': growth('objects'),
+        'object_growth_pct': growth('objects') * 100.0 / baseline_objects,
+        'widget_growth': growth('widgets'),
+        'instruction_growth': growth('instructions'),
+        'rss_growth_mb': rss_growth / 2 ** 20 if rss_growth is not None else None,
+        'peak_rss_mb': peak_rss() / 2 ** 20 if peak_rss() is not None else None,
+    }
+
+    failures = []
+    if summary['p95_ms'] > args.max_p95_ms:
+        failures.append(f"p95 задержки {summary['p95_ms']:.1f} мс > {args.max_p95_ms} мс")
+    if summary['object_growth_pct'] > args.max_object_growth_pct:
+        failures.append(f"рост объектов {summary['object_growth_pct']:.1f}% > {args.max_object_growth_pct}%")
+    if summary['instruction_growth'] > args.max_instruction_growth:
+        failures.append(f"рост инструкций холста {summary['instruction_growth']} > {args.max_instruction_growth}")
+    if summary['rss_growth_mb'] is not None and summary['rss_growth_mb'] > args.max_rss_growth_mb:
+        failures.append(f"рост RSS {summary['rss_growth_mb']:.1f} МБ > {args.max_rss_growth_mb} МБ")
+    if args.max_peak_rss_mb and summary['peak_rss_mb'] is not None and summary['peak_rss_mb'] > args.max_peak_rss_mb:
+        failures.append(f"пиковый RSS {summary['peak_rss_mb']:.1f} МБ > {args.max_peak_rss_mb} МБ")
+    return summary, failures
+
+
+def compare_low_memory(args, argv):
+    """Прогоны с режимом экономии памяти и без него в отдельных процессах; сравнивает пиковый RSS"""
+    passed = [arg for arg in argv if arg not in ('--compare-low-memory', '--low-memory')]
+    results = {}
+    for low_memory in (False, True):
+        fd, json_path = tempfile.mkstemp(prefix='soak-', suffix='.json')
+        os.close(fd)
+        try:
+            command = [sys.executable, os.path.abspath(__file__)] + passed + ['--json', json_path]
+            if low_memory:
+                command.append('--low-memory')
+            completed = subprocess.run(command, stdout=subprocess.PIPE, universal_newlines=True)
+            with open(json_path, encoding='utf-8') as f:
+                results[low_memory] = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Прогон {'с режимом' if low_memory else 'без режима'} экономии памяти не удался: {e}")
+            return 1
+        finally:
+            os.remove(json_path)
+        name = 'С экономией памяти' if low_memory else 'Обычный режим'
+        summary = results[low_memory]['summary']
+        print(f"{name}: пиковый RSS {summary['peak_rss_mb']:.1f} МБ, p95 {summary['p95_ms']:.2f} мс, "
+              f"код {completed.returncode}")
+        for failure in results[low_memory]['failures']:
+            print(f"  Превышен бюджет: {failure}")
+
+    normal = results[False]['summary']['peak_rss_mb']
+    low = results[True]['summary']['peak_rss_mb']
+    saving = (normal - low) * 100.0 / normal
+    print(f"Экономия пикового RSS: {normal - low:.1f} МБ ({saving:.1f}%)")
+    failed = results[True]['failures'] or saving < args.min_peak_saving_pct
+    if saving < args.min_peak_saving_pct:
+        print(f"Режим экономии памяти уменьшил пиковый RSS меньше чем на {args.min_peak_saving_pct}%")
+    return 1 if failed else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Длительный прогон экзамена без экрана")
+    parser.add_argument('--cycles', type=int, default=5000, help="сколько вопросов ответить")
+    parser.add_argument('--questions', type=int, default=300, help="размер синтетического банка")
+    parser.add_argument('--edit-every', type=int, default=100, help="править вопрос каждые N циклов (0 - не править)")
+    parser.add_argument('--correct-rate', type=float, default=0.7, help="доля правильных ответов")
+    parser.add_argument('--sample-every', type=int, default=250, help="замер памяти каждые N циклов")
+    parser.add_argument('--warmup', type=int, default=500,
+                        help="циклов прогрева: кэши заполняются, рост считается после них")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--max-p95-ms', type=float, default=50.0)
+    parser.add_argument('--max-rss-growth-mb', type=float, default=20.0)
+    parser.add_argument('--max-object-growth-pct', type=float, default=2.0,
+                        help="рост числа объектов Python в процентах (их число зависит от размера банка)")
+    parser.add_argument('--max-instruction-growth', type=int, default=200)
+    parser.add_argument('--max-peak-rss-mb', type=float, default=0, help="бюджет пикового RSS (0 - без бюджета)")
+    parser.add_argument('--visit-edit-every', type=int, default=500,
+                        help="открывать вкладку редактирования каждые N циклов (0 - не открывать)")
+    parser.add_argument('--memory-warning-every', type=int, default=0,
+                        help="посылать сигнал нехватки памяти каждые N циклов (0 - не посылать)")
+    parser.add_argument('--low-memory', action='store_true', help="режим экономии памяти приложения")
+    parser.add_argument('--compare-low-memory', action='store_true',
+                        help="сравнить пиковый RSS с режимом экономии памяти и без него")
+    parser.add_argument('--min-peak-saving-pct', type=float, default=10.0,
+                        help="на сколько процентов режим экономии должен уменьшить пиковый RSS")
+    parser.add_argument('--json', help="записать замеры и сводку в файл JSON")
+    parser.add_argument('--progress', action='store_true', help="печатать замеры по ходу прогона")
+    parser.add_argument('--keep', action='store_true', help="не удалять временную папку с банком")
+    args = parser.parse_args(argv)
+    if args.compare_low_memory:
+        return compare_low_memory(args, sys.argv[1:] if argv is None else argv)
+
+    latencies, samples, edits, elapsed, image_errors = run(args)
+    summary, failures = summarize(args, latencies, samples)
+
+    print(f"Циклов: {len(latencies)}, правок: {edits}, {elapsed:.1f} с")
+    print(f"Задержка цикла, мс: p50 {summary['p50_ms']:.2f}, p95 {summary['p95_ms']:.2f}, "
+          f"p99 {summary['p99_ms']:.2f}, max {summary['max_ms']:.2f}")
+    print(f"Начало:  {format_sample(samples[0])}")
+    print(f"Конец:   {format_sample(samples[-1])}")
+    rss_growth = summary['rss_growth_mb']
+    print(f"Рост после прогрева: объектов {summary['object_growth']} ({summary['object_growth_pct']:.1f}%), виджетов {summary['widget_growth']}, "
+          f"инструкций {summary['instruction_growth']}, RSS "
+          + (f"{rss_growth:.1f} МБ" if rss_growth is not None else '?'))
+    if summary['peak_rss_mb'] is not None:
+        print(f"Пиковый RSS: {summary['peak_rss_mb']:.1f} МБ"
+              + (" (режим экономии памяти)" if args.low_memory else ""))
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'summary': summary, 'failures': failures + image_errors, 'samples': samples,
+                       'latencies_ms': [latency * 1000 for latency in latencies]}, f, ensure_ascii=False)
+
+    for error in image_errors:
+        print(f"Ошибка уменьшения картинки: {error}")
+    for failure in failures:
+        print(f"Превышен бюджет: {failure}")
+    return 1 if failures or image_errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
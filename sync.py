@@ -0,0 +1,497 @@
+"""Синхронизация банка вопросов между устройствами в локальной сети.
+
+Одно устройство запускает сервер (SyncServer), другое - синхронизацию
+(sync_with). Сравниваются хэши записей, а передаются только измененные
+вопросы:
+
+    GET  /buckets  хэши групп по BUCKET_SIZE id, наибольший id и имя банка
+    POST /hashes   хэши записей в перечисленных группах
+    POST /records  записи по списку id
+    POST /apply    изменения от клиента: {"upserts": [...], "deletes": [...]}
+    POST /media    картинки по списку имен: {"files": {имя: base64}}
+    POST /missing  каких картинок из списка имен нет на сервере
+    POST /upload   картинки от клиента: {"files": {имя: base64}}
+
+Сервер показывает PIN-код, и каждый запрос должен передать его в
+заголовке X-Sync-Pin: без него чужое устройство в той же сети не прочитает
+и не изменит банк. После MAX_PIN_FAILURES неверных кодов сервер отклоняет
+все запросы до перезапуска (новый сервер - новый код).
+
+Клиент хранит хэши записей после прошлой синхронизации с этим сервером
+(файл sync_state.json), поэтому по трехстороннему сравнению видно, какая
+сторона изменила вопрос. Если вопрос изменен на обеих сторонах, остается
+версия клиента. Вопросы, независимо добавленные на обоих устройствах под
+одним id, сохраняются оба: вопрос сервера получает новый id. При первой
+синхронизации прошлых хэшей нет и новые вопросы не отличить от измененных,
+поэтому совпадающие записи становятся общей базой, а для различающихся
+остается версия клиента.
+
+Вместе с вопросами передаются картинки, на которые они ссылаются и которых
+нет в папке медиа получателя. Картинки, которых нет и у отправителя,
+перечисляются в итоге синхронизации.
+
+    python cli.py sync-serve data_dir
+    python cli.py sync data_dir http://192.168.1.5:8765 --pin 123456
+"""
+import hmac
+import json
+import base64
+import os
+import socket
+import secrets
+import hashlib
+import logging
+import threading
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from file_lock import atomic_write
+from question_bank import _file_stat
+from validation import validate_records
+
+Logger = logging.getLogger('ExamApp')
+
+SYNC_PORT = 8765
+SYNC_STATE_FILENAME = 'sync_state.json'
+# Сколько соседних id объединяет одна группа хэшей
+BUCKET_SIZE = 256
+REQUEST_TIMEOUT = 30
+PIN_HEADER = 'X-Sync-Pin'
+PIN_DIGITS = 6
+# Сколько неверных PIN-кодов выдерживает сервер, прежде чем закрыться
+MAX_PIN_FAILURES = 10
+# Наибольший размер одной передаваемой картинки
+MAX_MEDIA_BYTES = 16 * 1024 * 1024
+
+
+class SyncPinError(Exception):
+    """Сервер синхронизации отклонил PIN-код"""
+
+
+def record_hash(record):
+    """Короткий хэш записи вопроса в формате JSON"""
+    data = json.dumps(record, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()[:16]
+
+
+def record_hashes(questions):
+    """Хэши записей банка: {id: хэш}"""
+    return {question.id: record_hash(question.to_dict()) for question in questions}
+
+
+def bucket_hashes(hashes):
+    """Хэши групп id: {номер группы: хэш}"""
+    buckets = {}
+    for question_id in sorted(hashes):
+        buckets.setdefault(question_id // BUCKET_SIZE, []).append(f"{question_id}:{hashes[question_id]}")
+    return {bucket: hashlib.sha1(','.join(items).encode('utf-8')).hexdigest()[:16]
+            for bucket, items in buckets.items()}
+
+
+def local_address():
+    """Адрес устройства в локальной сети (пакеты не отправляются)"""
+    probe = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        probe.connect(('10.255.255.255', 1))
+        return probe.getsockname()[0]
+    except OSError:
+        return '127.0.0.1'
+    finally:
+        probe.close()
+
+
+def _direct(fn):
+    return fn()
+
+
+class SyncServer:
+    """HTTP-сервер синхронизации для выбранного банка каталога.
+
+    dispatch(fn) выполняет обращение к каталогу; приложение передает функцию,
+    которая выполняет его в главном потоке. on_apply() вызывается (тоже
+    через dispatch) после применения изменений клиента. pin - код, который
+    нужно сообщить другому устройству (по умолчанию случайный).
+    """
+
+    def __init__(self, catalog, host='0.0.0.0', port=SYNC_PORT, dispatch=None, on_apply=None, pin=None):
+        self.catalog = catalog
+        self.dispatch = dispatch or _direct
+        self.on_apply = on_apply
+        self.pin = pin or f"{secrets.randbelow(10 ** PIN_DIGITS):0{PIN_DIGITS}d}"
+        self.pin_failures = 0
+        self._pin_lock = threading.Lock()
+        self._hashes_key = None
+        self._hashes = None
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._thread = None
+
+    @property
+    def port(self):
+        return self._httpd.server_address[1]
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self._handle(lambda: server.dispatch(server.buckets) if self.path == '/buckets' else None)
+
+            def do_POST(self):
+                routes = {'/hashes': server.hashes, '/records': server.records, '/apply': server.apply,
+                          '/media': server.media, '/missing': server.missing, '/upload': server.upload}
+                route = routes.get(self.path)
+
+                def call():
+                    if route is None:
+                        return None
+                    # Тело читается в потоке запроса, в dispatch уходит только обращение к каталогу
+                    body = self._read_body()
+                    return server.dispatch(lambda: route(body))
+
+                self._handle(call)
+
+            def _read_body(self):
+                length = int(self.headers.get('Content-Length', 0))
+                body = json.loads(self.rfile.read(length).decode('utf-8'))
+                if not isinstance(body, dict):
+                    raise ValueError("body must be a JSON object")
+                return body
+
+            def _handle(self, call):
+                """Проверяет PIN и отвечает результатом call(); None - нет такого адреса"""
+                if not server.check_pin(self.headers.get(PIN_HEADER)):
+                    self._reply({'error': 'wrong pin'}, 403)
+                    return
+                try:
+                    result = call()
+                    if result is None:
+                        self._reply({'error': 'not found'}, 404)
+                    else:
+                        self._reply(result)
+                except (ValueError, KeyError, TypeError, AttributeError) as e:
+                    # Некорректный запрос: неверный JSON, поля или типы
+                    self._reply({'error': str(e) or type(e).__name__}, 400)
+                except Exception as e:
+                    Logger.exception(f"Error handling sync request {self.command} {self.path}")
+                    self._reply({'error': str(e)}, 500)
+
+            def _reply(self, data, status=200):
+                payload = json.dumps(data, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                Logger.debug(f"Sync {self.address_string()}: {format % args}")
+
+        return Handler
+
+    def check_pin(self, pin):
+        """Сверяет PIN запроса; после MAX_PIN_FAILURES ошибок отклоняет все запросы"""
+        with self._pin_lock:
+            if self.pin_failures >= MAX_PIN_FAILURES:
+                return False
+            if pin is not None and hmac.compare_digest(pin.encode('utf-8'), self.pin.encode('utf-8')):
+                return True
+            self.pin_failures += 1
+            if self.pin_failures >= MAX_PIN_FAILURES:
+                Logger.warning("Too many wrong sync PINs, rejecting all requests until restart")
+            return False
+
+    def _current_hashes(self):
+        """Хэши записей текущего банка, пересчитываются только при изменении файла"""
+        key = (self.catalog.current, _file_stat(self.catalog.path()))
+        if key != self._hashes_key:
+            self._hashes = record_hashes(self.catalog.load())
+            self._hashes_key = key
+        return self._hashes
+
+    def buckets(self):
+        hashes = self._current_hashes()
+        return {
+            'bank': self.catalog.current,
+            'max_id': max(hashes, default=0),
+            'buckets': {str(bucket): value for bucket, value in bucket_hashes(hashes).items()},
+        }
+
+    def hashes(self, body):
+        wanted = {int(bucket) for bucket in body.get('buckets', [])}
+        return {'hashes': {str(question_id): value for question_id, value in self._current_hashes().items()
+                           if question_id // BUCKET_SIZE in wanted}}
+
+    def records(self, body):
+        wanted = set(_int_list(body.get('ids', []), 'ids'))
+        return {'records': [question.to_dict() for question in self.catalog.load() if question.id in wanted]}
+
+    def apply(self, body):
+        upserts = body.get('upserts', [])
+        deletes = _int_list(body.get('deletes', []), 'deletes')
+        report = validate_records(upserts)
+        if not report.ok:
+            raise ValueError(report.summary(limit=3))
+        self.catalog.apply_sync(upserts, deletes)
+        if self.on_apply is not None:
+            self.on_apply()
+        return {'count': len(upserts) + len(deletes)}
+
+    def media(self, body):
+        return {'files': read_media(self.catalog.media_dir(), _name_list(body.get('names', []), 'names'))}
+
+    def missing(self, body):
+        media_dir = self.catalog.media_dir()
+        return {'names': [name for name in _name_list(body.get('names', []), 'names')
+                          if not os.path.exists(os.path.join(media_dir, name))]}
+
+    def upload(self, body):
+        files = body.get('files', {})
+        if not isinstance(files, dict):
+            raise ValueError("files must be an object")
+        return {'count': store_media(self.catalog.media_dir(), files)}
+
+    def start(self):
+        """Запускает сервер в фоновом потоке"""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        Logger.info(f"Sync server listening on port {self.port}")
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+def _int_list(value, name):
+    """Список id из запроса"""
+    if not isinstance(value, list) or not all(type(item) is int for item in value):
+        raise ValueError(f"{name} must be a list of ids")
+    return value
+
+
+def _name_list(value, name):
+    """Список имен файлов картинок из запроса: только имена, без папок"""
+    if not isinstance(value, list) or not all(
+            isinstance(item, str) and item not in ('', '.', '..') and '/' not in item and '\\' not in item
+            for item in value):
+        raise ValueError(f"{name} must be a list of image file names")
+    return value
+
+
+def read_media(media_dir, names):
+    """Картинки из папки медиа в base64: {имя: данные}; отсутствующих файлов нет в ответе"""
+    files = {}
+    for name in names:
+        path = os.path.join(media_dir, name)
+        if os.path.isfile(path) and os.path.getsize(path) <= MAX_MEDIA_BYTES:
+            with open(path, 'rb') as f:
+                files[name] = base64.b64encode(f.read()).decode('ascii')
+    return files
+
+
+def store_media(media_dir, files):
+    """Записывает картинки {имя: base64} в папку медиа и возвращает, сколько записано.
+
+    Файлы, которые уже есть, не перезаписываются.
+    """
+    _name_list(list(files), 'files')
+    stored = 0
+    for name, encoded in files.items():
+        data = base64.b64decode(encoded, validate=True)
+        if len(data) > MAX_MEDIA_BYTES:
+            raise ValueError(f"image {name} is larger than {MAX_MEDIA_BYTES} bytes")
+        path = os.path.join(media_dir, name)
+        if not os.path.exists(path):
+            atomic_write(path, lambda f: f.write(data), 'wb')
+            stored += 1
+    return stored
+
+
+def _record_images(records):
+    """Имена картинок, на которые ссылаются записи вопросов"""
+    names = set()
+    for record in records:
+        if record.get('image'):
+            names.add(record['image'])
+        names.update(image for image in record.get('option_images') or () if image)
+    return names
+
+
+def _request(url, path, pin, body=None):
+    data = None if body is None else json.dumps(body, ensure_ascii=False).encode('utf-8')
+    request = urllib.request.Request(url.rstrip('/') + path, data=data,
+                                     headers={'Content-Type': 'application/json; charset=utf-8', PIN_HEADER: pin})
+    try:
+        with urllib.request.urlopen(request, timeout=REQUEST_TIMEOUT) as response:
+            return json.loads(response.read().decode('utf-8'))
+    except urllib.error.HTTPError as e:
+        if e.code == 403:
+            raise SyncPinError("Неверный PIN-код устройства") from None
+        raise
+
+
+def _read_state(path):
+    try:
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+    except Exception as e:
+        Logger.error(f"Error reading sync state: {e}")
+    return {}
+
+
+def _write_state(path, state):
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(temp_path, path)
+
+
+class SyncResult:
+    """Итог синхронизации: сколько вопросов получено и отправлено"""
+
+    def __init__(self):
+        self.pulled = 0
+        self.pushed = 0
+        self.deleted_local = 0
+        self.deleted_remote = 0
+        self.conflicts = 0
+        self.renumbered = 0
+        self.images = 0
+        self.missing_images = []  # Картинки, которых не нашлось у отправителя
+
+    def summary(self):
+        text = (f"Получено: {self.pulled}, отправлено: {self.pushed}, "
+                f"удалено здесь: {self.deleted_local}, на другом устройстве: {self.deleted_remote}, "
+                f"конфликтов: {self.conflicts}, перенумеровано: {self.renumbered}, картинок: {self.images}")
+        if self.missing_images:
+            text += f"\nНе найдены картинки: {', '.join(self.missing_images[:5])}"
+            if len(self.missing_images) > 5:
+                text += f" и еще {len(self.missing_images) - 5}"
+        return text
+
+
+def sync_with(catalog, url, pin, dispatch=None):
+    """Синхронизирует выбранный банк каталога с сервером и возвращает SyncResult.
+
+    pin - код, который показывает сервер.
+    """
+    dispatch = dispatch or _direct
+    state_path = os.path.join(catalog.data_dir, SYNC_STATE_FILENAME)
+    state = _read_state(state_path)
+
+    local_questions = dispatch(catalog.load)
+    local_bank = catalog.current
+    local = record_hashes(local_questions)
+
+    remote_info = _request(url, '/buckets', pin)
+    state_key = f"{url.rstrip('/')}|{local_bank}|{remote_info['bank']}"
+    first_sync = state_key not in state
+    base = {int(question_id): value for question_id, value in state.get(state_key, {}).items()}
+
+    # Хэши записей сервера запрашиваются только для групп, изменившихся с прошлого раза
+    remote_buckets = {int(bucket): value for bucket, value in remote_info['buckets'].items()}
+    base_buckets = bucket_hashes(base)
+    changed = {bucket for bucket in set(remote_buckets) | set(base_buckets)
+               if remote_buckets.get(bucket) != base_buckets.get(bucket)}
+    remote = {question_id: value for question_id, value in base.items()
+              if question_id // BUCKET_SIZE not in changed}
+    if changed:
+        fetched = _request(url, '/hashes', pin, {'buckets': sorted(changed)})['hashes']
+        remote.update((int(question_id), value) for question_id, value in fetched.items())
+
+    result = SyncResult()
+    pull_ids = []
+    push_ids = []
+    delete_local = []
+    delete_remote = []
+    renumber = []  # id, под которыми оба устройства добавили разные вопросы
+    for question_id in set(local) | set(remote) | set(base):
+        mine, theirs, old = local.get(question_id), remote.get(question_id), base.get(question_id)
+        if mine == theirs:
+            continue
+        if mine == old:
+            # Изменено только на сервере
+            if theirs is None:
+                delete_local.append(question_id)
+            else:
+                pull_ids.append(question_id)
+        elif theirs == old:
+            # Изменено только здесь
+            if mine is None:
+                delete_remote.append(question_id)
+            else:
+                push_ids.append(question_id)
+        elif old is None and first_sync:
+            # Без прошлой синхронизации не понять, какая сторона изменила вопрос
+            result.conflicts += 1
+            push_ids.append(question_id)
+        elif old is None:
+            renumber.append(question_id)
+            push_ids.append(question_id)
+        elif mine is None:
+            # Удален здесь, но изменен на сервере - сохраняем изменения
+            pull_ids.append(question_id)
+        else:
+            # Изменен на обеих сторонах (или удален на сервере) - остается версия клиента
+            result.conflicts += 1
+            push_ids.append(question_id)
+
+    remote_records = []
+    if pull_ids or renumber:
+        remote_records = _request(url, '/records', pin, {'ids': sorted(pull_ids + renumber)})['records']
+    local_by_id = {question.id: question for question in local_questions}
+
+    local_upserts = []
+    remote_upserts = [local_by_id[question_id].to_dict() for question_id in sorted(push_ids)]
+    next_id = max(max(local, default=0), remote_info['max_id']) + 1
+    renumbered = set(renumber)
+    for record in remote_records:
+        if record['id'] in renumbered:
+            # Вопрос сервера переезжает на новый id на обоих устройствах
+            record['id'] = next_id
+            next_id += 1
+            remote_upserts.append(record)
+            result.renumbered += 1
+        local_upserts.append(record)
+
+    report = validate_records(local_upserts)
+    if not report.ok:
+        raise ValueError(report.summary(limit=3))
+
+    # Картинки передаются до вопросов, чтобы вопрос не появился без них
+    media_dir = dispatch(catalog.media_dir)
+    wanted = sorted(name for name in _record_images(local_upserts)
+                    if not os.path.exists(os.path.join(media_dir, name)))
+    if wanted:
+        files = _request(url, '/media', pin, {'names': wanted})['files']
+        result.images += store_media(media_dir, files)
+        result.missing_images.extend(name for name in wanted if name not in files)
+    referenced = sorted(_record_images(remote_upserts))
+    if referenced:
+        sent = _request(url, '/missing', pin, {'names': referenced})['names']
+        files = read_media(media_dir, _name_list(sent, 'names'))
+        result.missing_images.extend(name for name in sent if name not in files)
+        if files:
+            result.images += _request(url, '/upload', pin, {'files': files})['count']
+
+    if local_upserts or delete_local:
+        dispatch(lambda: catalog.apply_sync(local_upserts, delete_local))
+    if remote_upserts or delete_remote:
+        _request(url, '/apply', pin, {'upserts': remote_upserts, 'deletes': delete_remote})
+    if result.missing_images:
+        Logger.warning(f"Sync: images not found: {', '.join(result.missing_images)}")
+
+    result.pulled = len(local_upserts) - result.renumbered
+    result.pushed = len(push_ids)
+    result.deleted_local = len(delete_local)
+    result.deleted_remote = len(delete_remote)
+
+    state[state_key] = {str(question_id): value
+                        for question_id, value in record_hashes(dispatch(catalog.load)).items()}
+    _write_state(state_path, state)
+    Logger.info(f"Synced with {url}: {result.summary()}")
+    return result
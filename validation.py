@@ -0,0 +1,193 @@
+"""Проверка вопросов перед сохранением.
+
+Один проход по записям со списком заранее подготовленных проверок. Каждая
+проверка получает запись-словарь в формате JSON и возвращает текст ошибки
+или None. Результат - отчет со списком корректных записей и всеми ошибками
+с номерами записей. Используется импортом, редактором и консольной
+утилитой cli.py.
+"""
+from collections import namedtuple
+
+# Допустимое количество вариантов ответа
+MIN_OPTIONS = 2
+MAX_OPTIONS = 6
+
+ValidationError = namedtuple('ValidationError', 'record field message')
+
+
+def _normalize(text):
+    """Текст варианта для поиска повторов: без лишних пробелов и регистра"""
+    text = text.strip().casefold()
+    if '  ' in text:
+        text = ' '.join(text.split())
+    return text
+
+
+def _check_question(record):
+    text = record.get('question')
+    if not isinstance(text, str):
+        return "Текст вопроса должен быть строкой"
+    if not text.strip():
+        return "Введите вопрос!"
+    return None
+
+
+def _check_options(record):
+    options = record.get('options')
+    if not isinstance(options, list):
+        return "Варианты ответов должны быть списком"
+    for option in options:
+        if not isinstance(option, str) or not option.strip():
+            return "Варианты ответов должны быть непустыми строками"
+    if len(options) < MIN_OPTIONS:
+        return "Должно быть хотя бы два варианта ответа!"
+    if len(options) > MAX_OPTIONS:
+        return f"Максимальное количество вариантов - {MAX_OPTIONS}"
+    if len({_normalize(option) for option in options}) != len(options):
+        return "Варианты ответов повторяются"
+    return None
+
+
+def _check_correct(record):
+    correct = record.get('correct')
+    if not isinstance(correct, list):
+        return "Правильные ответы должны быть списком номеров"
+    if not correct:
+        return "Выберите хотя бы один правильный ответ!"
+
+    options = record.get('options')
+    count = len(options) if isinstance(options, list) else 0
+    numbers = set()
+    for idx in correct:
+        if isinstance(idx, str) and idx.isdigit():
+            number = int(idx)
+        elif isinstance(idx, int) and not isinstance(idx, bool):
+            number = idx
+        else:
+            return f"Некорректный номер правильного ответа: {idx!r}"
+        if not 1 <= number <= count:
+            return f"Номер правильного ответа {number} вне диапазона 1-{count}"
+        if number in numbers:
+            return f"Номер правильного ответа {number} повторяется"
+        numbers.add(number)
+    return None
+
+
+def _check_tags(record):
+    tags = record.get('tags')
+    if tags is None:
+        return None
+    if not isinstance(tags, list) or not all(isinstance(tag, str) and tag.strip() for tag in tags):
+        return "Теги должны быть списком непустых строк"
+    return None
+
+
+def _check_id(record):
+    question_id = record.get('id')
+    if question_id is None:
+        return None
+    if not isinstance(question_id, int) or isinstance(question_id, bool) or question_id < 1:
+        return "id должен быть положительным целым числом"
+    return None
+
+
+def _check_images(record):
+    image = record.get('image')
+    if image is not None and not isinstance(image, str):
+        return "Имя файла картинки должно быть строкой"
+    option_images = record.get('option_images')
+    if option_images is None:
+        return None
+    if not isinstance(option_images, list) or not all(
+            item is None or isinstance(item, str) for item in option_images):
+        return "Картинки вариантов должны быть списком имен файлов"
+    options = record.get('options')
+    if isinstance(options, list) and len(option_images) > len(options):
+        return "Картинок вариантов больше, чем вариантов"
+    return None
+
+
+# Проверки полей в порядке, в котором пользователю показываются ошибки
+CHECKS = (
+    ('question', _check_question),
+    ('options', _check_options),
+    ('correct', _check_correct),
+    ('tags', _check_tags),
+    ('id', _check_id),
+    ('image', _check_images),
+)
+
+
+class ValidationReport:
+    """Результат проверки: корректные записи и ошибки с номерами записей"""
+
+    def __init__(self, total):
+        self.total = total
+        self.valid = []
+        self.errors = []
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    def invalid_count(self):
+        """Количество записей с ошибками"""
+        return len({error.record for error in self.errors})
+
+    def summary(self, limit=10):
+        """Краткий текст отчета для всплывающего окна или консоли"""
+        lines = [f"Записей: {self.total}, корректных: {len(self.valid)}, с ошибками: {self.invalid_count()}"]
+        for error in self.errors[:limit]:
+            lines.append(f"Запись {error.record} ({error.field}): {error.message}")
+        if len(self.errors) > limit:
+            lines.append(f"... и еще ошибок: {len(self.errors) - limit}")
+        return '\n'.join(lines)
+
+    def to_dict(self):
+        return {
+            'total': self.total,
+            'valid': len(self.valid),
+            'errors': [error._asdict() for error in self.errors],
+        }
+
+
+def validate_record(record):
+    """Проверяет одну запись и возвращает список пар (поле, ошибка)"""
+    if not isinstance(record, dict):
+        return [('record', "Вопрос должен быть объектом JSON")]
+    errors = []
+    for field, check in CHECKS:
+        message = check(record)
+        if message is not None:
+            errors.append((field, message))
+    return errors
+
+
+def validate_records(records, numbers=None):
+    """Проверяет записи за один проход.
+
+    numbers - номера записей для отчета (например, строки CSV-файла),
+    по умолчанию порядковые номера с 1.
+    """
+    if not isinstance(records, list):
+        report = ValidationReport(0)
+        report.errors.append(ValidationError(0, 'file', "Файл должен содержать список вопросов"))
+        return report
+
+    report = ValidationReport(len(records))
+    valid = report.valid
+    errors = report.errors
+    for position, record in enumerate(records):
+        number = numbers[position] if numbers is not None else position + 1
+        if not isinstance(record, dict):
+            errors.append(ValidationError(number, 'record', "Вопрос должен быть объектом JSON"))
+            continue
+        record_ok = True
+        for field, check in CHECKS:
+            message = check(record)
+            if message is not None:
+                errors.append(ValidationError(number, field, message))
+                record_ok = False
+        if record_ok:
+            valid.append(record)
+    return report
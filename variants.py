@@ -0,0 +1,325 @@
+"""Билеты: K вариантов по N вопросов из банка для печати и экзамена без приложения.
+
+Вопросы делятся на группы по тегам или по оценкам сложности, и каждый
+вариант получает из группы долю, пропорциональную ее размеру. Остатки от
+округления переходят на следующие варианты, поэтому даже группа меньше
+одного места в варианте попадает в свою долю вариантов.
+
+Внутри группы вопросы берутся по кругу из перемешанного списка: варианты
+не пересекаются, пока хватает вопросов, а при нехватке любой вопрос
+встречается не больше чем на один раз чаще другого. На вариант уходит
+O(N) операций независимо от размера банка; декодируются только попавшие
+в варианты вопросы. Варианты перемешивают ответы так же, как вкладка
+«Экзамен», и пишутся в HTML или JSON по мере генерации.
+
+    python cli.py variants data_dir --count 30 --size 20 --balance tags --html variants.html
+"""
+import os
+import json
+import html
+import random
+from pathlib import Path
+
+from difficulty import DIFFICULTY_SUFFIX, MIN_ANSWERS, load_difficulty
+from question_bank import find_position, mask_positions, positions_mask, shuffle_options
+
+BALANCE_NONE = 'none'
+BALANCE_TAGS = 'tags'
+BALANCE_DIFFICULTY = 'difficulty'
+BALANCE_MODES = (BALANCE_NONE, BALANCE_TAGS, BALANCE_DIFFICULTY)
+
+VARIANTS_HTML_FILENAME = 'exam_variants.html'
+VARIANTS_JSON_FILENAME = 'exam_variants.json'
+
+# Буквы вариантов ответа в печатных билетах
+OPTION_LETTERS = 'абвгдежзиклмнопрстуфхцчшщэюя'
+DIFFICULTY_LEVELS = ('легкие', 'средние', 'трудные')
+
+
+class Variant:
+    """Вариант билета: вопросы с перемешанными ответами"""
+    __slots__ = ('number', 'items')
+
+    def __init__(self, number, items):
+        self.number = number
+        # (вопрос, исходные номера вариантов в новом порядке, правильные в новом порядке)
+        self.items = items
+
+    def to_dict(self):
+        """Вариант в формате банка: его можно импортировать как банк"""
+        questions = []
+        for question, order, correct_indices in self.items:
+            record = {
+                'id': question.id,
+                'question': question.text,
+                'options': [question.options[index] for index in order],
+                'correct': [str(index + 1) for index in correct_indices],
+            }
+            if question.tags:
+                record['tags'] = list(question.tags)
+            if question.image:
+                record['image'] = question.image
+            if question.option_images:
+                record['option_images'] = [question.option_image(index) for index in order]
+            questions.append(record)
+        return {'variant': self.number, 'questions': questions}
+
+    def answer_key(self):
+        """Ответы строкой: «1 - а; 2 - б, г; ...»"""
+        return '; '.join(f"{number} - {', '.join(_letter(index) for index in correct_indices)}"
+                         for number, (_, _, correct_indices) in enumerate(self.items, 1))
+
+
+def _letter(index):
+    return OPTION_LETTERS[index] if index < len(OPTION_LETTERS) else str(index + 1)
+
+
+def tag_groups(tag_index, positions):
+    """Группы по тегам: вопрос попадает в группу самого редкого своего тега.
+
+    Так редкие темы получают свою группу и свою долю в каждом варианте.
+    Вопросы без тегов образуют группу ''.
+    """
+    remaining = positions_mask(positions, tag_index.count)
+    postings = sorted(tag_index.postings.items(), key=lambda item: (bin(item[1]).count('1'), item[0]))
+    groups = []
+    for tag, mask in postings:
+        mask &= remaining
+        if mask:
+            groups.append((tag, mask_positions(mask)))
+            remaining &= ~mask
+    if remaining:
+        groups.append(('', mask_positions(remaining)))
+    return groups
+
+
+def difficulty_groups(questions, positions, estimates):
+    """Группы по сложности: трети оцененных вопросов и вопросы без оценки"""
+    allowed = set(positions)
+    scored = []
+    for question_id, values in estimates.items():
+        if values[2] < MIN_ANSWERS:
+            continue
+        position = find_position(questions, question_id)
+        if position is not None and position in allowed:
+            scored.append((values[0], position))
+    scored.sort()
+
+    groups = []
+    for level, name in enumerate(DIFFICULTY_LEVELS):
+        part = [position for _, position in scored[len(scored) * level // 3:len(scored) * (level + 1) // 3]]
+        if part:
+            groups.append((name, part))
+    rated = {position for _, position in scored}
+    unrated = [position for position in positions if position not in rated]
+    if unrated:
+        groups.append(('без оценки', unrated))
+    return groups
+
+
+def bank_groups(catalog, balance=BALANCE_TAGS, tags=(), match_all=False):
+    """Вопросы выбранного банка и группы для generate_variants.
+
+    tags и match_all - фильтр по тегам, как во вкладке «Экзамен».
+    """
+    questions = catalog.load()
+    index = catalog.tag_index()
+    positions = index.positions(tags, match_all) if tags else range(len(questions))
+    if balance == BALANCE_TAGS:
+        groups = tag_groups(index, positions)
+    elif balance == BALANCE_DIFFICULTY:
+        estimates = load_difficulty(catalog.side_path(DIFFICULTY_SUFFIX))
+        groups = difficulty_groups(questions, positions, estimates)
+    else:
+        groups = [('', list(positions))]
+    return questions, groups
+
+
+class _GroupCycle:
+    """Позиции группы по кругу: каждый проход - новая случайная перестановка"""
+
+    def __init__(self, positions, rng):
+        self.positions = positions
+        self.rng = rng
+        self.queue = []
+
+    def take(self, count):
+        result = []
+        taken = set()
+        while len(result) < count:
+            if not self.queue:
+                fresh = list(self.positions)
+                self.rng.shuffle(fresh)
+                # Взятые в этот вариант вопросы нового прохода идут последними
+                self.queue = [p for p in fresh if p in taken] + [p for p in fresh if p not in taken]
+            position = self.queue.pop()
+            result.append(position)
+            taken.add(position)
+        return result
+
+
+def _quotas(shares, credit, capacities, size):
+    """Места групп в варианте: доли с переносом остатков, не больше размера группы"""
+    wanted = [share + extra for share, extra in zip(shares, credit)]
+    quotas = [min(int(value), capacity) for value, capacity in zip(wanted, capacities)]
+    free = size - sum(quotas)
+    order = sorted(range(len(shares)), key=lambda i: wanted[i] - quotas[i], reverse=True)
+    while free > 0:
+        progress = False
+        for i in order:
+            if free and quotas[i] < capacities[i]:
+                quotas[i] += 1
+                free -= 1
+                progress = True
+        if not progress:
+            break
+    return quotas
+
+
+def generate_variants(questions, groups, count, size, rng=random):
+    """Генерирует count вариантов по size вопросов из групп [(имя, позиции)].
+
+    Возвращает генератор: варианты выдаются по одному, чтобы их можно было
+    сразу записывать.
+    """
+    groups = [positions for _, positions in groups if positions]
+    total = sum(len(positions) for positions in groups)
+    if size <= 0 or count <= 0:
+        raise ValueError("Число вариантов и вопросов в варианте должно быть больше нуля")
+    if size > total:
+        raise ValueError(f"В варианте {size} вопросов, а в банке подходит только {total}")
+    return _generate(questions, groups, total, count, size, rng)
+
+
+def _generate(questions, groups, total, count, size, rng):
+    cycles = [_GroupCycle(positions, rng) for positions in groups]
+    capacities = [len(positions) for positions in groups]
+    shares = [size * capacity / total for capacity in capacities]
+    credit = [0.0] * len(groups)
+    for number in range(1, count + 1):
+        quotas = _quotas(shares, credit, capacities, size)
+        positions = []
+        for i, quota in enumerate(quotas):
+            credit[i] += shares[i] - quota
+            if quota:
+                positions.extend(cycles[i].take(quota))
+        # Вопросы разных групп перемешиваются внутри варианта
+        rng.shuffle(positions)
+        items = []
+        for position in positions:
+            question = questions[position]
+            order, correct_indices = shuffle_options(question, rng)
+            items.append((question, order, correct_indices))
+        yield Variant(number, items)
+
+
+class JsonVariantWriter:
+    """Пишет варианты в файл списком JSON по одному"""
+
+    def __init__(self, f):
+        self.f = f
+        self.written = 0
+        f.write('[\n')
+
+    def write(self, variant):
+        if self.written:
+            self.f.write(',\n')
+        json.dump(variant.to_dict(), self.f, ensure_ascii=False)
+        self.written += 1
+
+    def close(self):
+        self.f.write('\n]\n')
+
+
+_HTML_HEAD = '''<!DOCTYPE html>
+<html lang="ru"><head><meta charset="utf-8"><title>{title}</title>
+<style>
+body {{ font-family: sans-serif; max-width: 50em; margin: auto; }}
+section {{ page-break-after: always; }}
+ol.options {{ list-style: none; padding-left: 1em; }}
+img {{ max-width: 100%; max-height: 15em; }}
+</style></head><body>
+'''
+
+
+class HtmlVariantWriter:
+    """Пишет варианты для печати: каждый с новой страницы, ответы в конце.
+
+    media_dir - папка картинок банка; без нее картинки не вставляются.
+    """
+
+    def __init__(self, f, title='Билеты', media_dir=None):
+        self.f = f
+        self.title = html.escape(title)
+        self.media_dir = media_dir
+        self.keys = []
+        f.write(_HTML_HEAD.format(title=self.title))
+
+    def write(self, variant):
+        f = self.f
+        f.write(f'<section><h2>{self.title}. Вариант {variant.number}</h2>\n<ol>\n')
+        for question, order, _ in variant.items:
+            f.write(f'<li><p>{html.escape(question.text)}</p>\n')
+            if question.image:
+                f.write(self._image(question.image))
+            f.write('<ol class="options">\n')
+            for new_index, index in enumerate(order):
+                image = question.option_image(index)
+                picture = self._image(image) if image else ''
+                f.write(f'<li>{_letter(new_index)}) {html.escape(question.options[index])}{picture}</li>\n')
+            f.write('</ol></li>\n')
+        f.write('</ol></section>\n')
+        self.keys.append((variant.number, variant.answer_key()))
+
+    def _image(self, image):
+        if not self.media_dir:
+            return ''
+        uri = Path(os.path.abspath(os.path.join(self.media_dir, image))).as_uri()
+        return f' <img src="{html.escape(uri)}">\n'
+
+    def close(self):
+        self.f.write('<section><h2>Ответы</h2>\n<table>\n')
+        for number, key in self.keys:
+            self.f.write(f'<tr><td>Вариант {number}</td><td>{html.escape(key)}</td></tr>\n')
+        self.f.write('</table></section>\n</body></html>\n')
+
+
+class VariantStats:
+    """Использование вопросов в вариантах: сколько разных и сколько повторяются"""
+
+    def __init__(self):
+        self.variants = 0
+        self.uses = {}
+
+    def add(self, variant):
+        self.variants += 1
+        for question, _, _ in variant.items:
+            self.uses[question.id] = self.uses.get(question.id, 0) + 1
+
+    @property
+    def questions(self):
+        return len(self.uses)
+
+    @property
+    def repeated(self):
+        return sum(1 for value in self.uses.values() if value > 1)
+
+    @property
+    def max_uses(self):
+        return max(self.uses.values(), default=0)
+
+    def summary(self):
+        return (f"Вариантов: {self.variants}, разных вопросов: {self.questions}, "
+                f"повторяются: {self.repeated} (не больше {self.max_uses} раз)")
+
+
+def stream_variants(variants, writers):
+    """Записывает каждый вариант во все writers сразу после генерации"""
+    stats = VariantStats()
+    for variant in variants:
+        for writer in writers:
+            writer.write(variant)
+        stats.add(variant)
+    for writer in writers:
+        writer.close()
+    return stats